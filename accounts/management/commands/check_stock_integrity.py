@@ -1,33 +1,289 @@
+"""
+Management command to scan the database for broken invariants.
+Run: python manage.py check_stock_integrity [--repair]
+
+Every check is one grouped or anti-join query over the whole table, never
+a query per problem row, and the report is printed as JSON:
+
+- products_without_stock: products with no Stock row
+- duplicate_stock: more than one Stock row for a product
+- negative_stock: Stock quantity or reorder level below zero
+- stock_ledger_mismatch: Stock.quantity differs from the sum of the
+  product's StockMovement ledger
+- nonpositive_sales: sales with quantity <= 0 or a negative total
+- returns_exceed_sale: active returns of a sale add up to more units or
+  more refund than the sale
+- sale_total_mismatch: total_price is not quantity x price for sales of
+  products not edited since the sale (so today's price is the sale price)
+- stale_sale_return_totals: Sale return columns disagree with its returns
+- orphan_forecasts: forecasting rows of deleted products
+
+--repair fixes what can be fixed mechanically, all in one transaction:
+missing stock rows are created at the ledger balance, duplicate stock rows
+are dropped (the oldest is kept), negative stock is zeroed with an
+adjustment movement, the ledger is reconciled to the on-hand quantity,
+sale return columns are recomputed and orphan forecasting rows are
+deleted. Sales and returns themselves are financial records and are only
+reported.
+"""
+import json
+import time
+
 from django.core.management.base import BaseCommand
-from sales.models import Product
-from inventory.models import Stock
 
 
 class Command(BaseCommand):
-    help = 'Check for Stock integrity issues'
+    help = 'Check stock, sales, returns and forecasts for broken invariants (JSON report)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='Apply bulk fixes for the repairable problems in one transaction',
+        )
+        parser.add_argument(
+            '--sample-size',
+            type=int,
+            default=20,
+            help='Example ids listed per problem (default: 20)',
+        )
 
     def handle(self, *args, **options):
-        # Check for products without stock records
-        products_without_stock = Product.objects.filter(stock__isnull=True)
-        if products_without_stock.exists():
-            self.stdout.write(self.style.WARNING(f"Found {products_without_stock.count()} products without stock records"))
-            for p in products_without_stock[:5]:
-                self.stdout.write(f"  - {p.id}: {p.name}")
-        else:
-            self.stdout.write(self.style.SUCCESS("All products have stock records"))
-        
-        # Check for duplicate stock records
+        from django.db import transaction
+        from django.utils import timezone
+
+        self.sample_size = max(0, options['sample_size'])
+        started = time.monotonic()
+
+        checks = {}
+        for name, check, repair in self.checks():
+            checks[name] = check()
+            checks[name]['repairable'] = repair is not None
+
+        if options['repair']:
+            with transaction.atomic():
+                for name, check, repair in self.checks():
+                    if repair is not None and checks[name]['count']:
+                        checks[name]['repaired'] = repair()
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'repair': options['repair'],
+            'duration_ms': round((time.monotonic() - started) * 1000),
+            'problems': sum(check['count'] for check in checks.values()),
+            'checks': checks,
+        }
+        self.stdout.write(json.dumps(report, indent=2, default=str))
+
+        style = self.style.WARNING if report['problems'] else self.style.SUCCESS
+        self.stderr.write(style(f"{report['problems']} problem(s) found in {report['duration_ms']} ms"))
+
+    def checks(self):
+        """(name, check, repair) in repair order; repair is None for report-only checks"""
+        return [
+            ('products_without_stock', self.products_without_stock, self.create_missing_stock),
+            ('duplicate_stock', self.duplicate_stock, self.drop_duplicate_stock),
+            ('negative_stock', self.negative_stock, self.zero_negative_stock),
+            ('stock_ledger_mismatch', self.stock_ledger_mismatch, self.reconcile_ledger),
+            ('nonpositive_sales', self.nonpositive_sales, None),
+            ('returns_exceed_sale', self.returns_exceed_sale, None),
+            ('sale_total_mismatch', self.sale_total_mismatch, None),
+            ('stale_sale_return_totals', self.stale_sale_return_totals, self.recompute_sale_return_totals),
+            ('orphan_forecasts', self.orphan_forecasts, self.delete_orphan_forecasts),
+        ]
+
+    def result(self, rows):
+        """Count and sample of a list of problem rows (ids or dicts)"""
+        return {'count': len(rows), 'sample': rows[:self.sample_size]}
+
+    # Stock
+
+    def _missing_stock_ids(self):
+        from sales.models import Product
+        return list(Product.objects.filter(stock__isnull=True).order_by('pk').values_list('pk', flat=True))
+
+    def _ledger_balances(self, product_ids=None):
+        from django.db.models import Sum
+        from inventory.models import StockMovement
+
+        movements = StockMovement.objects.all()
+        if product_ids is not None:
+            movements = movements.filter(product_id__in=product_ids)
+        return dict(movements.values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total'))
+
+    def products_without_stock(self):
+        return self.result(self._missing_stock_ids())
+
+    def create_missing_stock(self):
+        from inventory.models import Stock
+
+        missing = self._missing_stock_ids()
+        balances = self._ledger_balances(missing)
+        Stock.objects.bulk_create(
+            [Stock(product_id=pid, quantity=max(0, balances.get(pid, 0))) for pid in missing],
+            ignore_conflicts=True,
+        )
+        return len(missing)
+
+    def _duplicate_stock(self):
+        """{product_id: [stock ids, oldest first]} for products with several Stock rows"""
         from django.db.models import Count
-        duplicates = Stock.objects.values('product').annotate(count=Count('id')).filter(count__gt=1)
-        if duplicates.exists():
-            self.stdout.write(self.style.WARNING(f"Found {duplicates.count()} products with duplicate stock records"))
-            for d in duplicates[:5]:
-                stocks = Stock.objects.filter(product_id=d['product'])
-                self.stdout.write(f"  - Product {d['product']}: {stocks.count()} stock records")
-        else:
-            self.stdout.write(self.style.SUCCESS("No duplicate stock records found"))
-        
-        # Check total counts
-        total_products = Product.objects.count()
-        total_stocks = Stock.objects.count()
-        self.stdout.write(f"\nTotals: {total_products} products, {total_stocks} stock records")
+        from inventory.models import Stock
+
+        duplicated = Stock.objects.values('product_id').annotate(rows=Count('pk')).filter(rows__gt=1).values('product_id')
+        groups = {}
+        for pid, stock_id in Stock.objects.filter(product_id__in=duplicated).order_by('product_id', 'pk').values_list('product_id', 'pk'):
+            groups.setdefault(pid, []).append(stock_id)
+        return groups
+
+    def duplicate_stock(self):
+        groups = self._duplicate_stock()
+        return self.result([{'product_id': pid, 'stock_ids': ids} for pid, ids in groups.items()])
+
+    def drop_duplicate_stock(self):
+        from inventory.models import Stock
+
+        extra = [stock_id for ids in self._duplicate_stock().values() for stock_id in ids[1:]]
+        Stock.objects.filter(pk__in=extra).delete()
+        return len(extra)
+
+    def _negative_stock(self):
+        from django.db.models import Q
+        from inventory.models import Stock
+        return Stock.objects.filter(Q(quantity__lt=0) | Q(reorder_level__lt=0))
+
+    def negative_stock(self):
+        return self.result(list(
+            self._negative_stock().order_by('product_id').values('product_id', 'quantity', 'reorder_level')
+        ))
+
+    def zero_negative_stock(self):
+        from django.db.models import Case, F, Value, When
+        from django.db.models.functions import Greatest
+        from inventory.models import StockMovement
+
+        negative = self._negative_stock()
+        rows = list(negative.values_list('product_id', 'quantity'))
+        # Clamped directly: StockService cannot add to a quantity it cannot read as valid
+        negative.update(
+            quantity=Case(When(quantity__lt=0, then=Value(0)), default=F('quantity')),
+            reorder_level=Greatest(F('reorder_level'), Value(0)),
+        )
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                product_id=pid, kind='adjustment', quantity=-quantity, balance_after=0,
+                note='Integrity repair: negative stock zeroed',
+            )
+            for pid, quantity in rows if quantity < 0
+        ])
+        return len(rows)
+
+    def _ledger_mismatches(self):
+        from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+        from django.db.models.functions import Coalesce
+        from inventory.models import Stock, StockMovement
+
+        ledger = (
+            StockMovement.objects.filter(product_id=OuterRef('product_id'))
+            .values('product_id').annotate(total=Sum('quantity')).values('total')
+        )
+        return list(
+            Stock.objects.annotate(ledger=Coalesce(Subquery(ledger, output_field=IntegerField()), Value(0)))
+            .exclude(quantity=F('ledger'))
+            .order_by('product_id')
+            .values('product_id', 'quantity', 'ledger')
+        )
+
+    def stock_ledger_mismatch(self):
+        return self.result(self._ledger_mismatches())
+
+    def reconcile_ledger(self):
+        from inventory.models import StockMovement
+
+        # On-hand is what the shop counts and sells from; book the
+        # difference so the ledger adds up to it again
+        rows = self._ledger_mismatches()
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                product_id=row['product_id'], kind='adjustment', quantity=row['quantity'] - row['ledger'],
+                balance_after=max(0, row['quantity']), note='Integrity repair: ledger reconciled',
+            )
+            for row in rows
+        ])
+        return len(rows)
+
+    # Sales and returns
+
+    def nonpositive_sales(self):
+        from django.db.models import Q
+        from sales.models import Sale
+
+        return self.result(list(
+            Sale.objects.filter(Q(quantity__lte=0) | Q(total_price__lt=0))
+            .order_by('pk').values('id', 'quantity', 'total_price')
+        ))
+
+    def returns_exceed_sale(self):
+        from django.db.models import F, Q, Sum
+        from sales.models import Sale
+
+        active = Q(returns__status__in=['pending', 'approved', 'completed'])
+        return self.result(list(
+            Sale.objects.annotate(
+                units_returned=Sum('returns__quantity_returned', filter=active),
+                refund_total=Sum('returns__refund_amount', filter=active),
+            )
+            .filter(Q(units_returned__gt=F('quantity')) | Q(refund_total__gt=F('total_price')))
+            .order_by('pk').values('id', 'quantity', 'units_returned', 'total_price', 'refund_total')
+        ))
+
+    def sale_total_mismatch(self):
+        from decimal import Decimal
+        from django.db.models import DecimalField, ExpressionWrapper, F
+        from django.db.models.functions import Abs
+        from sales.models import Sale
+
+        expected = ExpressionWrapper(F('quantity') * F('product__price'), output_field=DecimalField(max_digits=12, decimal_places=2))
+        # Half-cent tolerance: SQLite does decimal arithmetic in floating point
+        return self.result(list(
+            Sale.objects.filter(product__updated_at__lte=F('sale_date'))
+            .annotate(expected_total=expected, difference=Abs(F('total_price') - expected))
+            .filter(difference__gt=Decimal('0.005'))
+            .order_by('pk').values('id', 'quantity', 'total_price', 'expected_total')
+        ))
+
+    def stale_sale_return_totals(self):
+        from sales.returns import stale_sales
+        return self.result(list(stale_sales().order_by('pk').values_list('pk', flat=True)))
+
+    def recompute_sale_return_totals(self):
+        from sales.returns import recompute_sales
+        return recompute_sales()
+
+    # Forecasts
+
+    def _orphan_querysets(self):
+        from forecasting.models import BacktestResult, DirtyProduct, ForecastSeries, ProductAlgorithm
+        from sales.models import Product
+
+        products = Product.objects.values('pk')
+        return {
+            model._meta.model_name: model.objects.exclude(product_id__in=products)
+            for model in (ForecastSeries, ProductAlgorithm, BacktestResult, DirtyProduct)
+        }
+
+    def orphan_forecasts(self):
+        by_table = {}
+        product_ids = set()
+        for name, qs in self._orphan_querysets().items():
+            by_table[name] = qs.count()
+            if by_table[name]:
+                product_ids.update(qs.values_list('product_id', flat=True).distinct()[:self.sample_size])
+        return {
+            'count': sum(by_table.values()),
+            'sample': sorted(product_ids)[:self.sample_size],
+            'by_table': by_table,
+        }
+
+    def delete_orphan_forecasts(self):
+        return sum(qs.delete()[0] for qs in self._orphan_querysets().values())
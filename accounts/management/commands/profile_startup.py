@@ -0,0 +1,120 @@
+"""
+Management command to profile web worker cold start.
+Run: python manage.py profile_startup --budget-ms 1500
+
+Boots the project in a fresh interpreter (like a recycled gunicorn worker),
+loads the WSGI application and serves one request, then reports the
+slowest top-level imports and the time to first response.
+"""
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Libraries that belong in background jobs, never in web worker boot
+HEAVY_MODULES = ['numpy', 'pandas', 'scipy', 'sklearn', 'xgboost', 'prophet', 'cmdstanpy']
+
+BOOT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+booted = time.perf_counter()
+from django.test import Client
+from django.test.utils import setup_test_environment
+setup_test_environment()
+response = Client(raise_request_exception=False).get(sys.argv[1])
+responded = time.perf_counter()
+print(json.dumps({
+    'boot_ms': (booted - started) * 1000,
+    'first_response_ms': (responded - booted) * 1000,
+    'status': response.status_code,
+    'heavy_modules': [name for name in json.loads(sys.argv[2]) if name in sys.modules],
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """Cumulative import time (ms) per top-level package from -X importtime output"""
+    totals = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        # Nested imports are indented; only count top-level ones so that
+        # children are not added twice
+        if not name[1:].startswith(' '):
+            totals[name.strip().split('.')[0]] += int(cumulative) / 1000
+    return totals
+
+
+class Command(BaseCommand):
+    help = 'Measure import time and time to first response of a fresh web worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default='/',
+            help='URL requested as the first request (default: /, the health check path)',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Number of slowest top-level imports to show (default: 15)',
+        )
+        parser.add_argument(
+            '--budget-ms',
+            type=float,
+            default=None,
+            help='Fail if boot plus first response takes longer than this',
+        )
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+            'DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE
+        ))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT,
+             options['path'], json.dumps(HEAVY_MODULES)],
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=settings.BASE_DIR,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Worker boot failed:\n{result.stderr[-2000:]}')
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+
+        self.stdout.write(self.style.NOTICE('Slowest top-level imports:'))
+        self.stdout.write(f'{"Package":<32}{"Cumulative (ms)":>16}')
+        imports = sorted(parse_importtime(result.stderr).items(), key=lambda item: -item[1])
+        for name, ms in imports[:options['top']]:
+            self.stdout.write(f'{name:<32}{ms:>16.1f}')
+
+        total_ms = timings['boot_ms'] + timings['first_response_ms']
+        self.stdout.write('')
+        self.stdout.write(f'Boot (settings, apps, WSGI app): {timings["boot_ms"]:.0f} ms')
+        self.stdout.write(
+            f'First response ({options["path"]} -> {timings["status"]}): '
+            f'{timings["first_response_ms"]:.0f} ms'
+        )
+        self.stdout.write(f'Total: {total_ms:.0f} ms')
+
+        if timings['heavy_modules']:
+            self.stdout.write(self.style.WARNING(
+                f'Heavy modules loaded in the web path: {", ".join(timings["heavy_modules"])}'
+            ))
+
+        budget = options['budget_ms']
+        if budget is not None:
+            if total_ms > budget:
+                raise CommandError(f'Cold start took {total_ms:.0f} ms, over the {budget:.0f} ms budget')
+            self.stdout.write(self.style.SUCCESS(f'Within the {budget:.0f} ms budget.'))
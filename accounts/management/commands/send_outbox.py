@@ -0,0 +1,68 @@
+"""
+Management command that delivers queued notifications (see accounts/outbox.py).
+Run: python manage.py send_outbox
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class Command(BaseCommand):
+    help = 'Send queued emails and SMS messages from the notification outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Send the messages that are currently due, then exit',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2,
+            help='Seconds to wait between polls when nothing is due (default: 2)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Messages sent per connection (default: OUTBOX_BATCH_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        from accounts.outbox import Dispatcher, purge
+
+        batch_size = options['batch_size'] or settings.OUTBOX_BATCH_SIZE
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        dispatcher = Dispatcher(batch_size, settings.OUTBOX_CONCURRENCY)
+        self.stdout.write(self.style.NOTICE(
+            'Outbox sender started ('
+            + ', '.join(f'{channel}: {workers} at a time' for channel, workers in settings.OUTBOX_CONCURRENCY.items())
+            + ').'
+        ))
+
+        last_purge = 0
+        try:
+            while True:
+                close_old_connections()
+                if time.monotonic() - last_purge > PURGE_INTERVAL_SECONDS:
+                    purged = purge(settings.OUTBOX_RETENTION_DAYS)
+                    if purged:
+                        self.stdout.write(f'Purged {purged} old outbox messages.')
+                    last_purge = time.monotonic()
+
+                claimed, sent = dispatcher.run_once()
+                if claimed:
+                    style = self.style.SUCCESS if sent == claimed else self.style.WARNING
+                    self.stdout.write(style(f'Sent {sent} of {claimed} messages.'))
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        finally:
+            dispatcher.shutdown()
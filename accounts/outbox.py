@@ -0,0 +1,226 @@
+"""
+Transactional outbox for notifications.
+
+Views never talk to SMTP or Twilio. They ``queue_email``/``queue_sms``
+inside their own transaction, and ``python manage.py send_outbox`` delivers
+the committed rows in the background: messages are claimed in batches with
+a conditional UPDATE and a lease (a crashed sender's batch is picked up
+again once the lease expires), each batch is sent over one connection, and
+each channel has its own thread pool so a slow SMS gateway cannot hold up
+email. Failed sends are retried with exponential backoff until
+OUTBOX_MAX_ATTEMPTS, and messages past their ``expires_at`` are dropped.
+"""
+import logging
+import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 120
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+
+
+def queue_email(recipient, subject, body, expires_at=None):
+    """Queue an email; it is only sent if the current transaction commits"""
+    return OutboxMessage.objects.create(
+        channel='email', recipient=recipient, subject=subject, body=body, expires_at=expires_at,
+    )
+
+
+def queue_sms(recipient, body, expires_at=None):
+    """Queue an SMS; it is only sent if the current transaction commits"""
+    return OutboxMessage.objects.create(
+        channel='sms', recipient=recipient, body=body, expires_at=expires_at,
+    )
+
+
+def sms_configured():
+    """Whether real Twilio credentials are set (the defaults are placeholders)"""
+    sid = getattr(settings, 'TWILIO_ACCOUNT_SID', '')
+    token = getattr(settings, 'TWILIO_AUTH_TOKEN', '')
+    return bool(
+        sid and token and getattr(settings, 'TWILIO_PHONE_NUMBER', '')
+        and not sid.startswith('your_') and not token.startswith('your_')
+    )
+
+
+def max_attempts():
+    return getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts``: doubling from 30 s, capped at an hour, ±20% jitter"""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0), BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim(channel, limit, lease_seconds=LEASE_SECONDS):
+    """
+    Claim up to ``limit`` due messages of ``channel``: pending ones whose
+    retry time has come, and ones whose sender's lease expired. Returns the
+    claimed messages.
+    """
+    now = timezone.now()
+    OutboxMessage.objects.filter(
+        channel=channel, status__in=['pending', 'sending'], expires_at__lt=now,
+    ).update(status='failed', last_error='Expired before it could be sent', lease_until=None)
+    OutboxMessage.objects.filter(
+        channel=channel, status='sending', lease_until__lt=now, attempts__gte=max_attempts(),
+    ).update(status='failed', last_error='Gave up after the sender stopped responding', lease_until=None)
+
+    due = Q(status='pending', next_attempt_at__lte=now) | Q(status='sending', lease_until__lt=now)
+    ids = list(
+        OutboxMessage.objects.filter(due, channel=channel)
+        .order_by('next_attempt_at', 'id').values_list('id', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # Re-checking `due` in the UPDATE means only one sender wins each row
+    OutboxMessage.objects.filter(due, id__in=ids).update(
+        status='sending',
+        claim_token=token,
+        lease_until=now + timedelta(seconds=lease_seconds),
+        attempts=F('attempts') + 1,
+    )
+    return list(OutboxMessage.objects.filter(claim_token=token, status='sending'))
+
+
+def send_emails(messages):
+    """Send a batch over one SMTP connection. Returns {message id: error or None}."""
+    from django.core.mail import EmailMessage, get_connection
+
+    mail_connection = get_connection(fail_silently=False)
+    try:
+        mail_connection.open()
+    except Exception as e:
+        return {message.id: f'Could not connect to the mail server: {e}' for message in messages}
+
+    results = {}
+    try:
+        for message in messages:
+            try:
+                EmailMessage(
+                    subject=message.subject,
+                    body=message.body,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[message.recipient],
+                    connection=mail_connection,
+                ).send()
+                results[message.id] = None
+            except Exception as e:
+                results[message.id] = str(e) or e.__class__.__name__
+    finally:
+        try:
+            mail_connection.close()
+        except Exception:
+            pass
+    return results
+
+
+def send_sms(messages):
+    """Send a batch through one Twilio client. Returns {message id: error or None}."""
+    if not sms_configured():
+        return {message.id: 'Twilio is not configured' for message in messages}
+    try:
+        from twilio.rest import Client
+    except ImportError:
+        return {message.id: 'The twilio package is not installed' for message in messages}
+
+    client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+    results = {}
+    for message in messages:
+        try:
+            client.messages.create(body=message.body, from_=settings.TWILIO_PHONE_NUMBER, to=message.recipient)
+            results[message.id] = None
+        except Exception as e:
+            results[message.id] = str(e) or e.__class__.__name__
+    return results
+
+
+SENDERS = {
+    'email': send_emails,
+    'sms': send_sms,
+}
+
+
+def record_results(messages, results):
+    """Mark sent messages, and reschedule or fail the others. Only the claim holder may update."""
+    now = timezone.now()
+    sent = [message.id for message in messages if message.id in results and results[message.id] is None]
+    tokens = {message.claim_token for message in messages}
+    OutboxMessage.objects.filter(id__in=sent, claim_token__in=tokens, status='sending').update(
+        status='sent', sent_at=now, last_error='', lease_until=None,
+    )
+    for message in messages:
+        if message.id in sent:
+            continue
+        error = results.get(message.id) or 'Not attempted'
+        current = OutboxMessage.objects.filter(id=message.id, claim_token=message.claim_token, status='sending')
+        if message.attempts >= max_attempts():
+            current.update(status='failed', last_error=error, lease_until=None)
+        else:
+            current.update(
+                status='pending', last_error=error, lease_until=None,
+                next_attempt_at=now + backoff(message.attempts),
+            )
+        logger.warning(f'Outbox message #{message.id} ({message.channel}) attempt {message.attempts} failed: {error}')
+    return len(sent)
+
+
+def deliver(channel, messages):
+    """Send one claimed batch and record the outcome. Returns the number sent."""
+    try:
+        try:
+            results = SENDERS[channel](messages)
+        except Exception as e:
+            logger.error(f'Outbox {channel} batch failed', exc_info=True)
+            results = {message.id: str(e) or e.__class__.__name__ for message in messages}
+        return record_results(messages, results)
+    finally:
+        connection.close()
+
+
+class Dispatcher:
+    """One thread pool per channel, sized by OUTBOX_CONCURRENCY"""
+
+    def __init__(self, batch_size, concurrency):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.pools = {
+            channel: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'outbox-{channel}')
+            for channel, workers in concurrency.items() if channel in SENDERS and workers > 0
+        }
+
+    def run_once(self):
+        """Claim a round of due messages on every channel and send them. Returns (claimed, sent)."""
+        futures = []
+        claimed = 0
+        for channel, pool in self.pools.items():
+            messages = claim(channel, self.batch_size * self.concurrency[channel])
+            claimed += len(messages)
+            for start in range(0, len(messages), self.batch_size):
+                futures.append(pool.submit(deliver, channel, messages[start:start + self.batch_size]))
+        wait(futures)
+        return claimed, sum(future.result() for future in futures)
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown()
+
+
+def purge(days):
+    """Delete sent and failed messages older than ``days`` (they can hold one-time codes)"""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = OutboxMessage.objects.filter(status__in=['sent', 'failed'], created_at__lt=cutoff).delete()
+    return deleted
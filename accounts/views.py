@@ -23,8 +23,8 @@ class SignUpView(CreateView):
         user = form.save()
         
         # Audit log for new account creation
-        from audit.models import AuditLog
-        AuditLog.objects.create(
+        from audit.buffer import record
+        record(
             user=user,
             action='CREATE',
             object_name=f'User: {user.username}',
@@ -431,7 +431,7 @@ def forgot_password_request(request):
             
             if not user:
                 # Don't reveal if user exists or not for security
-                messages.info(request, 'If an account exists with that username/email, an OTP code has been sent.')
+                messages.info(request, 'If an account exists with that username/email, an OTP code will arrive shortly.')
                 return render(request, 'accounts/forgot_password_request.html')
         except Exception as e:
             # Log error but don't reveal details to user
@@ -441,23 +441,22 @@ def forgot_password_request(request):
             messages.error(request, 'An error occurred. Please try again.')
             return render(request, 'accounts/forgot_password_request.html')
         
-        # Generate OTP
-        otp = PasswordResetOTP.create_for_user(user)
+        # Generate OTP and queue its notifications in one transaction; the
+        # send_outbox worker delivers them (see accounts/outbox.py)
+        from datetime import timedelta
+        from django.db import transaction
+        from .outbox import queue_email, queue_sms, sms_configured
         
-        # Send OTP via Email with timeout protection
-        email_sent = False
-        try:
-            from django.core.mail import get_connection, EmailMessage
-            from django.conf import settings
-            import socket
-            
-            # Set a socket timeout to prevent hanging (10 seconds max)
-            original_timeout = socket.getdefaulttimeout()
-            socket.setdefaulttimeout(10)
+        with transaction.atomic():
+            otp = PasswordResetOTP.create_for_user(user)
+            expires_at = otp.created_at + timedelta(minutes=10)
             
-            try:
-                subject = 'Password Reset OTP - Multibliz POS'
-                message = f'''Hello {user.username},
+            email_queued = bool(user.email)
+            if email_queued:
+                queue_email(
+                    user.email,
+                    'Password Reset OTP - Multibliz POS',
+                    f'''Hello {user.username},
 
 You requested to reset your password. Your OTP code is:
 
@@ -468,83 +467,26 @@ This code is valid for 10 minutes.
 If you did not request this, please ignore this email.
 
 Best regards,
-Multibliz POS Team'''
-                
-                # Create connection with timeout
-                connection = get_connection(
-                    backend=settings.EMAIL_BACKEND,
-                    host=settings.EMAIL_HOST,
-                    port=settings.EMAIL_PORT,
-                    username=settings.EMAIL_HOST_USER,
-                    password=settings.EMAIL_HOST_PASSWORD,
-                    use_tls=settings.EMAIL_USE_TLS,
-                    fail_silently=True,
-                    timeout=10,  # 10 second timeout
+Multibliz POS Team''',
+                    expires_at=expires_at,
                 )
-                
-                email = EmailMessage(
-                    subject=subject,
-                    body=message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    to=[user.email],
-                    connection=connection,
-                )
-                result = email.send(fail_silently=True)
-                email_sent = result > 0
-                
-            finally:
-                # Restore original timeout
-                socket.setdefaulttimeout(original_timeout)
             
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f'Failed to send OTP email to {user.email}: {str(e)}')
-        
-        # Send OTP via SMS (Twilio) - Optional, skip if not configured
-        if user.phone:
-            try:
-                from django.conf import settings
-                from twilio.rest import Client
-                
-                # Check if Twilio credentials are configured
-                if (hasattr(settings, 'TWILIO_ACCOUNT_SID') and 
-                    hasattr(settings, 'TWILIO_AUTH_TOKEN') and 
-                    hasattr(settings, 'TWILIO_PHONE_NUMBER') and
-                    settings.TWILIO_ACCOUNT_SID and 
-                    settings.TWILIO_AUTH_TOKEN and
-                    settings.TWILIO_PHONE_NUMBER and
-                    not settings.TWILIO_ACCOUNT_SID.startswith('your_') and
-                    not settings.TWILIO_AUTH_TOKEN.startswith('your_')):
-                    
-                    # Initialize Twilio client
-                    client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-                    
-                    sms_message = f'Your Multibliz POS password reset OTP is: {otp.code}. Valid for 10 minutes.'
-                    
-                    client.messages.create(
-                        body=sms_message,
-                        from_=settings.TWILIO_PHONE_NUMBER,
-                        to=user.phone
-                    )
-                    
-            except ImportError:
-                # Twilio package not installed - silently skip SMS
-                pass
-            except Exception as e:
-                # SMS failed but don't block the password reset - email is primary
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f'SMS sending failed: {str(e)}')
+            # SMS is optional, only when Twilio is configured
+            if user.phone and sms_configured():
+                queue_sms(
+                    user.phone,
+                    f'Your Multibliz POS password reset OTP is: {otp.code}. Valid for 10 minutes.',
+                    expires_at=expires_at,
+                )
         
         # Store user_id in session for verification step
         request.session['reset_user_id'] = user.id
         request.session['otp_sent_time'] = str(otp.created_at)
         
-        if email_sent:
-            messages.success(request, 'OTP code has been sent to your email.')
+        if email_queued:
+            messages.success(request, 'Your OTP code is on its way and should arrive in your email shortly.')
         else:
-            # Email failed - show a generic message (do not expose OTP)
+            # No email address on file - show a generic message (do not expose OTP)
             messages.warning(request, 'There was a problem sending the OTP email. Please try again or contact support.')
         return redirect('verify_otp')
     
@@ -659,8 +601,8 @@ def reset_password(request):
             user.save()
             
             # Audit log for password reset (no request.user since they're logged out)
-            from audit.models import AuditLog
-            AuditLog.objects.create(
+            from audit.buffer import record
+            record(
                 user=user,
                 action='UPDATE',
                 object_name=f'User: {user.username}',
@@ -0,0 +1,199 @@
+"""
+Cold archive for old audit log entries.
+
+Entries older than a cut-off are moved out of the AuditLog table into
+append-only, gzip-compressed JSON Lines segments, one per month
+(``2025-01.jsonl.gz``), under AUDIT_ARCHIVE_DIR. Every append adds a new
+gzip member, so existing data is never rewritten. ``index.json`` keeps the
+time range, entry count, users and actions of each segment so that
+searches only open the segments that can match.
+
+Rows are written to their segment before they are deleted from the
+database. A crash in between can append a row twice; readers skip
+duplicate ids.
+"""
+import gzip
+import json
+import os
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLog
+
+
+INDEX_FILE = 'index.json'
+ARCHIVE_SEARCH_LIMIT = 5000
+ARCHIVE_FIELDS = [
+    'id', 'timestamp', 'user_id', 'user__username', 'user__first_name', 'user__last_name',
+    'action', 'content_type__app_label', 'content_type__model', 'object_id', 'object_name',
+    'ip_address', 'description', 'changes',
+]
+
+
+def archive_dir():
+    return settings.AUDIT_ARCHIVE_DIR
+
+
+def read_index():
+    """Segment metadata keyed by month ('YYYY-MM')"""
+    try:
+        with open(os.path.join(archive_dir(), INDEX_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _write_index(index):
+    path = os.path.join(archive_dir(), INDEX_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def _to_record(row):
+    return {
+        'id': row['id'],
+        'timestamp': row['timestamp'].isoformat(),
+        'user': {
+            'id': row['user_id'],
+            'username': row['user__username'],
+            'first_name': row['user__first_name'],
+            'last_name': row['user__last_name'],
+        } if row['user_id'] else None,
+        'action': row['action'],
+        'content_type': (
+            f"{row['content_type__app_label']}.{row['content_type__model']}"
+            if row['content_type__app_label'] else None
+        ),
+        'object_id': row['object_id'],
+        'object_name': row['object_name'],
+        'ip_address': row['ip_address'],
+        'description': row['description'],
+        'changes': row['changes'],
+    }
+
+
+def _append(index, month, records):
+    """Append records to a month's segment and update its index entry"""
+    filename = f'{month}.jsonl.gz'
+    with gzip.open(os.path.join(archive_dir(), filename), 'at', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, default=str) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+    entry = index.setdefault(month, {
+        'file': filename, 'count': 0, 'first': None, 'last': None, 'users': [], 'actions': [],
+    })
+    timestamps = [record['timestamp'] for record in records]
+    entry['count'] += len(records)
+    entry['first'] = min(filter(None, [entry['first'], min(timestamps)]))
+    entry['last'] = max(filter(None, [entry['last'], max(timestamps)]))
+    entry['users'] = sorted(set(entry['users']) | {
+        record['user']['username'] for record in records if record['user']
+    })
+    entry['actions'] = sorted(set(entry['actions']) | {record['action'] for record in records})
+
+
+def archive_before(cutoff, batch_size=1000):
+    """
+    Move audit entries older than ``cutoff`` into monthly segments, one
+    batch at a time (write, update the index, then delete the batch).
+    Returns the number of entries archived per month.
+    """
+    os.makedirs(archive_dir(), exist_ok=True)
+    index = read_index()
+    archived = {}
+    old = AuditLog.objects.filter(timestamp__lt=cutoff).order_by('id')
+    while True:
+        rows = list(old.values(*ARCHIVE_FIELDS)[:batch_size])
+        if not rows:
+            return archived
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row['timestamp'].strftime('%Y-%m'), []).append(_to_record(row))
+        for month, records in sorted(by_month.items()):
+            _append(index, month, records)
+            archived[month] = archived.get(month, 0) + len(records)
+        _write_index(index)
+        AuditLog.objects.filter(id__in=[row['id'] for row in rows]).delete()
+
+
+class ArchivedUser:
+    """The user fields of an archived entry, shaped like a User for templates"""
+
+    def __init__(self, data):
+        self.id = data['id']
+        self.username = data['username']
+        self.first_name = data['first_name'] or ''
+        self.last_name = data['last_name'] or ''
+
+    def get_full_name(self):
+        return f'{self.first_name} {self.last_name}'.strip()
+
+    def __str__(self):
+        return self.username
+
+
+class ArchivedLog:
+    """An archived audit entry with the attributes the audit trail template uses"""
+
+    def __init__(self, record):
+        self.id = record['id']
+        self.timestamp = parse_datetime(record['timestamp'])
+        self.user = ArchivedUser(record['user']) if record['user'] else None
+        self.action = record['action']
+        self.content_type = record['content_type']
+        self.object_id = record['object_id']
+        self.object_name = record['object_name']
+        self.ip_address = record['ip_address']
+        self.description = record['description']
+        self.changes = record['changes']
+
+    def get_action_display(self):
+        return dict(AuditLog.ACTION_CHOICES).get(self.action, self.action)
+
+
+def _matches(record, user, action, search):
+    username = record['user']['username'] if record['user'] else ''
+    if action and record['action'] != action:
+        return False
+    if user and user.lower() not in username.lower():
+        return False
+    if search:
+        search = search.lower()
+        return any(search in (value or '').lower() for value in (
+            record['object_name'], record['description'], username,
+        ))
+    return True
+
+
+def search_archive(month=None, user='', action='', search='', limit=ARCHIVE_SEARCH_LIMIT):
+    """
+    Archived entries matching the audit trail filters, newest month first.
+    Only segments whose index entry can match (month, action, user) are
+    opened. Returns at most ``limit`` ArchivedLog objects.
+    """
+    results = []
+    seen = set()
+    for segment_month, entry in sorted(read_index().items(), reverse=True):
+        if month and segment_month != month:
+            continue
+        if action and action not in entry['actions']:
+            continue
+        if user and not any(user.lower() in name.lower() for name in entry['users']):
+            continue
+        segment = []
+        with gzip.open(os.path.join(archive_dir(), entry['file']), 'rt', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if record['id'] in seen or not _matches(record, user, action, search):
+                    continue
+                seen.add(record['id'])
+                segment.append(ArchivedLog(record))
+        segment.sort(key=lambda log: (log.timestamp, log.id), reverse=True)
+        results.extend(segment)
+        if len(results) >= limit:
+            return results[:limit]
+    return results
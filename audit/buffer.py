@@ -0,0 +1,132 @@
+"""
+Buffered audit log writer.
+
+Audit entries are handed to an in-process bounded queue once the request's
+transaction commits (rolled-back work is never logged) and written by a
+background thread with ``bulk_create`` every AUDIT_BUFFER_FLUSH_MS
+milliseconds, or sooner once AUDIT_BUFFER_BATCH_SIZE entries are waiting.
+When the queue is full the entry is written synchronously instead of being
+dropped, and whatever is still queued is flushed at interpreter exit, so a
+recycled gunicorn worker loses nothing. A batch whose insert fails is
+retried once on a fresh connection and then saved row by row, so only an
+entry that cannot be saved on its own is lost (and logged).
+
+Set AUDIT_BUFFER_ENABLED = False to write every entry inline.
+"""
+import atexit
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+
+class AuditBuffer:
+    """Bounded queue of unsaved AuditLog rows flushed by a daemon thread"""
+
+    def __init__(self, max_size=1000, batch_size=100, flush_ms=500):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    def add(self, entry):
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            # Overflow: write through rather than lose the entry
+            entry.save()
+            return
+        if self.queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def flush(self):
+        """Write everything queued so far. Returns the number of entries written."""
+        with self._flush_lock:
+            written = 0
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return written
+                written += self._write(batch)
+
+    def _write(self, batch):
+        """
+        Save a batch with one INSERT. If that fails, reconnect and retry
+        once, then save the entries one by one so only an entry that fails
+        on its own is dropped. Returns the number of entries written.
+        """
+        for attempt in range(2):
+            try:
+                AuditLog.objects.bulk_create(batch)
+                return len(batch)
+            except Exception:
+                logger.warning('Failed to write %d audit log entries (attempt %d)', len(batch), attempt + 1, exc_info=True)
+                # A dropped or broken connection is the usual cause; start the retry on a fresh one
+                connection.close()
+
+        written = 0
+        for entry in batch:
+            try:
+                entry.save()
+                written += 1
+            except Exception:
+                logger.exception('Dropped audit log entry: %s %s by user %s', entry.action, entry.object_name, entry.user_id)
+                connection.close()
+        return written
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-buffer', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            close_old_connections()
+            self.flush()
+
+
+_buffer = None
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        _buffer = AuditBuffer(
+            max_size=getattr(settings, 'AUDIT_BUFFER_MAX_SIZE', 1000),
+            batch_size=getattr(settings, 'AUDIT_BUFFER_BATCH_SIZE', 100),
+            flush_ms=getattr(settings, 'AUDIT_BUFFER_FLUSH_MS', 500),
+        )
+    return _buffer
+
+
+def record(**fields):
+    """
+    Record an audit entry with the given AuditLog fields once the current
+    transaction commits (immediately outside a transaction).
+    """
+    entry = AuditLog(**fields)
+    if not getattr(settings, 'AUDIT_BUFFER_ENABLED', True):
+        entry.save()
+        return
+    transaction.on_commit(lambda: get_buffer().add(entry))
@@ -0,0 +1,70 @@
+"""
+Management command to move old audit log entries to the cold archive.
+Run: python manage.py archive_audit_logs --days 180
+
+Entries are appended to compressed monthly segments (see audit/archive.py)
+and deleted from the database in batches.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from audit.models import AuditLog
+
+
+class Command(BaseCommand):
+    help = 'Archive audit log entries older than N days into compressed monthly segments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Archive entries older than this many days (default: AUDIT_ARCHIVE_AFTER_DAYS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Entries written and deleted per batch (default: 1000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many entries would be archived per month without moving them',
+        )
+
+    def handle(self, *args, **options):
+        from audit.archive import archive_before
+
+        days = options['days'] if options['days'] is not None else settings.AUDIT_ARCHIVE_AFTER_DAYS
+        if days < 1:
+            raise CommandError('--days must be at least 1.')
+        cutoff = timezone.now() - timedelta(days=days)
+
+        if options['dry_run']:
+            months = (
+                AuditLog.objects.filter(timestamp__lt=cutoff)
+                .annotate(month=TruncMonth('timestamp')).values('month')
+                .annotate(count=Count('id')).order_by('month')
+            )
+            total = 0
+            for row in months:
+                self.stdout.write(f'  {row["month"]:%Y-%m}: {row["count"]} entries')
+                total += row['count']
+            self.stdout.write(self.style.WARNING(
+                f'Dry run: {total} entries older than {days} days would be archived.'
+            ))
+            return
+
+        archived = archive_before(cutoff, batch_size=options['batch_size'])
+        for month, count in sorted(archived.items()):
+            self.stdout.write(f'  {month}: {count} entries')
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {sum(archived.values())} entries older than {days} days '
+            f'to {settings.AUDIT_ARCHIVE_DIR}.'
+        ))
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:47
+
+from django.conf import settings
+from django.db import OperationalError, migrations, models
+
+
+FTS_SQL = [
+    "CREATE VIRTUAL TABLE audit_auditlog_fts USING fts5("
+    "object_name, description, content='audit_auditlog', content_rowid='id')",
+    "CREATE TRIGGER audit_auditlog_fts_ai AFTER INSERT ON audit_auditlog BEGIN "
+    "INSERT INTO audit_auditlog_fts(rowid, object_name, description) "
+    "VALUES (new.id, new.object_name, new.description); END",
+    "CREATE TRIGGER audit_auditlog_fts_ad AFTER DELETE ON audit_auditlog BEGIN "
+    "INSERT INTO audit_auditlog_fts(audit_auditlog_fts, rowid, object_name, description) "
+    "VALUES ('delete', old.id, old.object_name, old.description); END",
+    "CREATE TRIGGER audit_auditlog_fts_au AFTER UPDATE ON audit_auditlog BEGIN "
+    "INSERT INTO audit_auditlog_fts(audit_auditlog_fts, rowid, object_name, description) "
+    "VALUES ('delete', old.id, old.object_name, old.description); "
+    "INSERT INTO audit_auditlog_fts(rowid, object_name, description) "
+    "VALUES (new.id, new.object_name, new.description); END",
+    "INSERT INTO audit_auditlog_fts(audit_auditlog_fts) VALUES ('rebuild')",
+]
+
+
+def gin_index():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+    return GinIndex(SearchVector('object_name', 'description', config='simple'), name='audit_search_gin')
+
+
+def create_search_index(apps, schema_editor):
+    """GIN index on PostgreSQL, FTS5 table on SQLite; other backends search with icontains"""
+    AuditLog = apps.get_model('audit', 'AuditLog')
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(AuditLog, gin_index())
+    elif schema_editor.connection.vendor == 'sqlite':
+        try:
+            schema_editor.execute(FTS_SQL[0])
+        except OperationalError:
+            return  # SQLite built without FTS5
+        for statement in FTS_SQL[1:]:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    AuditLog = apps.get_model('audit', 'AuditLog')
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(AuditLog, gin_index())
+    elif schema_editor.connection.vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS audit_auditlog_fts_{suffix}')
+        schema_editor.execute('DROP TABLE IF EXISTS audit_auditlog_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0002_audit_timestamp_default'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='auditlog',
+            options={'ordering': ['-timestamp', '-id']},
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='audit_audit_timesta_901180_idx',
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['-timestamp', '-id'], name='audit_audit_timesta_bb2b35_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 import json
 
 User = get_user_model()
@@ -23,15 +24,16 @@ class AuditLog(models.Model):
     content_type = models.ForeignKey(ContentType, on_delete=models.SET_NULL, null=True, blank=True)
     object_id = models.CharField(max_length=255, blank=True)
     object_name = models.CharField(max_length=255, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Set when the action happens, not when a buffered entry is written
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     changes = models.JSONField(null=True, blank=True, help_text="Track what changed")
     description = models.TextField(blank=True)
     
     class Meta:
-        ordering = ['-timestamp']
+        ordering = ['-timestamp', '-id']
         indexes = [
-            models.Index(fields=['-timestamp']),
+            models.Index(fields=['-timestamp', '-id']),
             models.Index(fields=['user', '-timestamp']),
             models.Index(fields=['action', '-timestamp']),
         ]
@@ -0,0 +1,157 @@
+"""
+Full-text search and keyset paging for the audit trail.
+
+Text search runs on an index instead of ``icontains`` scans:
+
+* PostgreSQL: a GIN index over ``to_tsvector('simple', object_name || ' '
+  || description)``, queried with prefix terms.
+* SQLite: the ``audit_auditlog_fts`` FTS5 table kept in sync by triggers.
+
+Both are created by migration 0003. Other databases, or SQLite builds
+without FTS5, fall back to ``icontains``.
+
+Pages are addressed by a (timestamp, id) cursor rather than an offset, so
+each page is one index range scan however deep it is.
+"""
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+FTS_TABLE = 'audit_auditlog_fts'
+FTS_TRIGGERS = ('ai', 'ad', 'au')
+PAGE_SIZE = 50
+MAX_MATCHING_USERS = 200
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_fts_available = None
+
+
+def _sqlite_fts_available():
+    """
+    Whether the FTS5 table and all three of its sync triggers exist. SQLite
+    migrations that rebuild audit_auditlog drop its triggers, and a stale
+    index must not be searched.
+    """
+    global _fts_available
+    if _fts_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE (type = 'table' AND name = %s) "
+                "OR (type = 'trigger' AND name IN (%s, %s, %s))",
+                [FTS_TABLE] + [f'{FTS_TABLE}_{suffix}' for suffix in FTS_TRIGGERS],
+            )
+            _fts_available = cursor.fetchone()[0] == 1 + len(FTS_TRIGGERS)
+    return _fts_available
+
+
+def search_vector():
+    """The expression covered by the PostgreSQL GIN index"""
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector('object_name', 'description', config='simple')
+
+
+def matching_user_ids(text):
+    """Ids of users whose username contains ``text``, resolved once"""
+    return list(
+        get_user_model().objects.filter(username__icontains=text)
+        .values_list('id', flat=True)[:MAX_MATCHING_USERS]
+    )
+
+
+def text_filter(text):
+    """Q matching entries whose object name or description contains the words of ``text``"""
+    words = re.findall(r'\w+', text)
+    if not words:
+        return Q()
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery
+        query = SearchQuery(' & '.join(f"'{word}':*" for word in words), config='simple', search_type='raw')
+        return Q(id__in=_search_ids(query))
+    if connection.vendor == 'sqlite' and _sqlite_fts_available():
+        match = ' '.join(f'"{word}"*' for word in words)
+        return Q(id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]))
+    condition = Q()
+    for word in words:
+        condition &= Q(object_name__icontains=word) | Q(description__icontains=word)
+    return condition
+
+
+def _search_ids(query):
+    from .models import AuditLog
+    return AuditLog.objects.annotate(document=search_vector()).filter(document=query).values('id')
+
+
+def search(queryset, text):
+    """Entries matching ``text`` in their object name, description or username"""
+    condition = text_filter(text)
+    user_ids = matching_user_ids(text)
+    if user_ids:
+        condition |= Q(user_id__in=user_ids)
+    return queryset.filter(condition)
+
+
+def encode_cursor(log):
+    delta = log.timestamp - _EPOCH
+    return f'{(delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds}-{log.id}'
+
+
+def decode_cursor(cursor):
+    """(timestamp, id) from a cursor string, or None if it is malformed"""
+    match = re.fullmatch(r'(-?\d+)-(\d+)', cursor or '')
+    if not match:
+        return None
+    return _EPOCH + timedelta(microseconds=int(match.group(1))), int(match.group(2))
+
+
+def keyset_page(queryset, before=None, after=None, size=PAGE_SIZE):
+    """
+    One page of ``queryset`` newest first, starting below the ``before``
+    cursor or ending above the ``after`` cursor. Returns ``(logs,
+    previous_cursor, next_cursor)``; cursors are None at either end.
+    """
+    newest_first = queryset.order_by('-timestamp', '-id')
+    position = decode_cursor(after) if after else decode_cursor(before)
+    if after and position:
+        timestamp, log_id = position
+        logs = list(
+            queryset.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=log_id))
+            .order_by('timestamp', 'id')[:size + 1]
+        )
+        has_newer = len(logs) > size
+        logs = logs[:size][::-1]
+        has_older = True
+    else:
+        if position:
+            timestamp, log_id = position
+            newest_first = newest_first.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=log_id))
+        logs = list(newest_first[:size + 1])
+        has_older = len(logs) > size
+        logs = logs[:size]
+        has_newer = position is not None
+    if not logs:
+        return logs, None, None
+    return (
+        logs,
+        encode_cursor(logs[0]) if has_newer else None,
+        encode_cursor(logs[-1]) if has_older else None,
+    )
+
+
+def estimated_count():
+    """
+    Number of audit entries. PostgreSQL reads the planner's estimate, which
+    is exact enough for a header and avoids scanning the table.
+    """
+    from .models import AuditLog
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [AuditLog._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+    return AuditLog.objects.count()
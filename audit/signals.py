@@ -1,6 +1,6 @@
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.dispatch import receiver
-from .models import AuditLog
+from .buffer import record
 
 
 def get_client_ip(request):
@@ -52,7 +52,7 @@ def log_user_login(sender, request, user, **kwargs):
     ip_address = get_client_ip(request)
     browser, os_name = get_browser_info(request)
     
-    AuditLog.objects.create(
+    record(
         user=user,
         action='LOGIN',
         object_name=f'{user.get_full_name() or user.username}',
@@ -83,7 +83,7 @@ def log_user_logout(sender, request, user, **kwargs):
         else:
             duration_text = f' (session ~{minutes}m)'
     
-    AuditLog.objects.create(
+    record(
         user=user,
         action='LOGOUT',
         object_name=f'{user.get_full_name() or user.username}',
@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from audit import buffer
+from audit.buffer import AuditBuffer
+from audit.models import AuditLog
+
+
+def entries(*names):
+    return [AuditLog(action='UPDATE', object_name=name) for name in names]
+
+
+# The flush thread runs outside any transaction, and closing the connection
+# inside a TestCase transaction would only mark it for rollback
+class AuditBufferFlushTests(TransactionTestCase):
+    def setUp(self):
+        self.buffer = AuditBuffer(batch_size=2)
+
+    def queue(self, *names):
+        for entry in entries(*names):
+            self.buffer.queue.put(entry)
+
+    def test_flush_writes_everything_queued_in_batches(self):
+        self.queue('a', 'b', 'c')
+
+        with mock.patch.object(AuditLog.objects, 'bulk_create', wraps=AuditLog.objects.bulk_create) as bulk_create:
+            self.assertEqual(self.buffer.flush(), 3)
+
+        self.assertEqual(bulk_create.call_count, 2)
+        self.assertEqual(sorted(AuditLog.objects.values_list('object_name', flat=True)), ['a', 'b', 'c'])
+        self.assertTrue(self.buffer.queue.empty())
+
+    def test_failed_batch_is_retried_on_a_fresh_connection(self):
+        self.queue('a', 'b')
+        bulk_create = AuditLog.objects.bulk_create
+        attempts = []
+
+        def fail_once(batch):
+            attempts.append(len(batch))
+            if len(attempts) == 1:
+                raise Exception('connection lost')
+            return bulk_create(batch)
+
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=fail_once), \
+                mock.patch.object(buffer.connection, 'close', wraps=buffer.connection.close) as close:
+            with self.assertLogs('audit.buffer', 'WARNING'):
+                self.assertEqual(self.buffer.flush(), 2)
+
+        self.assertEqual(attempts, [2, 2])
+        self.assertEqual(close.call_count, 1)
+        self.assertEqual(sorted(AuditLog.objects.values_list('object_name', flat=True)), ['a', 'b'])
+
+    def test_batch_that_keeps_failing_is_saved_row_by_row(self):
+        self.queue('a', 'bad', 'c')
+        save = AuditLog.save
+
+        def save_unless_bad(entry, *args, **kwargs):
+            if entry.object_name == 'bad':
+                raise ValueError('unsaveable')
+            return save(entry, *args, **kwargs)
+
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=Exception('insert failed')), \
+                mock.patch.object(AuditLog, 'save', save_unless_bad):
+            with self.assertLogs('audit.buffer', 'WARNING') as logs:
+                self.assertEqual(self.buffer.flush(), 2)
+
+        # Only the entry that cannot be saved on its own is lost, and it is logged
+        self.assertEqual(sorted(AuditLog.objects.values_list('object_name', flat=True)), ['a', 'c'])
+        self.assertEqual(sum('Dropped audit log entry' in line for line in logs.output), 1)
+        self.assertTrue(self.buffer.queue.empty())
+
+
+class AuditBufferQueueTests(TestCase):
+    def test_full_queue_writes_through(self):
+        audit_buffer = AuditBuffer(max_size=1)
+        with mock.patch.object(audit_buffer, '_ensure_started'):
+            for entry in entries('queued', 'overflow'):
+                audit_buffer.add(entry)
+
+        self.assertEqual(list(AuditLog.objects.values_list('object_name', flat=True)), ['overflow'])
+        self.assertEqual(audit_buffer.queue.qsize(), 1)
+
+    def test_record_waits_for_commit(self):
+        audit_buffer = AuditBuffer()
+        with mock.patch.object(buffer, 'get_buffer', return_value=audit_buffer), \
+                mock.patch.object(audit_buffer, '_ensure_started'):
+            with self.captureOnCommitCallbacks(execute=True):
+                buffer.record(action='CREATE', object_name='sale')
+                self.assertTrue(audit_buffer.queue.empty())
+
+        self.assertEqual(audit_buffer.queue.get_nowait().object_name, 'sale')
+
+    @override_settings(AUDIT_BUFFER_ENABLED=False)
+    def test_disabled_buffer_writes_inline(self):
+        with transaction.atomic():
+            buffer.record(action='CREATE', object_name='sale')
+
+        self.assertTrue(AuditLog.objects.filter(object_name='sale').exists())
@@ -1,5 +1,5 @@
 from django.contrib.contenttypes.models import ContentType
-from .models import AuditLog
+from .buffer import record
 
 
 def get_client_ip(request):
@@ -36,7 +36,7 @@ def log_action(request, action, obj=None, object_name='', description='', change
         except Exception:
             pass
     
-    AuditLog.objects.create(
+    record(
         user=user,
         action=action,
         content_type=content_type,
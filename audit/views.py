@@ -1,7 +1,7 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.http import JsonResponse
-from django.db.models import Q
+from django.utils.http import urlencode
 from .models import AuditLog
 
 
@@ -19,40 +19,81 @@ def audit_trail_view(request):
     user_filter = request.GET.get('user', '').strip()
     action_filter = request.GET.get('action', '').strip()
     search = request.GET.get('search', '').strip()
+    archive_filter = request.GET.get('archive', '').strip()
+    
+    # Archived months (see audit/archive.py) are searched in their segments
+    from .archive import ARCHIVE_SEARCH_LIMIT, read_index, search_archive
+    archive_index = read_index()
+    if archive_filter and archive_filter != 'all' and archive_filter not in archive_index:
+        archive_filter = ''
     
     # Build query
-    logs = AuditLog.objects.all()
+    from .search import estimated_count, keyset_page, matching_user_ids, search as search_logs
+    logs = AuditLog.objects.select_related('user', 'content_type')
     
     if user_filter:
-        logs = logs.filter(user__username__icontains=user_filter)
+        logs = logs.filter(user_id__in=matching_user_ids(user_filter))
     
     if action_filter:
         logs = logs.filter(action=action_filter)
     
     if search:
-        logs = logs.filter(
-            Q(object_name__icontains=search) |
-            Q(description__icontains=search) |
-            Q(user__username__icontains=search)
-        )
+        logs = search_logs(logs, search)
+    
+    # Action codes for the filter dropdown
+    actions = [code for code, _ in AuditLog.ACTION_CHOICES]
     
-    # Get distinct actions for filter dropdown
-    actions = AuditLog.objects.values_list('action', flat=True).distinct()
+    page_obj = None
+    previous_cursor = next_cursor = None
+    archive_truncated = False
+    if archive_filter:
+        archived = search_archive(
+            month=None if archive_filter == 'all' else archive_filter,
+            user=user_filter,
+            action=action_filter,
+            search=search,
+        )
+        archive_truncated = len(archived) >= ARCHIVE_SEARCH_LIMIT
+        actions = sorted(set(actions) | {a for entry in archive_index.values() for a in entry['actions']})
+        
+        # Pagination
+        from django.core.paginator import Paginator
+        paginator = Paginator(archived, 50)
+        page_number = request.GET.get('page', 1)
+        page_obj = paginator.get_page(page_number)
+        page_logs = page_obj
+        total_logs = paginator.count
+    else:
+        # Keyset pagination: each page is one index range scan, however deep
+        page_logs, previous_cursor, next_cursor = keyset_page(
+            logs,
+            before=request.GET.get('before'),
+            after=request.GET.get('after'),
+        )
+        # Counting every match defeats the index, so only the whole table is counted
+        filtered = user_filter or action_filter or search
+        total_logs = None if filtered else estimated_count()
     
-    # Pagination
-    from django.core.paginator import Paginator
-    paginator = Paginator(logs, 50)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    filter_query = urlencode({
+        key: value for key, value in (
+            ('user', user_filter), ('action', action_filter), ('search', search), ('archive', archive_filter),
+        ) if value
+    })
     
     context = {
         'page_obj': page_obj,
-        'logs': page_obj,
+        'logs': page_logs,
+        'previous_cursor': previous_cursor,
+        'next_cursor': next_cursor,
+        'filter_query': filter_query,
         'actions': actions,
         'user_filter': user_filter,
         'action_filter': action_filter,
         'search': search,
-        'total_logs': paginator.count,
+        'archive_filter': archive_filter,
+        'archive_months': sorted(archive_index.items(), reverse=True),
+        'archive_truncated': archive_truncated,
+        'total_logs': total_logs,
     }
     
     return render(request, 'audit/audit_trail.html', context)
@@ -40,4 +40,4 @@ if [ -f "data_enhanced.json" ]; then
     python manage.py fix_db_sequences
 fi
 
-echo "==> Build complete! Forecast generation will run automatically on first dashboard access."
+echo "==> Build complete! Forecast generation is queued on first dashboard access and run by run_worker."
@@ -2,7 +2,7 @@ from django.shortcuts import render
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from sales.models import Sale
-from inventory.models import Stock
+from inventory.models import Stock, StockProjection
 from forecasting.models import Forecast
 from .models import DashboardMetric
 from django.db.models import Sum, Count, F
@@ -45,6 +45,9 @@ class DashboardView(LoginRequiredMixin, TemplateView):
 
         # Inventory metrics
         low_stock_items = Stock.objects.filter(quantity__lte=F('reorder_level'))
+        projected_stockouts = StockProjection.objects.filter(
+            stockout_date__lte=today + timedelta(days=7)
+        ).select_related('product').order_by('stockout_date')
 
         # Forecast summary
         upcoming_forecasts = Forecast.objects.filter(forecast_date__gte=today)[:5]
@@ -79,6 +82,8 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             'sales_count': total_sales_current['count'] or 0,
             'recent_sales': recent_sales,
             'low_stock_count': low_stock_items.count(),
+            'projected_stockout_count': projected_stockouts.count(),
+            'projected_stockouts': projected_stockouts[:5],
             'upcoming_forecasts': upcoming_forecasts,
             'sales_change': round(sales_change, 1),
             'seven_day_sales': json.dumps(seven_day_sales),
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ForecastingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'forecasting'
+
+    def ready(self):
+        import forecasting.signals  # noqa
@@ -0,0 +1,203 @@
+"""
+Rolling-origin backtesting over the shared demand matrix.
+
+The demand matrix is handed to each worker process once (pool initializer)
+and tasks only carry (algorithm, fold, rows), so folds and product chunks
+run in parallel without re-querying or re-pickling the sales history.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+from django.db import connections
+from django.utils import timezone
+
+from forecasting.baselines import BASELINE_FORECASTERS
+from forecasting.engines import ENGINES, forecast_matrix
+from forecasting.models import BacktestResult, BacktestRun
+
+
+_shared = {}
+
+
+def _init_worker(values, start_date):
+    _shared['values'] = values
+    _shared['start_date'] = start_date
+
+
+def fold_origins(n_days, folds, horizon, step=None):
+    """
+    Training cut-offs for each fold, oldest first. Fold k trains on days
+    ``[0, origin)`` and is scored on ``[origin, origin + horizon)``.
+    """
+    step = step or horizon
+    last = n_days - horizon
+    origins = [last - step * (folds - 1 - k) for k in range(folds)]
+    if origins[0] <= 0:
+        raise ValueError(
+            f'Not enough history ({n_days} days) for {folds} folds of {horizon} days'
+        )
+    return origins
+
+
+def _run_task(algorithm, origin, rows, horizon):
+    values = _shared['values']
+    started = time.perf_counter()
+    forecasts = forecast_matrix(
+        algorithm, values[rows, :origin], _shared['start_date'], horizon
+    )
+    return algorithm, origin, rows, forecasts, time.perf_counter() - started
+
+
+def _tasks(algorithms, origins, n_rows, chunk_size):
+    all_rows = np.arange(n_rows)
+    for algorithm in algorithms:
+        for origin in origins:
+            if algorithm in BASELINE_FORECASTERS:
+                # Vectorized: one task covers the whole catalog
+                yield algorithm, origin, all_rows
+            else:
+                for lo in range(0, n_rows, chunk_size):
+                    yield algorithm, origin, all_rows[lo:lo + chunk_size]
+
+
+def run_backtest(demand, algorithms, folds=3, horizon=30, step=None, workers=None, chunk_size=8):
+    """
+    Backtest every algorithm on every product of ``demand``.
+
+    Returns ``{algorithm: metrics}`` where each metric is an array with one
+    entry per product row: ``mae``, ``mape``, ``wape``, ``bias`` (NaN where
+    undefined) and ``fit_seconds`` (fitting time attributed per product).
+    """
+    values = demand.values
+    n, n_days = values.shape
+    origins = fold_origins(n_days, folds, horizon, step)
+
+    sums = {
+        algorithm: {
+            'abs_err': np.zeros(n), 'err': np.zeros(n), 'actual': np.zeros(n),
+            'pct_err': np.zeros(n), 'pct_days': np.zeros(n), 'days': np.zeros(n),
+            'seconds': np.zeros(n),
+        }
+        for algorithm in algorithms
+    }
+
+    def collect(result):
+        algorithm, origin, rows, forecasts, elapsed = result
+        actual = values[rows, origin:origin + horizon]
+        valid = ~np.isnan(forecasts)
+        err = np.where(valid, forecasts - actual, 0.0)
+        sold = valid & (actual > 0)
+        s = sums[algorithm]
+        s['abs_err'][rows] += np.abs(err).sum(axis=1)
+        s['err'][rows] += err.sum(axis=1)
+        s['actual'][rows] += np.where(valid, actual, 0.0).sum(axis=1)
+        s['pct_err'][rows] += np.divide(
+            np.abs(err), actual, out=np.zeros_like(err), where=sold
+        ).sum(axis=1)
+        s['pct_days'][rows] += sold.sum(axis=1)
+        s['days'][rows] += valid.sum(axis=1)
+        s['seconds'][rows] += elapsed / len(rows)
+
+    tasks = [
+        (algorithm, origin, rows, horizon)
+        for algorithm, origin, rows in _tasks(algorithms, origins, n, chunk_size)
+    ]
+    if workers == 1:
+        _init_worker(values, demand.start_date)
+        for task in tasks:
+            collect(_run_task(*task))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(values, demand.start_date),
+        ) as pool:
+            futures = [pool.submit(_run_task, *task) for task in tasks]
+            for future in futures:
+                collect(future.result())
+
+    metrics = {}
+    for algorithm, s in sums.items():
+        with np.errstate(divide='ignore', invalid='ignore'):
+            metrics[algorithm] = {
+                'mae': s['abs_err'] / s['days'],
+                'mape': s['pct_err'] / s['pct_days'],
+                'wape': s['abs_err'] / s['actual'],
+                'bias': s['err'] / s['days'],
+                'fit_seconds': s['seconds'],
+            }
+        for key in ('wape', 'mape'):
+            metrics[algorithm][key][~np.isfinite(metrics[algorithm][key])] = np.nan
+    return metrics
+
+
+def scored_window(demand, folds, horizon, step=None):
+    """First and last date scored by the backtest"""
+    origins = fold_origins(demand.values.shape[1], folds, horizon, step)
+    return (
+        demand.start_date + timedelta(days=origins[0]),
+        demand.start_date + timedelta(days=origins[-1] + horizon - 1),
+    )
+
+
+def store_results(run, demand, metrics):
+    """Bulk-insert one BacktestResult per (product, algorithm) with a defined error"""
+    results = []
+    for algorithm, m in metrics.items():
+        for i, product_id in enumerate(demand.product_ids):
+            if np.isnan(m['mae'][i]):
+                continue
+            results.append(BacktestResult(
+                run=run,
+                product_id=int(product_id),
+                algorithm=algorithm,
+                mae=float(m['mae'][i]),
+                mape=None if np.isnan(m['mape'][i]) else float(m['mape'][i]),
+                wape=None if np.isnan(m['wape'][i]) else float(m['wape'][i]),
+                bias=float(m['bias'][i]),
+                fit_seconds=float(m['fit_seconds'][i]),
+            ))
+    BacktestResult.objects.bulk_create(results, batch_size=1000)
+    return results
+
+
+def run_tournament(demand, expensive_product_ids, folds=3, horizon=30, workers=None):
+    """
+    Backtest all baselines on every product and the expensive engines on
+    ``expensive_product_ids`` only, store the results under a new
+    BacktestRun and return ``(run, metrics)`` with one row per product of
+    ``demand`` (NaN where an algorithm was not evaluated).
+    """
+    run = BacktestRun.objects.create(
+        folds=folds,
+        horizon_days=horizon,
+        history_days=demand.values.shape[1],
+    )
+    connections.close_all()
+    started = time.perf_counter()
+
+    metrics = run_backtest(
+        demand, list(BASELINE_FORECASTERS),
+        folds=folds, horizon=horizon, workers=workers,
+    )
+    expensive = demand.subset(expensive_product_ids)
+    if len(expensive.product_ids):
+        rows = np.array([demand.row_index()[int(pid)] for pid in expensive.product_ids])
+        engine_metrics = run_backtest(
+            expensive, list(ENGINES),
+            folds=folds, horizon=horizon, workers=workers,
+        )
+        for algorithm, m in engine_metrics.items():
+            metrics[algorithm] = {}
+            for key, values in m.items():
+                full = np.full(len(demand.product_ids), np.nan)
+                full[rows] = values
+                metrics[algorithm][key] = full
+
+    store_results(run, demand, metrics)
+    run.finished_at = timezone.now()
+    run.duration_seconds = time.perf_counter() - started
+    run.save(update_fields=['finished_at', 'duration_seconds'])
+    return run, metrics
@@ -0,0 +1,89 @@
+"""
+Shared daily demand matrix for the forecasting engines.
+
+Sales are aggregated once into a dense products x days NumPy array so that
+every engine (baselines, backtests, projections) works on the same data
+instead of re-querying sales per product.
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from sales.models import Sale
+
+
+DEFAULT_HISTORY_DAYS = 365
+
+
+@dataclass
+class DemandMatrix:
+    """Daily units sold, one row per product and one column per day."""
+    product_ids: np.ndarray
+    start_date: date
+    values: np.ndarray
+
+    @property
+    def end_date(self):
+        return self.start_date + timedelta(days=self.values.shape[1] - 1)
+
+    @property
+    def dates(self):
+        return [self.start_date + timedelta(days=i) for i in range(self.values.shape[1])]
+
+    def row_index(self):
+        """Map product id -> row number"""
+        return {int(pid): i for i, pid in enumerate(self.product_ids)}
+
+    def subset(self, product_ids):
+        """Return a matrix restricted to the given products (in the given order)"""
+        index = self.row_index()
+        rows = [index[int(pid)] for pid in product_ids if int(pid) in index]
+        return DemandMatrix(
+            product_ids=self.product_ids[rows],
+            start_date=self.start_date,
+            values=self.values[rows],
+        )
+
+
+def build_demand_matrix(product_ids=None, end_date=None, history_days=DEFAULT_HISTORY_DAYS):
+    """
+    Build the daily demand matrix from sales in a single grouped query.
+
+    Only products with at least one sale in the window get a row unless
+    ``product_ids`` is given, in which case every requested product gets a
+    row (all zeros when it has no sales).
+    """
+    if end_date is None:
+        end_date = timezone.now().date() - timedelta(days=1)
+    start_date = end_date - timedelta(days=history_days - 1)
+
+    sales = Sale.objects.filter(
+        sale_date__date__gte=start_date,
+        sale_date__date__lte=end_date,
+    )
+    if product_ids is not None:
+        sales = sales.filter(product_id__in=list(product_ids))
+
+    rows = sales.annotate(day=TruncDate('sale_date')).values(
+        'product_id', 'day'
+    ).annotate(total=Sum('quantity')).values_list('product_id', 'day', 'total')
+    rows = list(rows)
+
+    if product_ids is not None:
+        ids = np.array(sorted({int(pid) for pid in product_ids}), dtype=np.int64)
+    else:
+        ids = np.array(sorted({pid for pid, _, _ in rows}), dtype=np.int64)
+
+    values = np.zeros((len(ids), history_days), dtype=np.float64)
+    if rows and len(ids):
+        index = {int(pid): i for i, pid in enumerate(ids)}
+        r = np.fromiter((index[pid] for pid, _, _ in rows), dtype=np.int64, count=len(rows))
+        c = np.fromiter(((day - start_date).days for _, day, _ in rows), dtype=np.int64, count=len(rows))
+        q = np.fromiter((total for _, _, total in rows), dtype=np.float64, count=len(rows))
+        np.add.at(values, (r, c), q)
+
+    return DemandMatrix(product_ids=ids, start_date=start_date, values=values)
@@ -0,0 +1,159 @@
+"""
+Per-product forecasting engines (XGBoost and Prophet).
+
+Each engine takes one daily demand series (a row of the shared demand
+matrix), the date of its first element and a horizon, and returns the full
+horizon path as a NumPy array starting the day after the series ends. The
+model is fitted once and the whole path comes from a single ``predict``.
+pandas, XGBoost and Prophet are imported inside the engines so that
+loading this module (and the commands using it) stays cheap.
+"""
+import logging
+from datetime import timedelta
+
+import numpy as np
+
+from forecasting.baselines import BASELINE_FORECASTERS
+
+
+# Prophet logs every Stan run at INFO level
+logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+
+MIN_HISTORY_DAYS = 14
+XGBOOST_MAX_ORIGINS = 365
+
+
+def _trim_leading_zeros(y, start_date):
+    """Drop the days before a product's first sale"""
+    nonzero = np.flatnonzero(y)
+    if len(nonzero) == 0:
+        return y[:0], start_date
+    first = int(nonzero[0])
+    return y[first:], start_date + timedelta(days=first)
+
+
+def _origin_features(y, origins):
+    """Features describing the series as of each forecast origin"""
+    csum = np.concatenate([[0.0], np.cumsum(y)])
+    csq = np.concatenate([[0.0], np.cumsum(y * y)])
+
+    def window_mean(n):
+        lo = np.maximum(origins + 1 - n, 0)
+        count = origins + 1 - lo
+        return (csum[origins + 1] - csum[lo]) / count, lo, count
+
+    mean_7, lo_7, count_7 = window_mean(7)
+    sq_7 = (csq[origins + 1] - csq[lo_7]) / count_7
+    std_7 = np.sqrt(np.maximum(sq_7 - mean_7 ** 2, 0))
+    mean_28, _, _ = window_mean(28)
+    return np.column_stack([y[origins], mean_7, std_7, mean_28])
+
+
+def _horizon_features(y, dates, origins, horizons):
+    """
+    Pair every origin with every horizon step: origin features plus the
+    step, the target day's calendar and the last observed same weekday.
+    """
+    import pandas as pd
+
+    base = _origin_features(y, origins)
+    o = np.repeat(origins, len(horizons))
+    h = np.tile(horizons, len(origins))
+    target_dates = dates[0] + pd.to_timedelta(o + h, unit='D')
+    same_weekday = y[np.maximum(o + h - 7 * ((h + 6) // 7), 0)]
+    return np.column_stack([
+        np.repeat(base, len(horizons), axis=0),
+        h,
+        target_dates.dayofweek,
+        target_dates.month,
+        same_weekday,
+    ]), o + h
+
+
+def xgboost_forecast(y, start_date, horizon):
+    """
+    Direct multi-horizon XGBoost.
+
+    One regressor is trained on (origin, step) pairs with the step as a
+    feature, then the whole horizon is scored with one batched ``predict``
+    over a horizon x features matrix built from the last origin.
+    """
+    import pandas as pd
+    import xgboost as xgb
+
+    y, start_date = _trim_leading_zeros(np.asarray(y, dtype=np.float64), start_date)
+    if len(y) < MIN_HISTORY_DAYS:
+        raise ValueError(f'Insufficient data ({len(y)} days)')
+
+    dates = pd.date_range(start_date, periods=len(y), freq='D')
+    horizons = np.arange(1, horizon + 1)
+
+    first_origin = max(6, len(y) - 1 - horizon - XGBOOST_MAX_ORIGINS)
+    origins = np.arange(first_origin, len(y) - 1)
+    X, targets = _horizon_features(y, dates, origins, horizons)
+    in_sample = targets < len(y)
+    X, targets = X[in_sample], targets[in_sample]
+
+    model = xgb.XGBRegressor(
+        n_estimators=100,
+        max_depth=5,
+        learning_rate=0.1,
+        random_state=42,
+        verbosity=0
+    )
+    model.fit(X, y[targets], verbose=False)
+
+    X_future, _ = _horizon_features(y, dates, np.array([len(y) - 1]), horizons)
+    return np.clip(model.predict(X_future), 0, None)
+
+
+def prophet_forecast(y, start_date, horizon):
+    """Prophet fit on the daily series; the future ``yhat`` path is the forecast"""
+    import pandas as pd
+    from prophet import Prophet
+
+    y, start_date = _trim_leading_zeros(np.asarray(y, dtype=np.float64), start_date)
+    if len(y) < MIN_HISTORY_DAYS:
+        raise ValueError(f'Insufficient data ({len(y)} days)')
+
+    df = pd.DataFrame({
+        'ds': pd.date_range(start_date, periods=len(y), freq='D'),
+        'y': y,
+    })
+    model = Prophet(
+        interval_width=0.95,
+        yearly_seasonality=len(y) >= 365,
+        weekly_seasonality=True,
+        daily_seasonality=False,
+        seasonality_mode='additive'
+    )
+    model.fit(df)
+    future = model.make_future_dataframe(periods=horizon, include_history=False)
+    forecast = model.predict(future)
+    return np.clip(forecast['yhat'].to_numpy(), 0, None)
+
+
+ENGINES = {
+    'xgboost': xgboost_forecast,
+    'prophet': prophet_forecast,
+}
+
+
+def forecast_matrix(algorithm, Y, start_date, horizon):
+    """
+    Forecast every row of a demand matrix with one algorithm.
+
+    Baselines run vectorized over the whole matrix; per-product engines are
+    fitted row by row and leave NaN in rows that cannot be fitted.
+    """
+    if algorithm in BASELINE_FORECASTERS:
+        return BASELINE_FORECASTERS[algorithm](Y, horizon)
+
+    engine = ENGINES[algorithm]
+    forecasts = np.full((len(Y), horizon), np.nan)
+    for i, row in enumerate(Y):
+        try:
+            forecasts[i] = engine(row, start_date, horizon)
+        except Exception:
+            continue
+    return forecasts
@@ -0,0 +1,180 @@
+"""
+Hierarchical forecasting over total -> category -> product.
+
+Instead of fitting a model per SKU, the expensive engine is fitted only on
+the category aggregates and the overall total, and products are forecast
+from those:
+
+* ``top_down`` splits each category forecast between its products by
+  their share of the category's recent sales.
+* ``mint`` reconciles base forecasts at every level (engine fits for the
+  aggregates, the cheap vectorized baseline for products) with the MinT
+  shrinkage estimator, weighting each level by its holdout error.
+
+Either way product forecasts add up to their category forecasts, and
+every product in a category gets one.
+"""
+import numpy as np
+
+from forecasting.baselines import forecast_baselines, holt_winters_weekly
+from forecasting.engines import forecast_matrix
+
+
+SHARE_DAYS = 90
+AGGREGATE_ENGINE = 'xgboost'
+# Floor for error variances so products with no recent sales keep W invertible
+MIN_VARIANCE = 1e-3
+
+
+def summing_matrix(categories):
+    """
+    Summing matrix S for the hierarchy: row 0 is the total, then one row per
+    category, then the identity for products. ``categories`` holds each
+    product's category. Returns ``(S, category_names)``.
+    """
+    names = sorted(set(categories))
+    position = {name: i for i, name in enumerate(names)}
+    n = len(categories)
+    membership = np.zeros((len(names), n))
+    membership[[position[c] for c in categories], np.arange(n)] = 1
+    return np.vstack([np.ones((1, n)), membership, np.eye(n)]), names
+
+
+def aggregate(values, categories):
+    """
+    The total and category rows of ``summing_matrix(categories) @ values``,
+    without building the product identity. Returns ``(rows, category_names)``.
+    """
+    names = sorted(set(categories))
+    position = {name: i for i, name in enumerate(names)}
+    totals = np.zeros((1 + len(names), values.shape[1]))
+    totals[0] = values.sum(axis=0)
+    np.add.at(totals, [1 + position[c] for c in categories], values)
+    return totals, names
+
+
+def base_forecasts(node_values, n_aggregates, start_date, horizon, engine=AGGREGATE_ENGINE):
+    """
+    Forecast every node: the engine for the first ``n_aggregates`` rows
+    (Holt-Winters where it cannot fit), default baselines for the rest.
+    """
+    forecasts = np.zeros((len(node_values), horizon))
+    aggregates = node_values[:n_aggregates]
+    fitted = forecast_matrix(engine, aggregates, start_date, horizon)
+    failed = np.isnan(fitted).any(axis=1)
+    if failed.any():
+        fitted[failed] = holt_winters_weekly(aggregates[failed], horizon)
+    forecasts[:n_aggregates] = fitted
+    _, forecasts[n_aggregates:] = forecast_baselines(node_values[n_aggregates:], horizon)
+    return forecasts
+
+
+def shrunk_covariance(residuals):
+    """
+    Covariance of forecast errors shrunk towards its diagonal with the
+    Schafer-Strimmer intensity, as used by MinT. ``residuals`` is
+    (nodes, observations).
+    """
+    e = residuals - residuals.mean(axis=1, keepdims=True)
+    t = e.shape[1]
+    variance = np.maximum((e ** 2).mean(axis=1), MIN_VARIANCE)
+    x = e / np.sqrt(variance)[:, None]
+    correlation = x @ x.T / t
+    # Estimated variance of each correlation entry
+    spread = ((x ** 2) @ (x ** 2).T - t * correlation ** 2) * t / (t - 1) ** 3
+    off_diagonal = ~np.eye(len(e), dtype=bool)
+    denominator = (correlation[off_diagonal] ** 2).sum()
+    intensity = np.clip(spread[off_diagonal].sum() / denominator, 0, 1) if denominator > 0 else 1.0
+    shrunk = correlation * (1 - intensity)
+    np.fill_diagonal(shrunk, 1.0)
+    scale = np.sqrt(variance)
+    return shrunk * scale[:, None] * scale[None, :]
+
+
+def mint_reconcile(base, summing, residuals):
+    """
+    Product-level forecasts P y_hat with P = (S' W^-1 S)^-1 S' W^-1, which
+    sum up exactly (S P y_hat) and minimise the total error variance.
+    """
+    w_inv_s = np.linalg.solve(shrunk_covariance(residuals), summing)
+    return np.linalg.solve(summing.T @ w_inv_s, w_inv_s.T @ base)
+
+
+def top_down(category_forecasts, categories, category_names, recent):
+    """
+    Split category forecasts between products by their share of recent
+    sales (equal shares in categories without recent sales).
+    """
+    position = {name: i for i, name in enumerate(category_names)}
+    rows = np.array([position[c] for c in categories])
+    category_sales = np.zeros(len(category_names))
+    np.add.at(category_sales, rows, recent)
+    category_size = np.bincount(rows, minlength=len(category_names))
+    share = np.where(
+        category_sales[rows] > 0,
+        recent / np.where(category_sales[rows] > 0, category_sales[rows], 1),
+        1.0 / category_size[rows],
+    )
+    return share[:, None] * category_forecasts[rows]
+
+
+def round_coherently(forecasts, categories):
+    """
+    Round to whole units so that each category's daily total stays its
+    rounded forecast (largest remainder), instead of rounding every small
+    product forecast down to zero.
+    """
+    rounded = np.floor(forecasts)
+    categories = np.asarray(categories)
+    days = np.arange(forecasts.shape[1])
+    for category in np.unique(categories):
+        rows = np.flatnonzero(categories == category)
+        missing = np.round(forecasts[rows].sum(axis=0)) - rounded[rows].sum(axis=0)
+        order = np.argsort(rounded[rows] - forecasts[rows], axis=0, kind='stable')
+        rank = np.empty_like(order)
+        rank[order, days] = np.arange(len(rows))[:, None]
+        rounded[rows] += rank < missing[None, :]
+    return rounded
+
+
+def hierarchical_forecast(demand, categories, horizon, method='mint', engine=AGGREGATE_ENGINE):
+    """
+    Forecast every product in ``demand`` through the category hierarchy.
+
+    ``categories`` holds the category of each row of the demand matrix.
+    Returns ``(forecasts, fits)``: a (products, horizon) array of whole
+    units and the number of engine fits made.
+    """
+    Y = demand.values
+
+    # MinT needs a holdout as long as the horizon to estimate errors from
+    if method == 'top_down' or Y.shape[1] < 2 * horizon:
+        aggregates, category_names = aggregate(Y, categories)
+        n_aggregates = len(aggregates)
+        base = base_forecasts(aggregates, n_aggregates, demand.start_date, horizon, engine)
+        recent = Y[:, -SHARE_DAYS:].sum(axis=1)
+        forecasts = top_down(base[1:], categories, category_names, recent)
+        return round_coherently(forecasts, categories), n_aggregates
+
+    # Products with no sales in the window add nothing to any aggregate and
+    # MinT would pin them at zero anyway (floored error variance), so only
+    # the others enter the dense reconciliation
+    active = Y.any(axis=1)
+    forecasts = np.zeros((len(Y), horizon))
+    if active.any():
+        active_categories = [c for c, keep in zip(categories, active) if keep]
+        summing, category_names = summing_matrix(active_categories)
+        n_aggregates = 1 + len(category_names)
+        node_values = summing @ Y[active]
+
+        # MinT weights each node by the errors of its base forecaster on the
+        # last ``horizon`` days of history
+        history, holdout = node_values[:, :-horizon], node_values[:, -horizon:]
+        residuals = holdout - base_forecasts(history, n_aggregates, demand.start_date, horizon, engine)
+        base = base_forecasts(node_values, n_aggregates, demand.start_date, horizon, engine)
+        forecasts[active] = mint_reconcile(base, summing, residuals)
+    else:
+        n_aggregates = 0
+    # Negative reconciled demand is not meaningful; clipping it is the only
+    # departure from exact coherence
+    return round_coherently(np.clip(forecasts, 0, None), categories), 2 * n_aggregates
@@ -0,0 +1,122 @@
+"""
+Database-backed job queue for work that must not run inside web workers.
+
+Web requests only ``enqueue`` a management command. A separate
+``run_worker`` process claims jobs with a conditional UPDATE (so only one
+worker can win a job), holds a time-limited lease renewed by a heartbeat
+thread, and re-claims jobs whose worker died before finishing.
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from forecasting.models import Job
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue(command, *args):
+    """Queue a command unless the same command is already queued or running"""
+    args = [str(arg) for arg in args]
+    pending = Job.objects.filter(command=command, args=args, status__in=['queued', 'running']).first()
+    if pending:
+        return pending
+    return Job.objects.create(command=command, args=args)
+
+
+def claim(worker_id, lease_seconds=LEASE_SECONDS):
+    """
+    Claim the oldest queued job, or a running job whose lease expired.
+    Returns the claimed Job or None.
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        Q(status='queued') | Q(status='running', lease_until__lt=now)
+    ).values_list('id', 'status', 'lease_until', 'attempts')[:10]
+
+    for job_id, status, lease_until, attempts in candidates:
+        current = Job.objects.filter(id=job_id, status=status, lease_until=lease_until)
+        if attempts >= MAX_ATTEMPTS:
+            current.update(
+                status='failed',
+                finished_at=now,
+                error=f'Gave up after {attempts} attempts (lease expired)',
+            )
+            continue
+        claimed = current.update(
+            status='running',
+            worker_id=worker_id,
+            started_at=now,
+            heartbeat_at=now,
+            lease_until=now + timedelta(seconds=lease_seconds),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+class Heartbeat(threading.Thread):
+    """Extend a job's lease every third of the lease until stopped"""
+
+    def __init__(self, job, lease_seconds=LEASE_SECONDS):
+        super().__init__(daemon=True)
+        self.job = job
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.lease_seconds / 3):
+                now = timezone.now()
+                Job.objects.filter(
+                    id=self.job.id, worker_id=self.job.worker_id, status='running'
+                ).update(
+                    heartbeat_at=now,
+                    lease_until=now + timedelta(seconds=self.lease_seconds),
+                )
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_job(job, lease_seconds=LEASE_SECONDS):
+    """Run a claimed job's command while heartbeating, then record the outcome"""
+    heartbeat = Heartbeat(job, lease_seconds)
+    heartbeat.start()
+    try:
+        call_command(job.command, *job.args)
+    except Exception:
+        logger.error(f'Job #{job.id} ({job.command}) failed', exc_info=True)
+        status, error = 'failed', traceback.format_exc()
+    else:
+        status, error = 'done', ''
+    finally:
+        heartbeat.stop()
+
+    # Only the lease holder may finish the job
+    Job.objects.filter(id=job.id, worker_id=job.worker_id, status='running').update(
+        status=status,
+        error=error,
+        finished_at=timezone.now(),
+        lease_until=None,
+    )
+    return status
@@ -1,17 +1,31 @@
 """
 Management command to automatically generate forecasts.
 This can be run manually or scheduled via cron/task scheduler.
+
+With --budget-seconds the tournament counts against the budget too: when
+its estimated duration does not fit, it is queued as its own
+``--tournament-only`` job for run_worker and the forecasts are refreshed
+with the current winners.
 """
+import time
+
 from django.core.management.base import BaseCommand
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from datetime import timedelta
-import pandas as pd
-import xgboost as xgb
-from prophet import Prophet
 
-from forecasting.models import Forecast, ForecastConfig
-from sales.models import Sale
+from forecasting.models import DirtyProduct, ForecastConfig, ForecastRun, ForecastSeries, ProductAlgorithm
+from sales.models import Product, Sale
+
+
+FORECAST_HORIZON_DAYS = 30
+HISTORY_DAYS = 730
+TOURNAMENT_FOLDS = 3
+BATCH_SIZE = 10
+
+# Assumed seconds per XGBoost/Prophet fit when estimating a tournament
+# before any backtest has been timed
+ENGINE_FIT_SECONDS = 2.0
 
 
 class Command(BaseCommand):
@@ -23,15 +37,78 @@ class Command(BaseCommand):
             action='store_true',
             help='Force regeneration even if forecasts were recently generated',
         )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only refit products whose sales, returns or price changed; keep the rest',
+        )
+        parser.add_argument(
+            '--tournament',
+            action='store_true',
+            help='Re-run the algorithm tournament for every product before forecasting',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Worker processes for tournament backtests (default: 1)',
+        )
+        parser.add_argument(
+            '--budget-seconds',
+            type=float,
+            default=None,
+            help='Stop starting new batches after this many seconds; the next run resumes',
+        )
+        parser.add_argument(
+            '--tournament-only',
+            action='store_true',
+            help='Only run the algorithm tournament (queued when a budgeted run cannot fit it)',
+        )
+        parser.add_argument(
+            '--products',
+            type=int,
+            nargs='*',
+            default=None,
+            help='Product ids for --tournament-only (default: every product with sales)',
+        )
+        parser.add_argument(
+            '--hierarchical',
+            choices=[value for value, _ in ForecastConfig.HIERARCHICAL_METHOD_CHOICES],
+            default=None,
+            help='Forecast category totals and split them down to products (default: the configured mode)',
+        )
 
     def handle(self, *args, **options):
         force = options.get('force', False)
-        
+        incremental = options['incremental']
+        started_at = timezone.now()
+        budget = options['budget_seconds']
+        deadline = time.monotonic() + budget if budget else None
+
         # Check if we should generate forecasts
         config = ForecastConfig.get_config()
-        
-        if not force and not config.should_generate():
-            days_since = (datetime.now().date() - config.last_generated.date()).days if config.last_generated else 'never'
+        hierarchical = options['hierarchical'] or config.hierarchical_method
+
+        if incremental:
+            dirty = list(
+                DirtyProduct.objects.filter(changed_at__lte=started_at)
+                .values_list('product_id', flat=True)
+            )
+            if not dirty:
+                self.stdout.write('No products changed since the last run.')
+                return
+            if hierarchical:
+                # A change moves the category shares, so refit whole categories
+                dirty = list(Product.objects.filter(
+                    category__in=Product.objects.filter(id__in=dirty).values('category')
+                ).values_list('id', flat=True))
+                # Only these categories are in the matrix, so its total node
+                # is partial. MinT would reconcile the refreshed products
+                # against that partial total; top-down only splits each
+                # (complete) category forecast, so incremental runs use it
+                hierarchical = 'top_down'
+        elif not force and not config.should_generate():
+            days_since = (timezone.now() - config.last_generated).days if config.last_generated else 'never'
             self.stdout.write(
                 self.style.WARNING(
                     f'Forecasts were generated {days_since} days ago. '
@@ -40,182 +117,315 @@ class Command(BaseCommand):
                 )
             )
             return
-        
-        self.stdout.write(self.style.NOTICE('Starting automatic forecast generation...'))
-        
+
+        # The forecasting stack (NumPy, and pandas/XGBoost/Prophet inside the
+        # engines) is only imported once there is work to do
+        from forecasting.baselines import BASELINE_FORECASTERS, choose_baselines
+        from forecasting.demand import build_demand_matrix
+        from forecasting.engines import ENGINES
+        from forecasting.scheduler import prioritize
+        from forecasting.selection import drifted_products
+        from forecasting.storage import build_series, trim_forecasts
+
+        if options['tournament_only']:
+            products = options['products']
+            if products is not None:
+                # Queued ids may have been deleted since
+                products = list(Product.objects.filter(id__in=products).values_list('id', flat=True))
+            demand = build_demand_matrix(
+                product_ids=products,
+                end_date=timezone.now().date() - timedelta(days=1),
+                history_days=HISTORY_DAYS,
+            )
+            self.tournament(
+                demand, self.top_products(), options['workers'],
+                config=ForecastConfig.get_config() if options['products'] is None else None,
+            )
+            return
+
+        # A full run either resumes the unfinished cycle or starts a new one
+        resuming = not incremental and not force and config.cycle_started_at is not None
+        if not incremental and not resuming:
+            config.cycle_started_at = started_at
+            config.save(update_fields=['cycle_started_at'])
+
+        if resuming:
+            self.stdout.write(self.style.NOTICE(
+                f'Resuming forecast generation started {config.cycle_started_at:%Y-%m-%d %H:%M}...'
+            ))
+        else:
+            self.stdout.write(self.style.NOTICE('Starting automatic forecast generation...'))
+
         today = timezone.now().date()
-        
-        # Clean up old forecasts
-        old_forecasts = Forecast.objects.filter(forecast_date__lt=today)
-        deleted_count = old_forecasts.count()
-        old_forecasts.delete()
-        self.stdout.write(f'Cleaned up {deleted_count} old forecasts.')
-        
-        # Get top 50 products with most sales
-        products = Sale.objects.values('product').annotate(
-            sale_count=models.Count('id')
-        ).order_by('-sale_count')[:50].values_list('product', flat=True)
-        
-        # Delete existing future forecasts for these products
-        Forecast.objects.filter(product__in=products, forecast_date__gte=today).delete()
-        
-        forecasts_generated = 0
-        errors = []
-        
-        for prod_id in products:
-            sales = Sale.objects.filter(product_id=prod_id).order_by('sale_date')
-            if not sales.exists():
-                continue
-                
-            df = pd.DataFrame(list(sales.values('sale_date', 'quantity')))
-            df['sale_date'] = pd.to_datetime(df['sale_date'])
-            df = df.groupby('sale_date')['quantity'].sum().reset_index()
-            df.columns = ['ds', 'y']
-            
-            if len(df) < 2:
-                errors.append(f'Product {prod_id}: Insufficient data ({len(df)} points)')
-                continue
-            
-            try:
-                xgboost_forecast = self.xgboost_forecast(df)
-                prophet_forecast = self.prophet_forecast(df)
-                
-                # Generate forecasts for next 30 days
-                for day_offset in range(0, 30):
-                    forecast_date = today + timedelta(days=day_offset)
-                    daily_xgb = int(xgboost_forecast * (0.85 + (day_offset % 7) * 0.05))
-                    daily_prophet = int(prophet_forecast * (0.85 + ((day_offset + 3) % 7) * 0.05))
-                    
-                    Forecast.objects.create(
-                        product_id=prod_id,
-                        forecast_date=forecast_date,
-                        predicted_quantity=daily_xgb,
-                        algorithm_used='xgboost'
-                    )
-                    Forecast.objects.create(
-                        product_id=prod_id,
-                        forecast_date=forecast_date,
-                        predicted_quantity=daily_prophet,
-                        algorithm_used='prophet'
-                    )
-                forecasts_generated += 60  # 30 days * 2 algorithms
-                
-            except Exception as e:
-                errors.append(f'Product {prod_id}: {str(e)}')
-        
-        # Update last generated timestamp
-        config.last_generated = timezone.now()
-        config.save()
-        
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'Successfully generated {forecasts_generated} forecasts for {len(products)} products.'
+
+        # Live accuracy has to be measured before past forecasts are deleted.
+        # Tournaments and drift checks only run at the start of a full cycle.
+        # Hierarchical runs make no per-product fits, so there is nothing to select.
+        new_cycle = not incremental and not resuming
+        full_tournament = new_cycle and not hierarchical and (options['tournament'] or config.tournament_due())
+        drifted = drifted_products(
+            today, config.generation_interval_days, config.drift_tolerance
+        ) if new_cycle and not hierarchical and not full_tournament else set()
+
+        # Clean up old forecasts (kept between full runs for drift checks)
+        if new_cycle:
+            deleted_count = trim_forecasts(before=today)
+            self.stdout.write(f'Cleaned up {deleted_count} old forecasts.')
+
+        top_products = self.top_products()
+
+        # Hierarchical runs split category totals over every product in the
+        # categories, so products with no sales in the window get a row too
+        if incremental:
+            product_ids = dirty
+        elif hierarchical:
+            product_ids = list(Product.objects.values_list('id', flat=True))
+        else:
+            product_ids = None
+        demand = build_demand_matrix(
+            product_ids=product_ids,
+            end_date=today - timedelta(days=1),
+            history_days=HISTORY_DAYS,
+        )
+        if incremental and not hierarchical:
+            # Changed products with no sales left in the window just lose
+            # their stale forecasts
+            sold = demand.values.sum(axis=1) > 0
+            trim_forecasts(product_ids=demand.product_ids[~sold].tolist(), from_date=today)
+            demand = demand.subset(demand.product_ids[sold])
+        rows = demand.row_index()
+        engine_fits = 0
+        engine_seconds = 0.0
+
+        # Tournament: backtest baselines everywhere and the expensive engines
+        # on top products, then keep the winner per product
+        tournament_products = None
+        if full_tournament:
+            tournament_products = demand
+        elif drifted:
+            tournament_products = demand.subset(sorted(drifted))
+        if tournament_products is not None and len(tournament_products.product_ids):
+            estimate = self.tournament_estimate(tournament_products, top_products, options['workers'])
+            if deadline is not None and time.monotonic() + estimate > deadline:
+                # Out of budget: backtest in a job of its own and forecast
+                # with the current winners now
+                from forecasting.jobs import enqueue
+                args = ['--tournament-only', '--workers', options['workers']]
+                if not full_tournament:
+                    args += ['--products', *tournament_products.product_ids.tolist()]
+                enqueue('auto_generate_forecast', *args)
+                self.stdout.write(self.style.WARNING(
+                    f'Tournament for {len(tournament_products.product_ids)} products '
+                    f'(~{estimate:.0f}s) does not fit the time budget; queued as a background job.'
+                ))
+            else:
+                self.tournament(tournament_products, top_products, options['workers'], config=config if full_tournament else None)
+
+        # Hierarchical mode: engines fitted on category and total aggregates
+        # only, split down to every product
+        hierarchical_paths = None
+        if hierarchical:
+            from forecasting.hierarchy import hierarchical_forecast
+
+            categories = dict(
+                Product.objects.filter(id__in=demand.product_ids.tolist()).values_list('id', 'category')
             )
+            fit_started = time.monotonic()
+            hierarchical_paths, fits = hierarchical_forecast(
+                demand,
+                [categories[int(pid)] for pid in demand.product_ids],
+                FORECAST_HORIZON_DAYS,
+                method=hierarchical,
+            )
+            engine_fits += fits
+            engine_seconds += time.monotonic() - fit_started
+            self.stdout.write(
+                f'Hierarchical forecast ({hierarchical}) for {len(set(categories.values()))} categories '
+                f'in {engine_seconds:.1f}s.'
+            )
+
+        # Products without a winner yet: both engines for top products,
+        # the default baseline for the long tail
+        winners = dict(
+            ProductAlgorithm.objects.filter(product_id__in=demand.product_ids.tolist())
+            .values_list('product_id', 'algorithm')
         )
-        
+        default_baselines = choose_baselines(demand.values)
+        plan = {}
+        for i, pid in enumerate(demand.product_ids):
+            pid = int(pid)
+            if hierarchical:
+                plan[pid] = ['hierarchical']
+            elif pid in winners:
+                plan[pid] = [winners[pid]]
+            elif pid in top_products:
+                plan[pid] = list(ENGINES)
+            else:
+                plan[pid] = [str(default_baselines[i])]
+
+        # Products already refreshed earlier in this cycle are done
+        if resuming:
+            done = ForecastSeries.objects.filter(
+                product__in=list(plan),
+                end_date__gte=today,
+                created_at__gte=config.cycle_started_at,
+            ).values_list('product_id', flat=True).distinct()
+            for pid in done:
+                plan.pop(pid, None)
+
+        # Baselines run once over the whole matrix, only for the algorithms
+        # some product uses (Holt-Winters is kept as engine fallback)
+        used_baselines = {a for algs in plan.values() for a in algs if a in BASELINE_FORECASTERS}
+        if any(a in ENGINES for algs in plan.values() for a in algs):
+            used_baselines.add('holt_winters')
+        baseline_paths = {
+            algorithm: BASELINE_FORECASTERS[algorithm](demand.values, FORECAST_HORIZON_DAYS)
+            for algorithm in used_baselines
+        }
+
+        order = prioritize(demand, list(plan), FORECAST_HORIZON_DAYS)
+        forecast_run = ForecastRun.objects.create(incremental=incremental)
+
+        errors = []
+        forecasts_generated = 0
+        refreshed = 0
+
+        # Each batch replaces its products' future forecasts in one
+        # transaction, so a run cut short leaves every product consistent
+        for lo in range(0, len(order), BATCH_SIZE):
+            batch = order[lo:lo + BATCH_SIZE]
+            if deadline is not None:
+                batch_fits = sum(a in ENGINES for pid in batch for a in plan[pid])
+                estimate = batch_fits * engine_seconds / engine_fits if engine_fits else 0.0
+                if time.monotonic() + estimate > deadline:
+                    break
+
+            new_series = []
+            for prod_id in batch:
+                row = rows[prod_id]
+                paths = {}
+                for algorithm in plan[prod_id]:
+                    if algorithm == 'hierarchical':
+                        paths[algorithm] = hierarchical_paths[row]
+                    elif algorithm in ENGINES:
+                        engine_fits += 1
+                        fit_started = time.monotonic()
+                        try:
+                            paths[algorithm] = ENGINES[algorithm](demand.values[row], demand.start_date, FORECAST_HORIZON_DAYS)
+                        except Exception as e:
+                            errors.append(f'Product {prod_id} ({algorithm}): {str(e)}')
+                            # A product whose engine failed gets only the
+                            # batched Holt-Winters path, so Forecast.best()
+                            # never sees it next to another engine's series
+                            paths = {'holt_winters': baseline_paths['holt_winters'][row]}
+                            engine_seconds += time.monotonic() - fit_started
+                            break
+                        engine_seconds += time.monotonic() - fit_started
+                    else:
+                        paths[algorithm] = baseline_paths[algorithm][row]
+
+                for algorithm, path in paths.items():
+                    new_series.append(build_series(forecast_run, prod_id, algorithm, today, path))
+
+            with transaction.atomic():
+                trim_forecasts(product_ids=batch, from_date=today)
+                ForecastSeries.objects.bulk_create(new_series)
+                # Products changed during this run stay dirty for the next one
+                DirtyProduct.objects.filter(product__in=batch, changed_at__lte=started_at).delete()
+
+            forecasts_generated += len(new_series) * FORECAST_HORIZON_DAYS
+            refreshed += len(batch)
+
+        forecast_run.finished_at = timezone.now()
+        forecast_run.save(update_fields=['finished_at'])
+
+        # Stockout projections follow the new forecasts
+        from inventory.projection import reproject
+        projected = reproject()
+        self.stdout.write(f'Re-projected stock for {projected} products.')
+        # Stockout risk simulation is queued as its own background job
+        from forecasting.jobs import enqueue
+        enqueue('simulate_stockouts')
+
+        remaining = len(order) - refreshed
+        summary = (
+            f'{forecasts_generated} forecasts for {refreshed} '
+            f'{"changed " if incremental else ""}products '
+            f'({engine_fits} XGBoost/Prophet fits, {len(drifted)} products re-evaluated for drift)'
+        )
+
+        if remaining:
+            self.stdout.write(self.style.WARNING(
+                f'Time budget reached: generated {summary}; '
+                f'{remaining} products left for the next run.'
+            ))
+        else:
+            # Incremental runs carry the other products forward, so the
+            # next full regeneration is still due on schedule
+            if not incremental:
+                config.mark_generated()
+            self.stdout.write(self.style.SUCCESS(f'Successfully generated {summary}.'))
+
         if errors:
             self.stdout.write(self.style.WARNING(f'Errors encountered: {len(errors)}'))
             for error in errors[:5]:  # Show first 5 errors
                 self.stdout.write(f'  - {error}')
 
-    def xgboost_forecast(self, df):
-        """XGBoost implementation for demand forecasting"""
-        if df['y'].empty or len(df) < 2:
-            return 0
-        
-        try:
-            df['day_of_week'] = df['ds'].dt.dayofweek
-            df['month'] = df['ds'].dt.month
-            df['quarter'] = df['ds'].dt.quarter
-            df['lag_1'] = df['y'].shift(1)
-            df['lag_7'] = df['y'].shift(7)
-            df['rolling_mean_7'] = df['y'].rolling(window=7, min_periods=1).mean()
-            df['rolling_std_7'] = df['y'].rolling(window=7, min_periods=1).std()
-            
-            df = df.bfill().ffill()
-            
-            feature_cols = ['day_of_week', 'month', 'quarter', 'lag_1', 'lag_7', 'rolling_mean_7', 'rolling_std_7']
-            X = df[feature_cols]
-            y = df['y']
-            
-            model = xgb.XGBRegressor(
-                n_estimators=100,
-                max_depth=5,
-                learning_rate=0.1,
-                random_state=42,
-                verbosity=0
-            )
-            model.fit(X, y, verbose=False)
-            
-            last_date = df['ds'].iloc[-1]
-            future_date = last_date + timedelta(days=30)
-            
-            future_features = pd.DataFrame({
-                'day_of_week': [future_date.dayofweek],
-                'month': [future_date.month],
-                'quarter': [future_date.quarter],
-                'lag_1': [df['y'].iloc[-1]],
-                'lag_7': [df['y'].iloc[-7] if len(df) >= 7 else df['y'].mean()],
-                'rolling_mean_7': [df['rolling_mean_7'].iloc[-1]],
-                'rolling_std_7': [df['rolling_std_7'].iloc[-1]]
-            })
-            
-            prediction = model.predict(future_features)[0]
-            recent_avg = df['y'].tail(14).mean()
-            scaled_prediction = max(recent_avg * 0.8, prediction)
-            return int(max(5, round(scaled_prediction)))
-        
-        except Exception:
-            recent_data = df['y'].tail(14)
-            weighted_sum = 0
-            weight_sum = 0
-            for i, val in enumerate(recent_data):
-                weight = i + 1
-                weighted_sum += val * weight
-                weight_sum += weight
-            weighted_avg = weighted_sum / weight_sum
-            return int(max(5, round(weighted_avg)))
-
-    def prophet_forecast(self, df):
-        """Prophet forecasting with improved accuracy"""
+    def top_products(self):
+        """The 50 products with the most sales"""
+        return set(Sale.objects.values('product').annotate(
+            sale_count=models.Count('id')
+        ).order_by('-sale_count')[:50].values_list('product', flat=True))
+
+    def tournament_estimate(self, demand, top_products, workers):
+        """
+        Expected seconds for a tournament over ``demand``: the last timed
+        backtest scaled to this many expensive products, or
+        ENGINE_FIT_SECONDS per engine fit before any backtest has run
+        """
+        from django.db.models import Count, Q
+        from forecasting.engines import ENGINES
+        from forecasting.models import BacktestRun
+
+        expensive = sum(int(pid) in top_products for pid in demand.product_ids)
+        last = (
+            BacktestRun.objects.filter(duration_seconds__isnull=False)
+            .annotate(expensive=Count('results__product', filter=Q(results__algorithm__in=list(ENGINES)), distinct=True))
+            .filter(expensive__gt=0)
+            .values_list('duration_seconds', 'expensive')
+            .first()
+        )
+        if last:
+            duration, timed = last
+            return duration * expensive / timed
+        return expensive * len(ENGINES) * TOURNAMENT_FOLDS * ENGINE_FIT_SECONDS / max(1, workers)
+
+    def tournament(self, demand, top_products, workers, config=None):
+        """
+        Backtest baselines everywhere and the expensive engines on top
+        products, then keep the winner per product. A full tournament
+        passes ``config`` to record when it ran.
+        """
+        from forecasting.backtest import run_tournament
+        from forecasting.selection import select_winners
+
+        if not len(demand.product_ids):
+            return
         try:
-            model = Prophet(
-                interval_width=0.95,
-                yearly_seasonality=True,
-                weekly_seasonality=True,
-                daily_seasonality=False,
-                seasonality_mode='additive'
+            run, metrics = run_tournament(
+                demand,
+                [pid for pid in demand.product_ids if int(pid) in top_products],
+                folds=TOURNAMENT_FOLDS,
+                horizon=FORECAST_HORIZON_DAYS,
+                workers=workers,
             )
-            
-            model.fit(df)
-            future = model.make_future_dataframe(periods=30)
-            forecast = model.predict(future)
-            
-            predicted_value = forecast['yhat'].iloc[-1]
-            recent_avg = df['y'].tail(14).mean()
-            scaled_prediction = max(recent_avg * 0.8, predicted_value)
-            
-            return int(max(5, round(scaled_prediction)))
-        
-        except Exception:
-            return self._exponential_smoothing_forecast(df)
-    
-    def _exponential_smoothing_forecast(self, df):
-        """Fallback method using exponential smoothing"""
-        try:
-            from scipy import stats
-            
-            y = df['y'].values
-            x = range(len(y))
-            slope, intercept, _, _, _ = stats.linregress(x, y)
-            
-            smoothed = y[-1]
-            forecast = smoothed + slope * 30
-            
-            recent_avg = df['y'].tail(14).mean()
-            scaled_forecast = max(recent_avg * 0.8, forecast)
-            
-            return int(max(5, round(scaled_forecast)))
-        except:
-            recent_avg = df['y'].tail(14).mean()
-            return int(max(5, round(recent_avg)))
+        except ValueError as e:
+            self.stdout.write(self.style.WARNING(f'Skipped tournament: {e}'))
+            return
+        select_winners(run, demand, metrics)
+        if config is not None:
+            config.last_tournament = timezone.now()
+            config.save(update_fields=['last_tournament'])
+        self.stdout.write(
+            f'Tournament #{run.id} selected algorithms for {len(demand.product_ids)} products.'
+        )
@@ -5,6 +5,7 @@ Run: python manage.py cleanup_forecasts
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from forecasting.models import Forecast
+from forecasting.storage import trim_forecasts
 from datetime import timedelta
 
 class Command(BaseCommand):
@@ -29,8 +30,7 @@ class Command(BaseCommand):
         
         cutoff_date = timezone.now().date() - timedelta(days=days)
         
-        old_forecasts = Forecast.objects.filter(forecast_date__lt=cutoff_date)
-        count = old_forecasts.count()
+        count = Forecast.objects.filter(forecast_date__lt=cutoff_date).count()
         
         if count == 0:
             self.stdout.write(self.style.SUCCESS(f'No forecasts older than {days} days found.'))
@@ -41,7 +41,7 @@ class Command(BaseCommand):
                 self.style.WARNING(f'DRY RUN: Would delete {count} forecasts older than {cutoff_date}')
             )
         else:
-            old_forecasts.delete()
+            trim_forecasts(before=cutoff_date)
             self.stdout.write(
                 self.style.SUCCESS(f'Successfully deleted {count} old forecasts (older than {cutoff_date})')
             )
@@ -0,0 +1,53 @@
+"""
+Management command that runs queued background jobs (see forecasting.jobs).
+Run: python manage.py run_worker
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from forecasting.jobs import LEASE_SECONDS, claim, default_worker_id, run_job
+
+
+class Command(BaseCommand):
+    help = 'Claim and run queued background jobs such as forecast generation'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the jobs currently queued, then exit',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=10,
+            help='Seconds to wait between polls when the queue is empty (default: 10)',
+        )
+        parser.add_argument(
+            '--lease-seconds',
+            type=int,
+            default=LEASE_SECONDS,
+            help=f'Lease length renewed by the heartbeat (default: {LEASE_SECONDS})',
+        )
+
+    def handle(self, *args, **options):
+        worker_id = default_worker_id()
+        self.stdout.write(self.style.NOTICE(f'Worker {worker_id} started.'))
+
+        while True:
+            close_old_connections()
+            job = claim(worker_id, options['lease_seconds'])
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f'Running job #{job.id}: {job.command} {" ".join(job.args)}')
+            status = run_job(job, options['lease_seconds'])
+            if status == 'done':
+                self.stdout.write(self.style.SUCCESS(f'Job #{job.id} finished.'))
+            else:
+                self.stdout.write(self.style.ERROR(f'Job #{job.id} failed.'))
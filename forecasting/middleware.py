@@ -1,83 +1,52 @@
 """
-Middleware to automatically trigger forecast generation.
-Checks on each request if forecasts need to be regenerated (every 30 days).
+Middleware to automatically schedule forecast generation.
+Checks at most once per interval if forecasts need to be regenerated
+(every 30 days) and queues a job for the run_worker process.
 """
-import threading
 import logging
-import os
-import sys
+
+from django.core.cache import cache
 
 logger = logging.getLogger(__name__)
 
+CHECK_CACHE_KEY = 'forecasting:auto_forecast_checked'
+CHECK_INTERVAL_SECONDS = 15 * 60
+# Each queued run stops after this long; unfinished cycles are re-queued
+AUTO_FORECAST_BUDGET_SECONDS = 10 * 60
+
 
 class AutoForecastMiddleware:
     """
-    Middleware that checks if forecasts need to be regenerated.
-    Runs the generation in a background thread to not block requests.
-    Completely disabled during Render deployment/startup to prevent timeouts.
+    Middleware that queues forecast generation when it is due.
+    The heavy work runs in `manage.py run_worker`, never in a web worker,
+    and the config is read at most once per CHECK_INTERVAL_SECONDS.
     """
     
-    # Class-level flag to prevent multiple simultaneous generations
-    _generation_in_progress = False
-    _lock = threading.Lock()
-    
-    # Disable during Render startup
-    _disabled = bool(os.environ.get('RENDER'))
-    
     def __init__(self, get_response):
         self.get_response = get_response
     
     def __call__(self, request):
-        # Skip during deployment or if disabled
-        if not self._disabled:
-            # Only check on dashboard or forecast page access
-            if request.path in ['/', '/dashboard/', '/forecasting/']:
-                self._check_and_generate_forecasts()
+        # Only check on dashboard or forecast page access
+        if request.path in ['/', '/dashboard/', '/forecasting/']:
+            self._check_and_enqueue()
         
         response = self.get_response(request)
         return response
     
-    def _check_and_generate_forecasts(self):
-        """Check if forecasts need to be generated and trigger if needed"""
+    def _check_and_enqueue(self):
+        """Queue forecast generation if it is due"""
+        # cache.add only succeeds when the key is missing, i.e. once per interval
+        if not cache.add(CHECK_CACHE_KEY, True, CHECK_INTERVAL_SECONDS):
+            return
+
         # Avoid circular import
+        from forecasting.jobs import enqueue
         from forecasting.models import ForecastConfig
         
         try:
             config = ForecastConfig.get_config()
-            
-            if not config.should_generate():
-                return
-            
-            # Use lock to prevent multiple simultaneous generations
-            with self._lock:
-                if self._generation_in_progress:
-                    return
-                
-                # Re-check after acquiring lock
-                config.refresh_from_db()
-                if not config.should_generate():
-                    return
-                
-                self._generation_in_progress = True
-            
-            # Run generation in background thread
-            thread = threading.Thread(target=self._run_forecast_generation)
-            thread.daemon = True
-            thread.start()
-            
+            if config.should_generate():
+                job = enqueue('auto_generate_forecast', '--budget-seconds', AUTO_FORECAST_BUDGET_SECONDS)
+                logger.info(f"Queued automatic forecast generation (job #{job.id})")
         except Exception as e:
             logger.error(f"Error checking forecast generation: {e}")
-    
-    def _run_forecast_generation(self):
-        """Run forecast generation in background"""
-        from django.core.management import call_command
-        
-        try:
-            logger.info("Starting automatic forecast generation...")
-            call_command('auto_generate_forecast', '--force')
-            logger.info("Automatic forecast generation completed.")
-        except Exception as e:
-            logger.error(f"Error during forecast generation: {e}")
-        finally:
-            with self._lock:
-                AutoForecastMiddleware._generation_in_progress = False
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0002_add_forecast_config'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='forecast',
+            name='algorithm_used',
+            field=models.CharField(choices=[('xgboost', 'XGBoost'), ('prophet', 'Prophet'), ('ses', 'Exponential Smoothing'), ('holt_winters', 'Holt-Winters'), ('croston_tsb', 'Croston/TSB'), ('seasonal_naive', 'Seasonal Naive')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0003_add_baseline_algorithms'),
+        ('sales', '0011_alter_product_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BacktestRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('folds', models.PositiveIntegerField()),
+                ('horizon_days', models.PositiveIntegerField()),
+                ('history_days', models.PositiveIntegerField()),
+                ('duration_seconds', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BacktestResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('algorithm', models.CharField(choices=[('xgboost', 'XGBoost'), ('prophet', 'Prophet'), ('ses', 'Exponential Smoothing'), ('holt_winters', 'Holt-Winters'), ('croston_tsb', 'Croston/TSB'), ('seasonal_naive', 'Seasonal Naive')], max_length=50)),
+                ('mae', models.FloatField()),
+                ('mape', models.FloatField(blank=True, help_text='Only over days with actual sales', null=True)),
+                ('wape', models.FloatField(blank=True, help_text='Null when the product sold nothing in the test windows', null=True)),
+                ('bias', models.FloatField(help_text='Mean forecast minus actual per day')),
+                ('fit_seconds', models.FloatField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='sales.product')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='forecasting.backtestrun')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'algorithm'], name='forecasting_product_fb9fef_idx')],
+                'unique_together': {('run', 'product', 'algorithm')},
+            },
+        ),
+    ]
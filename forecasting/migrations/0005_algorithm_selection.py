@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0004_backtest_results'),
+        ('sales', '0011_alter_product_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forecastconfig',
+            name='drift_tolerance',
+            field=models.FloatField(default=1.5, help_text='Re-run the tournament for a product when its live WAPE exceeds its backtest WAPE by this factor'),
+        ),
+        migrations.AddField(
+            model_name='forecastconfig',
+            name='last_tournament',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecastconfig',
+            name='tournament_interval_days',
+            field=models.PositiveIntegerField(default=90, help_text='Re-run the full algorithm tournament after this many days'),
+        ),
+        migrations.CreateModel(
+            name='ProductAlgorithm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('algorithm', models.CharField(choices=[('xgboost', 'XGBoost'), ('prophet', 'Prophet'), ('ses', 'Exponential Smoothing'), ('holt_winters', 'Holt-Winters'), ('croston_tsb', 'Croston/TSB'), ('seasonal_naive', 'Seasonal Naive')], max_length=50)),
+                ('wape', models.FloatField(blank=True, null=True)),
+                ('mae', models.FloatField(blank=True, null=True)),
+                ('selected_at', models.DateTimeField(auto_now=True)),
+                ('backtest_run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='forecasting.backtestrun')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast_algorithm', to='sales.product')),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0005_algorithm_selection'),
+        ('sales', '0011_alter_product_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyProduct',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='sales.product')),
+                ('changed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
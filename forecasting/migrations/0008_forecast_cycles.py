@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0007_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forecastconfig',
+            name='cycle_started_at',
+            field=models.DateTimeField(blank=True, help_text='Start of an unfinished generation cycle; the next run resumes it', null=True),
+        ),
+    ]
@@ -0,0 +1,153 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:32
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+FORECAST_VIEW_SQL = {
+    'postgresql': """
+        CREATE VIEW forecasting_forecast AS
+        SELECT s.id * 1000 + (q.ordinality - 1) AS id,
+               s.id AS series_id,
+               s.product_id,
+               s.start_date + (q.ordinality - 1)::integer AS forecast_date,
+               q.value::integer AS predicted_quantity,
+               s.algorithm AS algorithm_used,
+               s.created_at
+        FROM forecasting_forecastseries s
+        CROSS JOIN LATERAL jsonb_array_elements_text(s.quantities)
+            WITH ORDINALITY AS q(value, ordinality)
+    """,
+    'sqlite': """
+        CREATE VIEW forecasting_forecast AS
+        SELECT s.id * 1000 + j.key AS id,
+               s.id AS series_id,
+               s.product_id,
+               date(s.start_date, '+' || j.key || ' days') AS forecast_date,
+               CAST(j.value AS INTEGER) AS predicted_quantity,
+               s.algorithm AS algorithm_used,
+               s.created_at
+        FROM forecasting_forecastseries s, json_each(s.quantities) j
+    """,
+}
+
+
+def rows_to_series(apps, schema_editor):
+    """Pack existing per-day rows into one series per contiguous run of days"""
+    Forecast = apps.get_model('forecasting', 'Forecast')
+    ForecastRun = apps.get_model('forecasting', 'ForecastRun')
+    ForecastSeries = apps.get_model('forecasting', 'ForecastSeries')
+
+    rows = Forecast.objects.order_by('product_id', 'algorithm_used', 'forecast_date').values_list(
+        'product_id', 'algorithm_used', 'forecast_date', 'predicted_quantity'
+    )
+    run = None
+    series = []
+    current = None
+    for product_id, algorithm, day, quantity in rows.iterator():
+        if current and (current.product_id, current.algorithm) == (product_id, algorithm):
+            if day == current.end_date:
+                continue  # duplicate row for the same day
+            if day == current.end_date + timedelta(days=1):
+                current.quantities.append(quantity)
+                current.end_date = day
+                continue
+        if run is None:
+            run = ForecastRun.objects.create()
+        current = ForecastSeries(
+            run=run, product_id=product_id, algorithm=algorithm,
+            start_date=day, end_date=day, quantities=[quantity],
+        )
+        series.append(current)
+    ForecastSeries.objects.bulk_create(series, batch_size=500)
+
+
+def series_to_rows(apps, schema_editor):
+    Forecast = apps.get_model('forecasting', 'Forecast')
+    ForecastSeries = apps.get_model('forecasting', 'ForecastSeries')
+    Forecast.objects.bulk_create(
+        (
+            Forecast(
+                product_id=s.product_id,
+                forecast_date=s.start_date + timedelta(days=i),
+                predicted_quantity=quantity,
+                algorithm_used=s.algorithm,
+            )
+            for s in ForecastSeries.objects.iterator()
+            for i, quantity in enumerate(s.quantities)
+        ),
+        batch_size=1000,
+    )
+
+
+def create_forecast_view(apps, schema_editor):
+    schema_editor.execute(FORECAST_VIEW_SQL[schema_editor.connection.vendor])
+
+
+def drop_forecast_view(apps, schema_editor):
+    schema_editor.execute('DROP VIEW IF EXISTS forecasting_forecast')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0008_forecast_cycles'),
+        ('sales', '0011_alter_product_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('incremental', models.BooleanField(default=False)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ForecastSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('algorithm', models.CharField(choices=[('xgboost', 'XGBoost'), ('prophet', 'Prophet'), ('ses', 'Exponential Smoothing'), ('holt_winters', 'Holt-Winters'), ('croston_tsb', 'Croston/TSB'), ('seasonal_naive', 'Seasonal Naive')], max_length=50)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('quantities', models.JSONField()),
+                ('lower', models.JSONField(blank=True, null=True)),
+                ('upper', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecast_series', to='sales.product')),
+                ('run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='series', to='forecasting.forecastrun')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'algorithm'], name='forecasting_product_f63569_idx'), models.Index(fields=['end_date'], name='forecasting_end_dat_5121bb_idx')],
+            },
+        ),
+        migrations.RunPython(rows_to_series, series_to_rows),
+        # Replace the per-day table with a read-only view of the same name
+        migrations.DeleteModel(
+            name='Forecast',
+        ),
+        migrations.CreateModel(
+            name='Forecast',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('forecast_date', models.DateField()),
+                ('predicted_quantity', models.PositiveIntegerField()),
+                ('algorithm_used', models.CharField(choices=[('xgboost', 'XGBoost'), ('prophet', 'Prophet'), ('ses', 'Exponential Smoothing'), ('holt_winters', 'Holt-Winters'), ('croston_tsb', 'Croston/TSB'), ('seasonal_naive', 'Seasonal Naive')], max_length=50)),
+                ('created_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='sales.product')),
+                ('series', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='forecasting.forecastseries')),
+            ],
+            options={
+                'db_table': 'forecasting_forecast',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_forecast_view, drop_forecast_view),
+    ]
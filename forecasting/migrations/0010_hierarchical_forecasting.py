@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasting', '0009_forecast_series'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forecastconfig',
+            name='hierarchical_method',
+            field=models.CharField(blank=True, choices=[('top_down', 'Top-down by recent share'), ('mint', 'MinT reconciliation')], help_text='Forecast category aggregates and split them down to products instead of fitting per product', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='backtestresult',
+            name='algorithm',
+            field=models.CharField(choices=[('xgboost', 'XGBoost'), ('prophet', 'Prophet'), ('ses', 'Exponential Smoothing'), ('holt_winters', 'Holt-Winters'), ('croston_tsb', 'Croston/TSB'), ('seasonal_naive', 'Seasonal Naive'), ('hierarchical', 'Hierarchical')], max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='forecastseries',
+            name='algorithm',
+            field=models.CharField(choices=[('xgboost', 'XGBoost'), ('prophet', 'Prophet'), ('ses', 'Exponential Smoothing'), ('holt_winters', 'Holt-Winters'), ('croston_tsb', 'Croston/TSB'), ('seasonal_naive', 'Seasonal Naive'), ('hierarchical', 'Hierarchical')], max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='productalgorithm',
+            name='algorithm',
+            field=models.CharField(choices=[('xgboost', 'XGBoost'), ('prophet', 'Prophet'), ('ses', 'Exponential Smoothing'), ('holt_winters', 'Holt-Winters'), ('croston_tsb', 'Croston/TSB'), ('seasonal_naive', 'Seasonal Naive'), ('hierarchical', 'Hierarchical')], max_length=50),
+        ),
+    ]
@@ -1,32 +1,152 @@
 from django.db import models
+from django.db.models import DecimalField, Exists, ExpressionWrapper, F, OuterRef, Q
 from django.utils import timezone
 from datetime import timedelta
 
 
+class ForecastQuerySet(models.QuerySet):
+    def best(self):
+        """
+        Keep only each product's selected algorithm (see ProductAlgorithm).
+        Products without a selection fall back to every algorithm except
+        Prophet, i.e. XGBoost for top sellers and the stored baseline for
+        the long tail, so there is still one forecast per product and day.
+        Hierarchical runs replace every product's forecasts, so hierarchical
+        forecasts are always kept. A product whose engine failed in a run
+        only has that run's Holt-Winters fallback, which is kept when the
+        run has no series under the selected algorithm.
+        """
+        selected_in_run = ForecastSeries.objects.filter(
+            run_id=OuterRef('series__run_id'),
+            product_id=OuterRef('product_id'),
+            algorithm=OuterRef('product__forecast_algorithm__algorithm'),
+        )
+        return self.filter(
+            Q(algorithm_used=F('product__forecast_algorithm__algorithm')) |
+            (Q(product__forecast_algorithm__isnull=True) & ~Q(algorithm_used='prophet')) |
+            Q(algorithm_used='hierarchical') |
+            (Q(algorithm_used='holt_winters') & ~Exists(selected_in_run))
+        )
+
+    def with_revenue(self):
+        """Annotate predicted_revenue in SQL so it can be summed and sorted on"""
+        return self.annotate(predicted_revenue=ExpressionWrapper(
+            F('predicted_quantity') * F('product__price'),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        ))
+
+
 class Forecast(models.Model):
-    product = models.ForeignKey('sales.Product', on_delete=models.CASCADE)
+    ALGORITHM_CHOICES = [
+        ('xgboost', 'XGBoost'),
+        ('prophet', 'Prophet'),
+        ('ses', 'Exponential Smoothing'),
+        ('holt_winters', 'Holt-Winters'),
+        ('croston_tsb', 'Croston/TSB'),
+        ('seasonal_naive', 'Seasonal Naive'),
+        ('hierarchical', 'Hierarchical'),
+    ]
+
+    # Read-only per-day view over ForecastSeries (see migration 0009);
+    # write and delete forecasts through forecasting.storage instead.
+    id = models.BigIntegerField(primary_key=True)
+    series = models.ForeignKey('ForecastSeries', on_delete=models.DO_NOTHING, related_name='+')
+    product = models.ForeignKey('sales.Product', on_delete=models.DO_NOTHING)
     forecast_date = models.DateField()
     predicted_quantity = models.PositiveIntegerField()
-    algorithm_used = models.CharField(max_length=50, choices=[('xgboost', 'XGBoost'), ('prophet', 'Prophet')])
-    created_at = models.DateTimeField(auto_now_add=True)
+    algorithm_used = models.CharField(max_length=50, choices=ALGORITHM_CHOICES)
+    created_at = models.DateTimeField()
+
+    objects = ForecastQuerySet.as_manager()
+
+    class Meta:
+        managed = False
+        db_table = 'forecasting_forecast'
 
     def __str__(self):
         return f"Forecast for {self.product.name} on {self.forecast_date}"
     
     @property
     def predicted_revenue(self):
-        """Calculate predicted revenue based on quantity and product price"""
+        """Predicted revenue, from the with_revenue() annotation when present"""
+        if hasattr(self, '_predicted_revenue'):
+            return self._predicted_revenue
         return self.predicted_quantity * self.product.price
 
+    @predicted_revenue.setter
+    def predicted_revenue(self, value):
+        self._predicted_revenue = value
+
+
+class ForecastRun(models.Model):
+    """One invocation of auto_generate_forecast"""
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    incremental = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Forecast run #{self.id} ({self.started_at:%Y-%m-%d %H:%M})"
+
+
+class ForecastSeries(models.Model):
+    """
+    Daily forecast path of one product and algorithm from one run.
+    ``quantities[i]`` is the forecast for ``start_date + i`` days; the
+    optional ``lower``/``upper`` arrays hold prediction intervals.
+    """
+    run = models.ForeignKey(ForecastRun, on_delete=models.SET_NULL, null=True, blank=True, related_name='series')
+    product = models.ForeignKey('sales.Product', on_delete=models.CASCADE, related_name='forecast_series')
+    algorithm = models.CharField(max_length=50, choices=Forecast.ALGORITHM_CHOICES)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    quantities = models.JSONField()
+    lower = models.JSONField(null=True, blank=True)
+    upper = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'algorithm']),
+            models.Index(fields=['end_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.algorithm} forecast for {self.product_id} from {self.start_date} to {self.end_date}"
+
 
 class ForecastConfig(models.Model):
     """
     Singleton model to track forecast generation configuration and status.
     Stores when forecasts were last generated and the generation interval.
     """
+    HIERARCHICAL_METHOD_CHOICES = [
+        ('top_down', 'Top-down by recent share'),
+        ('mint', 'MinT reconciliation'),
+    ]
+
     last_generated = models.DateTimeField(null=True, blank=True)
+    cycle_started_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Start of an unfinished generation cycle; the next run resumes it"
+    )
     generation_interval_days = models.PositiveIntegerField(default=30)
     auto_generate_enabled = models.BooleanField(default=True)
+    last_tournament = models.DateTimeField(null=True, blank=True)
+    tournament_interval_days = models.PositiveIntegerField(
+        default=90,
+        help_text="Re-run the full algorithm tournament after this many days"
+    )
+    drift_tolerance = models.FloatField(
+        default=1.5,
+        help_text="Re-run the tournament for a product when its live WAPE exceeds its backtest WAPE by this factor"
+    )
+    hierarchical_method = models.CharField(
+        max_length=20, blank=True, choices=HIERARCHICAL_METHOD_CHOICES,
+        help_text="Forecast category aggregates and split them down to products instead of fitting per product"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -48,7 +168,7 @@ class ForecastConfig(models.Model):
         if not self.auto_generate_enabled:
             return False
         
-        if self.last_generated is None:
+        if self.last_generated is None or self.cycle_started_at is not None:
             return True
         
         days_since_last = (timezone.now() - self.last_generated).days
@@ -63,7 +183,120 @@ class ForecastConfig(models.Model):
         days_remaining = self.generation_interval_days - days_since_last
         return max(0, days_remaining)
     
+    def tournament_due(self):
+        """Check if the full algorithm tournament should be re-run"""
+        if self.last_tournament is None:
+            return True
+        days_since = (timezone.now() - self.last_tournament).days
+        return days_since >= self.tournament_interval_days
+    
     def mark_generated(self):
-        """Mark forecasts as just generated"""
+        """Mark forecasts as just generated and close the running cycle"""
         self.last_generated = timezone.now()
+        self.cycle_started_at = None
         self.save()
+
+
+class BacktestRun(models.Model):
+    """One rolling-origin backtest over the catalog"""
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    folds = models.PositiveIntegerField()
+    horizon_days = models.PositiveIntegerField()
+    history_days = models.PositiveIntegerField()
+    duration_seconds = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Backtest #{self.id} ({self.started_at:%Y-%m-%d %H:%M}, {self.folds} folds)"
+
+
+class BacktestResult(models.Model):
+    """Out-of-sample error of one algorithm on one product, pooled over all folds"""
+    run = models.ForeignKey(BacktestRun, on_delete=models.CASCADE, related_name='results')
+    product = models.ForeignKey('sales.Product', on_delete=models.CASCADE)
+    algorithm = models.CharField(max_length=50, choices=Forecast.ALGORITHM_CHOICES)
+    mae = models.FloatField()
+    mape = models.FloatField(null=True, blank=True, help_text="Only over days with actual sales")
+    wape = models.FloatField(null=True, blank=True, help_text="Null when the product sold nothing in the test windows")
+    bias = models.FloatField(help_text="Mean forecast minus actual per day")
+    fit_seconds = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = [('run', 'product', 'algorithm')]
+        indexes = [
+            models.Index(fields=['product', 'algorithm']),
+        ]
+
+    def __str__(self):
+        return f"{self.algorithm} on {self.product_id} (run #{self.run_id}): WAPE {self.wape}"
+
+
+class ProductAlgorithm(models.Model):
+    """Algorithm that won the latest tournament for a product"""
+    product = models.OneToOneField('sales.Product', on_delete=models.CASCADE, related_name='forecast_algorithm')
+    algorithm = models.CharField(max_length=50, choices=Forecast.ALGORITHM_CHOICES)
+    wape = models.FloatField(null=True, blank=True)
+    mae = models.FloatField(null=True, blank=True)
+    backtest_run = models.ForeignKey(BacktestRun, on_delete=models.SET_NULL, null=True, blank=True)
+    selected_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.algorithm} (WAPE {self.wape})"
+
+
+class DirtyProduct(models.Model):
+    """Product whose sales, returns or price changed since its last forecast"""
+    product = models.OneToOneField('sales.Product', on_delete=models.CASCADE, primary_key=True, related_name='+')
+    changed_at = models.DateTimeField()
+
+    @classmethod
+    def mark(cls, product_ids):
+        """Flag products as changed now (one upsert, no read)"""
+        now = timezone.now()
+        cls.objects.bulk_create(
+            [cls(product_id=pid, changed_at=now) for pid in set(product_ids)],
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['changed_at'],
+        )
+
+    def __str__(self):
+        return f"{self.product_id} changed at {self.changed_at}"
+
+
+class Job(models.Model):
+    """
+    Management command queued for the background worker (run_worker).
+    A worker owns a running job while ``lease_until`` is in the future and
+    keeps extending it with heartbeats; expired leases are picked up again.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    command = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    enqueued_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    lease_until = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    worker_id = models.CharField(max_length=255, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['enqueued_at']
+        indexes = [
+            models.Index(fields=['status', 'enqueued_at']),
+        ]
+
+    def __str__(self):
+        return f"Job #{self.id} {self.command} ({self.get_status_display()})"
@@ -0,0 +1,59 @@
+"""
+Priority order for forecast refits.
+
+When a run has a time budget the products that matter most are refitted
+first: high revenue at risk, stale (or missing) forecasts and low stock
+cover all push a product up the queue.
+"""
+import numpy as np
+from django.db.models import Max
+from django.utils import timezone
+
+from forecasting.models import Forecast
+from inventory.models import Stock
+from sales.models import Product
+
+
+RECENT_DAYS = 28
+STALENESS_SCALE_DAYS = 7
+
+
+def prioritize(demand, product_ids, horizon):
+    """
+    Return ``product_ids`` ordered by refit priority, highest first.
+
+    score = expected revenue over the horizon
+            x (1 + days since the product was last forecast / 7)
+            x (1 + share of the horizon not covered by stock)
+    Products without any future forecast count as ``horizon`` days stale.
+    """
+    product_ids = [int(pid) for pid in product_ids]
+    if not product_ids:
+        return []
+
+    rows = demand.row_index()
+    recent = demand.values[:, -RECENT_DAYS:].mean(axis=1)
+    rate = np.array([recent[rows[pid]] if pid in rows else 0.0 for pid in product_ids])
+
+    prices = dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'price'))
+    stock = dict(Stock.objects.filter(product_id__in=product_ids).values_list('product_id', 'quantity'))
+    now = timezone.now()
+    last_forecast = dict(
+        Forecast.objects.filter(product_id__in=product_ids, forecast_date__gte=now.date())
+        .values('product_id').annotate(latest=Max('created_at'))
+        .values_list('product_id', 'latest')
+    )
+
+    price = np.array([float(prices.get(pid, 0)) for pid in product_ids])
+    on_hand = np.array([stock.get(pid, 0) for pid in product_ids], dtype=np.float64)
+    stale_days = np.array([
+        (now - last_forecast[pid]).days if pid in last_forecast else horizon
+        for pid in product_ids
+    ], dtype=np.float64)
+
+    cover_days = np.divide(on_hand, rate, out=np.full(len(rate), np.inf), where=rate > 0)
+    uncovered = np.clip(horizon - cover_days, 0, horizon) / horizon
+
+    score = (rate * price * horizon + 1e-9) * (1 + stale_days / STALENESS_SCALE_DAYS) * (1 + uncovered)
+    order = np.argsort(-score, kind='stable')
+    return [product_ids[i] for i in order]
@@ -0,0 +1,96 @@
+"""
+Per-product algorithm selection.
+
+Backtest metrics decide which algorithm each product is forecast with, so
+routine runs fit a single engine per product. Live accuracy of the stored
+forecasts is compared with the backtest error to decide when a product's
+tournament has to be re-run.
+"""
+from datetime import timedelta
+
+import numpy as np
+
+from forecasting.demand import build_demand_matrix
+from forecasting.models import Forecast, ProductAlgorithm
+
+
+def select_winners(run, demand, metrics):
+    """
+    Store the lowest-WAPE algorithm per product (lowest MAE for products
+    that sold nothing in the test windows) and return ``{product_id: algorithm}``.
+    """
+    algorithms = list(metrics)
+    wape = np.vstack([metrics[a]['wape'] for a in algorithms])
+    mae = np.vstack([metrics[a]['mae'] for a in algorithms])
+
+    has_wape = np.isfinite(wape).any(axis=0)
+    score = np.where(
+        has_wape[None, :],
+        np.where(np.isfinite(wape), wape, np.inf),
+        np.where(np.isfinite(mae), mae, np.inf),
+    )
+    best = score.argmin(axis=0)
+    cols = np.arange(len(demand.product_ids))
+    defined = np.isfinite(score[best, cols])
+
+    selections = []
+    for i in np.flatnonzero(defined):
+        a = best[i]
+        selections.append(ProductAlgorithm(
+            product_id=int(demand.product_ids[i]),
+            algorithm=algorithms[a],
+            wape=None if np.isnan(wape[a, i]) else float(wape[a, i]),
+            mae=float(mae[a, i]),
+            backtest_run=run,
+        ))
+    ProductAlgorithm.objects.bulk_create(
+        selections,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=['algorithm', 'wape', 'mae', 'backtest_run', 'selected_at'],
+    )
+    return {s.product_id: s.algorithm for s in selections}
+
+
+def drifted_products(today, window_days, tolerance):
+    """
+    Products whose selected forecasts over the last ``window_days`` missed
+    actual sales by more than ``tolerance`` times their backtest WAPE.
+    Must run before past forecasts are cleaned up.
+    """
+    since = today - timedelta(days=window_days)
+    past = list(
+        Forecast.objects.best().filter(
+            forecast_date__gte=since,
+            forecast_date__lt=today,
+            product__forecast_algorithm__wape__isnull=False,
+        ).values_list('product_id', 'forecast_date', 'predicted_quantity')
+    )
+    if not past:
+        return set()
+
+    actual = build_demand_matrix(
+        product_ids={pid for pid, _, _ in past},
+        end_date=today - timedelta(days=1),
+        history_days=window_days,
+    )
+    index = actual.row_index()
+    forecast = np.zeros_like(actual.values)
+    scored = np.zeros(actual.values.shape, dtype=bool)
+    for pid, day, quantity in past:
+        forecast[index[pid], (day - actual.start_date).days] = quantity
+        scored[index[pid], (day - actual.start_date).days] = True
+
+    abs_err = np.where(scored, np.abs(forecast - actual.values), 0).sum(axis=1)
+    sold = np.where(scored, actual.values, 0).sum(axis=1)
+    live_wape = np.divide(abs_err, sold, out=np.full(len(sold), np.nan), where=sold > 0)
+
+    backtest_wape = dict(
+        ProductAlgorithm.objects.filter(product_id__in=actual.product_ids.tolist())
+        .values_list('product_id', 'wape')
+    )
+    return {
+        int(pid)
+        for pid, live in zip(actual.product_ids, live_wape)
+        if not np.isnan(live) and live > tolerance * backtest_wape[int(pid)]
+    }
@@ -0,0 +1,200 @@
+"""
+Forecast serving for the JSON API.
+
+Products with a stored forecast get the latest run's selected series.
+Products without one are scored on demand with their default baseline
+over recent sales. Scored paths are kept in a per-process LRU cache keyed
+by product and data version (last sale and day), and concurrent misses
+are micro-batched: the first request waits a few milliseconds, then scores
+every product requested meanwhile in one vectorized call.
+
+NumPy is only imported on a cache miss, so serving stored forecasts keeps
+the web worker free of the forecasting stack.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import timedelta
+
+from django.db.models import Max
+from django.utils import timezone
+
+from forecasting.models import Forecast, ForecastSeries
+from sales.models import Product, Sale
+
+
+HORIZON_DAYS = 30
+CACHE_SIZE = 512
+BATCH_WINDOW_SECONDS = 0.005
+RESULT_TIMEOUT_SECONDS = 30
+SCORING_HISTORY_DAYS = 365
+MAX_BATCH_PRODUCTS = 100
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache"""
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class MicroBatcher:
+    """
+    Collect keys submitted by concurrent callers and resolve them with one
+    ``predict(keys) -> {key: result}`` call. The first caller of a batch
+    waits ``window`` seconds and runs it; the others wait for its result.
+    """
+
+    def __init__(self, predict, window=BATCH_WINDOW_SECONDS):
+        self.predict = predict
+        self.window = window
+        self._pending = {}
+        self._leader = False
+        self._lock = threading.Lock()
+
+    def submit(self, keys):
+        with self._lock:
+            futures = {key: self._pending.setdefault(key, Future()) for key in keys}
+            lead = not self._leader
+            self._leader = True
+        if lead:
+            time.sleep(self.window)
+            with self._lock:
+                batch, self._pending, self._leader = self._pending, {}, False
+            try:
+                results = self.predict(list(batch))
+                for key, future in batch.items():
+                    future.set_result(results.get(key))
+            except Exception as e:
+                for future in batch.values():
+                    if not future.done():
+                        future.set_exception(e)
+        return {key: future.result(timeout=RESULT_TIMEOUT_SECONDS) for key, future in futures.items()}
+
+
+def score(keys):
+    """Forecast ``(product_id, version, day)`` keys with each product's default baseline"""
+    from forecasting.baselines import forecast_baselines
+    from forecasting.demand import build_demand_matrix
+
+    product_ids = sorted({key[0] for key in keys})
+    demand = build_demand_matrix(
+        product_ids=product_ids,
+        end_date=timezone.now().date() - timedelta(days=1),
+        history_days=SCORING_HISTORY_DAYS,
+    )
+    algorithms, paths = forecast_baselines(demand.values, HORIZON_DAYS)
+    rows = demand.row_index()
+    return {
+        key: (str(algorithms[rows[key[0]]]), [int(round(q)) for q in paths[rows[key[0]]]])
+        for key in keys if key[0] in rows
+    }
+
+
+_cache = LRUCache()
+_batcher = MicroBatcher(score)
+
+
+def _stored_runs(product_ids, today):
+    """Latest run id per product with a future stored forecast"""
+    return dict(
+        ForecastSeries.objects.filter(product_id__in=product_ids, end_date__gte=today)
+        .values('product_id').annotate(run_id=Max('run_id')).values_list('product_id', 'run_id')
+    )
+
+
+def _data_versions(product_ids):
+    """Last sale id per product, which changes whenever new demand is recorded"""
+    return dict(
+        Sale.objects.filter(product_id__in=product_ids)
+        .values('product_id').annotate(last=Max('id')).values_list('product_id', 'last')
+    )
+
+
+def forecast_etag(product_ids):
+    """
+    ETag for the forecasts of ``product_ids``: the stored run ids, or the
+    data version for products scored on demand, and the current day.
+    """
+    today = timezone.now().date()
+    runs = _stored_runs(product_ids, today)
+    versions = _data_versions([pid for pid in product_ids if pid not in runs])
+    parts = [today.isoformat()] + [
+        f'{pid}:r{runs[pid]}' if pid in runs else f'{pid}:v{versions.get(pid, 0)}'
+        for pid in sorted(product_ids)
+    ]
+    return hashlib.md5(','.join(parts).encode()).hexdigest()
+
+
+def get_forecasts(product_ids):
+    """
+    Forecast payloads keyed by product id for the products that exist,
+    from stored series where available and scored on demand otherwise.
+    """
+    today = timezone.now().date()
+    names = dict(Product.objects.filter(id__in=product_ids).values_list('id', 'name'))
+    payloads = {
+        pid: {'product_id': pid, 'product_name': name, 'source': 'stored', 'run_id': None,
+              'algorithm': None, 'forecast': []}
+        for pid, name in names.items()
+    }
+
+    stored = Forecast.objects.best().filter(
+        product_id__in=list(names),
+        forecast_date__gte=today,
+        forecast_date__lt=today + timedelta(days=HORIZON_DAYS),
+    ).order_by('product_id', 'forecast_date', '-series__run_id').values_list(
+        'product_id', 'forecast_date', 'predicted_quantity', 'algorithm_used', 'series__run_id'
+    )
+    for pid, day, quantity, algorithm, run_id in stored:
+        payload = payloads[pid]
+        if payload['forecast'] and payload['forecast'][-1]['date'] == day.isoformat():
+            continue  # an older run's series for the same day
+        payload['run_id'] = max(payload['run_id'] or 0, run_id or 0) or None
+        payload['algorithm'] = algorithm
+        payload['forecast'].append({'date': day.isoformat(), 'quantity': quantity})
+
+    missing = [pid for pid, payload in payloads.items() if not payload['forecast']]
+    if missing:
+        versions = _data_versions(missing)
+        keys = {pid: (pid, versions.get(pid, 0), today) for pid in missing}
+        results = {key: _cache.get(key) for key in keys.values()}
+        misses = [key for key, result in results.items() if result is None]
+        if misses:
+            for key, result in _batcher.submit(misses).items():
+                if result is not None:
+                    _cache.put(key, result)
+                    results[key] = result
+        for pid, key in keys.items():
+            algorithm, path = results.get(key) or (None, [0] * HORIZON_DAYS)
+            payloads[pid].update(
+                source='computed',
+                algorithm=algorithm,
+                forecast=[
+                    {'date': (today + timedelta(days=i)).isoformat(), 'quantity': quantity}
+                    for i, quantity in enumerate(path)
+                ],
+            )
+    return payloads
@@ -0,0 +1,39 @@
+"""
+Mark products dirty when anything their forecast depends on changes, so
+``auto_generate_forecast --incremental`` only refits those products.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from forecasting.models import DirtyProduct
+from sales.models import Product, Return, Sale
+
+
+def _product_deleted(origin):
+    """True when the delete cascades from a Product (nothing left to refit)"""
+    return getattr(origin, 'model', type(origin)) is Product
+
+
+@receiver(post_save, sender=Sale)
+@receiver(post_delete, sender=Sale)
+def mark_sale_product_dirty(sender, instance, origin=None, **kwargs):
+    if _product_deleted(origin):
+        return
+    DirtyProduct.mark([instance.product_id])
+
+
+@receiver(post_save, sender=Return)
+@receiver(post_delete, sender=Return)
+def mark_return_product_dirty(sender, instance, origin=None, **kwargs):
+    if _product_deleted(origin):
+        return
+    product_ids = Sale.objects.filter(pk=instance.sale_id).values_list('product_id', flat=True)
+    DirtyProduct.mark(product_ids)
+
+
+@receiver(pre_save, sender=Product)
+def mark_repriced_product_dirty(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    if Product.objects.filter(pk=instance.pk).exclude(price=instance.price).exists():
+        DirtyProduct.mark([instance.pk])
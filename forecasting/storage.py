@@ -0,0 +1,75 @@
+"""
+Write side of the compact forecast store.
+
+Forecasts are stored as one ForecastSeries row per (run, product,
+algorithm) holding the whole horizon; the per-day ``Forecast`` model is a
+read-only database view over those rows. Deleting "forecast days" means
+trimming or dropping series, which is what ``trim_forecasts`` does.
+"""
+from datetime import timedelta
+
+from django.db.models import Q
+
+from forecasting.models import ForecastSeries
+
+
+def build_series(run, product_id, algorithm, start_date, path, lower=None, upper=None):
+    """Unsaved ForecastSeries for a forecast path starting on ``start_date``"""
+    quantities = [int(round(q)) for q in path]
+    return ForecastSeries(
+        run=run,
+        product_id=product_id,
+        algorithm=algorithm,
+        start_date=start_date,
+        end_date=start_date + timedelta(days=len(quantities) - 1),
+        quantities=quantities,
+        lower=None if lower is None else [float(q) for q in lower],
+        upper=None if upper is None else [float(q) for q in upper],
+    )
+
+
+def trim_forecasts(product_ids=None, before=None, from_date=None):
+    """
+    Remove forecast days before ``before`` and/or on and after ``from_date``,
+    the equivalent of deleting those rows from the per-day view. Series left
+    empty are deleted, the rest are sliced in place. Returns the number of
+    forecast days removed.
+    """
+    series = ForecastSeries.objects.all()
+    if product_ids is not None:
+        series = series.filter(product_id__in=list(product_ids))
+    affected = Q()
+    if before is not None:
+        affected |= Q(start_date__lt=before)
+    if from_date is not None:
+        affected |= Q(end_date__gte=from_date)
+    series = series.filter(affected)
+
+    removed = 0
+    emptied = []
+    sliced = []
+    for s in series.only('id', 'start_date', 'end_date', 'quantities', 'lower', 'upper'):
+        length = len(s.quantities)
+        lo, hi = 0, length
+        if before is not None:
+            lo = min(max((before - s.start_date).days, 0), length)
+        if from_date is not None:
+            hi = max(min((from_date - s.start_date).days, length), lo)
+        if (lo, hi) == (0, length):
+            continue
+        removed += length - (hi - lo)
+        if hi == lo:
+            emptied.append(s.id)
+            continue
+        s.start_date = s.start_date + timedelta(days=lo)
+        s.end_date = s.start_date + timedelta(days=hi - lo - 1)
+        s.quantities = s.quantities[lo:hi]
+        s.lower = None if s.lower is None else s.lower[lo:hi]
+        s.upper = None if s.upper is None else s.upper[lo:hi]
+        sliced.append(s)
+
+    ForecastSeries.objects.filter(id__in=emptied).delete()
+    ForecastSeries.objects.bulk_update(
+        sliced, ['start_date', 'end_date', 'quantities', 'lower', 'upper'], batch_size=500
+    )
+    return removed
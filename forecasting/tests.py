@@ -1,3 +1,154 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from forecasting import engines
+from forecasting.models import Forecast, ForecastConfig, ForecastSeries, ProductAlgorithm
+from sales.models import Product, Sale
+
+
+def fitted(y, start_date, horizon):
+    return np.full(horizon, 5.0)
+
+
+def failing(y, start_date, horizon):
+    raise RuntimeError('fit failed')
+
+
+class EngineFallbackTests(TestCase):
+    """A failed XGBoost/Prophet fit leaves exactly one forecast per product and day"""
+
+    def setUp(self):
+        self.product = Product.objects.create(name='Rice 5kg', price=Decimal('250.00'), category='Grocery')
+        now = timezone.now()
+        for days_ago in range(1, 61):
+            sale = Sale.objects.create(product=self.product, quantity=2, total_price=Decimal('500.00'))
+            Sale.objects.filter(pk=sale.pk).update(sale_date=now - timedelta(days=days_ago))
+        # Keep the tournament out of these runs
+        config = ForecastConfig.get_config()
+        config.last_tournament = now
+        config.save()
+
+    def generate(self, engines_used):
+        with mock.patch.dict(engines.ENGINES, engines_used):
+            call_command('auto_generate_forecast', '--force', stdout=StringIO())
+
+    def test_failed_engine_without_selection_keeps_only_fallback(self):
+        self.generate({'xgboost': fitted, 'prophet': failing})
+
+        self.assertEqual(
+            list(ForecastSeries.objects.filter(product=self.product).values_list('algorithm', flat=True)),
+            ['holt_winters'],
+        )
+        best = Forecast.objects.best().filter(product=self.product)
+        self.assertEqual(best.count(), 30)
+        self.assertEqual(best.values('forecast_date').distinct().count(), 30)
+
+    def test_failed_selected_engine_falls_back_to_holt_winters(self):
+        ProductAlgorithm.objects.create(product=self.product, algorithm='prophet')
+        self.generate({'xgboost': fitted, 'prophet': failing})
+
+        best = Forecast.objects.best().filter(product=self.product)
+        self.assertEqual(best.count(), 30)
+        self.assertEqual(set(best.values_list('algorithm_used', flat=True)), {'holt_winters'})
+
+    def test_selected_engine_hides_other_series_of_its_run(self):
+        ProductAlgorithm.objects.create(product=self.product, algorithm='xgboost')
+        self.generate({'xgboost': fitted, 'prophet': failing})
+        run = ForecastSeries.objects.get(product=self.product).run
+        # A Holt-Winters series next to the selected one is not a fallback
+        ForecastSeries.objects.create(
+            run=run, product=self.product, algorithm='holt_winters',
+            start_date=timezone.now().date(), end_date=timezone.now().date(), quantities=[1],
+        )
+
+        best = Forecast.objects.best().filter(product=self.product)
+        self.assertEqual(best.count(), 30)
+        self.assertEqual(set(best.values_list('algorithm_used', flat=True)), {'xgboost'})
+
+
+class IncrementalHierarchicalTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.rice = Product.objects.create(name='Rice 5kg', price=Decimal('250.00'), category='Grocery')
+        self.soap = Product.objects.create(name='Soap', price=Decimal('40.00'), category='Household')
+        for product in (self.rice, self.soap):
+            for days_ago in range(1, 61):
+                sale = Sale.objects.create(product=product, quantity=1, total_price=product.price)
+                Sale.objects.filter(pk=sale.pk).update(sale_date=now - timedelta(days=days_ago))
+        config = ForecastConfig.get_config()
+        config.hierarchical_method = 'mint'
+        config.save()
+
+    def test_incremental_run_splits_categories_top_down(self):
+        out = StringIO()
+        with mock.patch.dict(engines.ENGINES, {'xgboost': fitted}):
+            call_command('auto_generate_forecast', '--incremental', stdout=out)
+
+        # Creating the sales marked both products dirty; the partial total of
+        # an incremental run is never used for MinT
+        self.assertIn('Hierarchical forecast (top_down)', out.getvalue())
+        self.assertEqual(
+            set(ForecastSeries.objects.values_list('product_id', 'algorithm')),
+            {(self.rice.pk, 'hierarchical'), (self.soap.pk, 'hierarchical')},
+        )
+
+
+class ForecastViewTests(TestCase):
+    """The per-day Forecast view (migration 0009) mirrors ForecastSeries"""
+
+    def setUp(self):
+        self.product = Product.objects.create(name='Rice 5kg', price=Decimal('250.00'))
+        self.start = timezone.now().date().replace(month=1, day=30)
+
+    def make_series(self, algorithm, quantities, start=None):
+        return ForecastSeries.objects.create(
+            product=self.product, algorithm=algorithm, start_date=start or self.start,
+            end_date=(start or self.start) + timedelta(days=len(quantities) - 1), quantities=quantities,
+        )
+
+    def rows(self, series):
+        return list(
+            Forecast.objects.filter(series=series).order_by('forecast_date')
+            .values_list('forecast_date', 'predicted_quantity', 'algorithm_used', 'product_id')
+        )
+
+    def test_rows_match_series_quantities(self):
+        # Runs over a month end to check the date arithmetic
+        series = self.make_series('holt_winters', [3, 0, 7, 12, 1])
+
+        self.assertEqual(self.rows(series), [
+            (self.start + timedelta(days=i), quantity, 'holt_winters', self.product.pk)
+            for i, quantity in enumerate(series.quantities)
+        ])
+
+    def test_row_ids_are_unique_across_series(self):
+        self.make_series('xgboost', [1] * 30)
+        self.make_series('prophet', [2] * 30)
+
+        ids = list(Forecast.objects.values_list('id', flat=True))
+        self.assertEqual(len(ids), 60)
+        self.assertEqual(len(set(ids)), 60)
+
+    def test_trimmed_series_drop_their_rows(self):
+        from forecasting.storage import trim_forecasts
+
+        series = self.make_series('holt_winters', [1, 2, 3, 4, 5])
+        removed = trim_forecasts(before=self.start + timedelta(days=1), from_date=self.start + timedelta(days=4))
+        series.refresh_from_db()
+
+        self.assertEqual(removed, 2)
+        self.assertEqual(series.quantities, [2, 3, 4])
+        self.assertEqual([row[:2] for row in self.rows(series)], [
+            (self.start + timedelta(days=i), i + 1) for i in range(1, 4)
+        ])
 
-# Create your tests here.
+        trim_forecasts(from_date=self.start)
+        self.assertFalse(Forecast.objects.filter(product=self.product).exists())
+        self.assertFalse(ForecastSeries.objects.filter(product=self.product).exists())
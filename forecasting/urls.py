@@ -5,4 +5,6 @@ urlpatterns = [
     path('forecasts/', views.ForecastListView.as_view(), name='forecast_list'),
     path('forecasts/print-report/', views.ForecastPrintReportView.as_view(), name='forecast_print_report'),
     path('forecasts/<int:pk>/', views.ForecastDetailView.as_view(), name='forecast_detail'),
+    path('api/', views.forecast_api_batch, name='forecast_api_batch'),
+    path('api/<int:product_id>/', views.forecast_api, name='forecast_api'),
 ]
@@ -1,8 +1,11 @@
 from django.shortcuts import render
+from django.http import JsonResponse
+from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import condition, require_http_methods
 from django.views.generic import ListView, DetailView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db import models
-from django.db.models import Q, Sum, F
+from django.db.models import Count, Q, Sum, F
 from django.db.models.functions import TruncDate
 from .models import Forecast, ForecastConfig
 from sales.models import Sale
@@ -22,7 +25,7 @@ class ForecastListView(LoginRequiredMixin, ListView):
         today = datetime.now().date()
         seven_days_ago = today - timedelta(days=7)
         
-        queryset = Forecast.objects.select_related('product').filter(
+        queryset = Forecast.objects.select_related('product').with_revenue().filter(
             forecast_date__gte=seven_days_ago
         )
         
@@ -33,7 +36,9 @@ class ForecastListView(LoginRequiredMixin, ListView):
         
         # Apply algorithm filter
         algorithm = self.request.GET.get('algorithm')
-        if algorithm and algorithm in ['xgboost', 'prophet']:
+        if algorithm == 'best':
+            queryset = queryset.best()
+        elif algorithm and algorithm in dict(Forecast.ALGORITHM_CHOICES):
             queryset = queryset.filter(algorithm_used=algorithm)
         
         # Apply date range filter
@@ -110,25 +115,17 @@ class ForecastListView(LoginRequiredMixin, ListView):
             
             context['forecast_data_json'] = json.dumps(formatted_forecasts)
             
-            # Calculate total projected revenue from future forecasts only (next 30 days)
-            future_forecasts = Forecast.objects.filter(
+            # Total projected revenue and units from future forecasts only (next 30 days)
+            totals = Forecast.objects.filter(
                 forecast_date__gte=today,
                 forecast_date__lte=thirty_days_ahead
-            ).select_related('product')
-            
-            total_revenue = sum(
-                forecast.predicted_revenue 
-                for forecast in future_forecasts
-            )
-            
-            # Calculate total predicted units
-            total_units = sum(
-                forecast.predicted_quantity 
-                for forecast in future_forecasts
+            ).with_revenue().aggregate(
+                total_revenue=Sum('predicted_revenue'),
+                total_units=Sum('predicted_quantity'),
             )
             
-            context['total_projected_revenue'] = total_revenue
-            context['total_predicted_units'] = total_units
+            context['total_projected_revenue'] = totals['total_revenue'] or 0
+            context['total_predicted_units'] = totals['total_units'] or 0
             
             # Get unique products for filter dropdown
             context['all_products'] = Forecast.objects.values_list(
@@ -140,6 +137,7 @@ class ForecastListView(LoginRequiredMixin, ListView):
             context['algorithm_filter'] = self.request.GET.get('algorithm', '')
             context['date_range_filter'] = self.request.GET.get('date_range', 'all')
             context['sort_by'] = self.request.GET.get('sort_by', '-forecast_date')
+            context['algorithm_choices'] = Forecast.ALGORITHM_CHOICES
             
             # Add forecast generation status
             try:
@@ -179,7 +177,7 @@ class ForecastPrintReportView(LoginRequiredMixin, TemplateView):
         seven_days_ago = today - timedelta(days=7)
         
         # Get forecasts with related product data
-        forecasts = Forecast.objects.select_related('product').filter(
+        forecasts = Forecast.objects.select_related('product').with_revenue().filter(
             forecast_date__gte=seven_days_ago
         )
         
@@ -190,7 +188,9 @@ class ForecastPrintReportView(LoginRequiredMixin, TemplateView):
         
         # Apply algorithm filter
         algorithm = self.request.GET.get('algorithm')
-        if algorithm and algorithm in ['xgboost', 'prophet']:
+        if algorithm == 'best':
+            forecasts = forecasts.best()
+        elif algorithm and algorithm in dict(Forecast.ALGORITHM_CHOICES):
             forecasts = forecasts.filter(algorithm_used=algorithm)
         
         # Apply date range filter
@@ -209,6 +209,7 @@ class ForecastPrintReportView(LoginRequiredMixin, TemplateView):
         valid_sorts = [
             '-forecast_date', 'forecast_date',
             '-predicted_quantity', 'predicted_quantity',
+            '-predicted_revenue', 'predicted_revenue',
             'algorithm_used', '-algorithm_used',
             'product__name', '-product__name'
         ]
@@ -217,19 +218,23 @@ class ForecastPrintReportView(LoginRequiredMixin, TemplateView):
         else:
             forecasts = forecasts.order_by('-forecast_date', '-created_at')
         
-        # Calculate summary statistics
-        total_forecasts = forecasts.count()
-        total_predicted_units = forecasts.aggregate(total=Sum('predicted_quantity'))['total'] or 0
-        # Calculate revenue: Sum of (predicted_quantity * product.price)
-        total_projected_revenue = sum([f.predicted_revenue for f in forecasts]) if forecasts else 0
+        # Summary statistics and counts by algorithm in one aggregate query
+        summary = forecasts.aggregate(
+            total_forecasts=Count('id'),
+            total_predicted_units=Sum('predicted_quantity'),
+            total_projected_revenue=Sum('predicted_revenue'),
+            xgboost_count=Count('id', filter=Q(algorithm_used='xgboost')),
+            prophet_count=Count('id', filter=Q(algorithm_used='prophet')),
+        )
+        total_forecasts = summary['total_forecasts']
+        total_predicted_units = summary['total_predicted_units'] or 0
+        total_projected_revenue = summary['total_projected_revenue'] or 0
+        xgboost_count = summary['xgboost_count']
+        prophet_count = summary['prophet_count']
         
         # Calculate average revenue per forecast
         average_revenue_per_forecast = total_projected_revenue / total_forecasts if total_forecasts > 0 else 0
         
-        # Count by algorithm
-        xgboost_count = forecasts.filter(algorithm_used='xgboost').count()
-        prophet_count = forecasts.filter(algorithm_used='prophet').count()
-        
         # Get unique products for filter dropdown
         all_products = Forecast.objects.values_list(
             'product_id', 'product__name'
@@ -242,6 +247,7 @@ class ForecastPrintReportView(LoginRequiredMixin, TemplateView):
         context['average_revenue_per_forecast'] = average_revenue_per_forecast
         context['xgboost_count'] = xgboost_count
         context['prophet_count'] = prophet_count
+        context['baseline_count'] = total_forecasts - xgboost_count - prophet_count
         context['all_products'] = all_products
         context['product_id_filter'] = product_id or ''
         context['algorithm_filter'] = algorithm or ''
@@ -249,4 +255,59 @@ class ForecastPrintReportView(LoginRequiredMixin, TemplateView):
         context['sort_by'] = sort_by
         context['generated_date'] = datetime.now()
         
-        return context
\ No newline at end of file
+        return context
+
+
+def _batch_product_ids(request):
+    """Product ids from ``?ids=1,2,3`` (invalid entries are ignored)"""
+    from .serving import MAX_BATCH_PRODUCTS
+    ids = []
+    for value in request.GET.get('ids', '').split(','):
+        if value.strip().isdigit() and int(value) not in ids:
+            ids.append(int(value))
+    return ids[:MAX_BATCH_PRODUCTS]
+
+
+def _product_etag(request, product_id):
+    from .serving import forecast_etag
+    return forecast_etag([product_id])
+
+
+def _batch_etag(request):
+    from .serving import forecast_etag
+    ids = _batch_product_ids(request)
+    return forecast_etag(ids) if ids else None
+
+
+@login_required
+@require_http_methods(["GET"])
+@condition(etag_func=_product_etag)
+def forecast_api(request, product_id):
+    """
+    JSON forecast for one product: the latest stored run, or a forecast
+    scored on demand. Clients revalidate with If-None-Match (304 when the
+    run has not changed).
+    """
+    from .serving import get_forecasts
+
+    payload = get_forecasts([product_id]).get(product_id)
+    if payload is None:
+        return JsonResponse({'error': 'Product not found'}, status=404)
+    return JsonResponse(payload)
+
+
+@login_required
+@require_http_methods(["GET"])
+@condition(etag_func=_batch_etag)
+def forecast_api_batch(request):
+    """JSON forecasts for up to 100 products: ``?ids=1,2,3``"""
+    from .serving import get_forecasts
+
+    product_ids = _batch_product_ids(request)
+    if not product_ids:
+        return JsonResponse({'error': 'Pass product ids as ?ids=1,2,3'}, status=400)
+    payloads = get_forecasts(product_ids)
+    return JsonResponse({
+        'results': [payloads[pid] for pid in product_ids if pid in payloads],
+        'not_found': [pid for pid in product_ids if pid not in payloads],
+    })
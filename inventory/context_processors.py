@@ -1,5 +1,10 @@
+from datetime import timedelta
+
 from django.db import models
-from .models import Stock
+from django.utils import timezone
+from .models import Stock, StockProjection
+
+STOCKOUT_ALERT_DAYS = 7
 
 def low_stock_notifications(request):
     """
@@ -20,6 +25,24 @@ def low_stock_notifications(request):
                 'timestamp': stock.last_updated
             })
         
+        # Items still above their reorder level but forecast to run out soon
+        projected = StockProjection.objects.filter(
+            stockout_date__lte=timezone.now().date() + timedelta(days=STOCKOUT_ALERT_DAYS),
+            product__stock__quantity__gt=models.F('product__stock__reorder_level'),
+        ).select_related('product').values(
+            'product__name', 'product__stock__id', 'stockout_date', 'days_of_cover', 'projected_at'
+        )
+        for projection in projected:
+            notifications.append({
+                'type': 'warning',
+                'icon': 'fa-chart-line',
+                'title': f'Projected Stockout: {projection["product__name"]}',
+                'message': f'Forecast to run out on {projection["stockout_date"]:%b %d} '
+                           f'({projection["days_of_cover"]:.1f} days of cover)',
+                'url': f'/inventory/stocks/{projection["product__stock__id"]}/',
+                'timestamp': projection['projected_at']
+            })
+        
         return {
             'low_stock_notifications': notifications,
             'notification_count': len(notifications)
@@ -8,7 +8,7 @@ class StockForm(forms.ModelForm):
     
     class Meta:
         model = Stock
-        fields = ['product', 'supplier', 'quantity', 'reorder_level']
+        fields = ['product', 'supplier', 'quantity', 'reorder_level', 'order_up_to_level']
         widgets = {
             'product': forms.Select(attrs={
                 'class': 'form-control form-select',
@@ -27,6 +27,11 @@ class StockForm(forms.ModelForm):
                 'min': '0',
                 'placeholder': 'Enter reorder level',
             }),
+            'order_up_to_level': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': '0',
+                'placeholder': 'Enter order-up-to level',
+            }),
         }
 
     def __init__(self, *args, **kwargs):
@@ -40,13 +45,20 @@ class StockForm(forms.ModelForm):
         self.fields['supplier'].required = False
         self.fields['supplier'].empty_label = "Select a supplier (optional)"
 
+    def validate_unique(self):
+        # Adding stock for a product that already has a record restocks it
+        # (see StockCreateView), so the one-stock-per-product check only
+        # applies when editing
+        if self.instance.pk:
+            super().validate_unique()
+
 
 class SupplierForm(forms.ModelForm):
     """Form for creating and updating suppliers"""
     
     class Meta:
         model = Supplier
-        fields = ['name', 'contact_person', 'contact_email', 'contact_phone', 'address']
+        fields = ['name', 'contact_person', 'contact_email', 'contact_phone', 'address', 'lead_time_days']
         widgets = {
             'name': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -69,6 +81,11 @@ class SupplierForm(forms.ModelForm):
                 'placeholder': 'Enter address',
                 'rows': 3,
             }),
+            'lead_time_days': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': '0',
+                'placeholder': 'Enter lead time in days',
+            }),
         }
     
     def __init__(self, *args, **kwargs):
@@ -109,3 +126,58 @@ class SupplierForm(forms.ModelForm):
         if not address or not address.strip():
             raise forms.ValidationError('Address is required.')
         return address.strip()
+
+
+class DeliveryForm(forms.Form):
+    """Upload of a delivery note for bulk receiving (see inventory.receiving)"""
+    
+    KIND_CHOICES = [
+        ('receipt', 'Receipt (units delivered)'),
+        ('adjustment', 'Adjustment (signed corrections)'),
+    ]
+    
+    delivery_file = forms.FileField(
+        required=False,
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.json'}),
+    )
+    kind = forms.ChoiceField(
+        choices=KIND_CHOICES,
+        initial='receipt',
+        widget=forms.Select(attrs={'class': 'form-control form-select'}),
+    )
+    note = forms.CharField(
+        max_length=200,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g. Delivery note #1234'}),
+    )
+    # Parsed lines of a previewed upload, posted back when it is applied
+    payload = forms.CharField(required=False, widget=forms.HiddenInput)
+    filename = forms.CharField(required=False, widget=forms.HiddenInput)
+    
+    def clean(self):
+        import json
+        from .receiving import parse_delivery
+        
+        cleaned_data = super().clean()
+        upload = cleaned_data.get('delivery_file')
+        if upload:
+            if upload.size > 5 * 1024 * 1024:
+                raise forms.ValidationError('Delivery notes are limited to 5 MB.')
+            try:
+                cleaned_data['rows'] = parse_delivery(upload.name, upload.read())
+            except ValueError as e:
+                raise forms.ValidationError(str(e))
+            cleaned_data['filename'] = upload.name
+        elif cleaned_data.get('payload'):
+            try:
+                rows = json.loads(cleaned_data['payload'])
+                cleaned_data['rows'] = [
+                    {key: str(row.get(key, '')) for key in ('sku', 'quantity', 'supplier', 'unit_cost')}
+                    | {'line': int(row['line'])}
+                    for row in rows
+                ]
+            except (ValueError, TypeError, KeyError, AttributeError):
+                raise forms.ValidationError('The previewed delivery could not be read; please upload it again.')
+        else:
+            raise forms.ValidationError('Choose a CSV or JSON delivery note to upload.')
+        return cleaned_data
@@ -0,0 +1,28 @@
+"""
+Management command to delete expired POS stock reservations.
+Run: python manage.py expire_reservations
+
+Expired reservations already stop counting against available stock; this
+removes the rows in batches so the reservation table stays small.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Delete expired stock reservations of abandoned POS carts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Reservations deleted per batch (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        from inventory.reservations import expire_reservations
+
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        deleted = expire_reservations(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired reservations.'))
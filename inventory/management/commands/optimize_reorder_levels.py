@@ -0,0 +1,113 @@
+"""
+Management command to set reorder levels from forecasts.
+Run: python manage.py optimize_reorder_levels --service-level 0.95
+
+Computes a reorder point and order-up-to level per product from its
+forecast demand over the supplier lead time, the forecast error and the
+target service level, then saves every change in one bulk update.
+"""
+import time
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from audit.models import AuditLog
+from inventory.models import Stock
+
+
+class Command(BaseCommand):
+    help = 'Set reorder levels and order-up-to levels from forecasts, lead times and a service level'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--service-level',
+            type=float,
+            default=0.95,
+            help='Target probability of not running out during a replenishment cycle (default: 0.95)',
+        )
+        parser.add_argument(
+            '--review-days',
+            type=int,
+            default=7,
+            help='Days between stock reviews / orders (default: 7)',
+        )
+        parser.add_argument(
+            '--default-lead-time',
+            type=int,
+            default=7,
+            help='Lead time in days for stock without a supplier (default: 7)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the changes without saving them',
+        )
+
+    def handle(self, *args, **options):
+        service_level = options['service_level']
+        if not 0.5 <= service_level < 1:
+            raise CommandError('--service-level must be between 0.5 and 1 (exclusive).')
+        if options['review_days'] < 0 or options['default_lead_time'] < 0:
+            raise CommandError('--review-days and --default-lead-time cannot be negative.')
+
+        from inventory.projection import reproject
+        from inventory.replenishment import optimize_reorder_levels
+
+        started = time.perf_counter()
+        changed, evaluated = optimize_reorder_levels(
+            service_level=service_level,
+            review_days=options['review_days'],
+            default_lead_time=options['default_lead_time'],
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        raised = sum(stock.reorder_level > stock.previous_reorder_level for stock in changed)
+        lowered = sum(stock.reorder_level < stock.previous_reorder_level for stock in changed)
+
+        if options['dry_run']:
+            self.stdout.write(f'{"Product":>10}{"Reorder level":>16}{"Order up to":>14}')
+            for stock in changed[:50]:
+                self.stdout.write(
+                    f'{stock.product_id:>10}'
+                    f'{f"{stock.previous_reorder_level} -> {stock.reorder_level}":>16}'
+                    f'{stock.order_up_to_level:>14}'
+                )
+            if len(changed) > 50:
+                self.stdout.write(f'... and {len(changed) - 50} more')
+            self.stdout.write(self.style.WARNING(
+                f'Dry run: {len(changed)} of {evaluated} products would change '
+                f'({raised} raised, {lowered} lowered). Nothing was saved.'
+            ))
+            return
+
+        if changed:
+            old_total = sum(stock.previous_reorder_level for stock in changed)
+            new_total = sum(stock.reorder_level for stock in changed)
+            with transaction.atomic():
+                Stock.objects.bulk_update(changed, ['reorder_level', 'order_up_to_level'], batch_size=500)
+                # One summary entry for the whole run instead of one per product
+                AuditLog.objects.create(
+                    action='UPDATE',
+                    content_type=ContentType.objects.get_for_model(Stock),
+                    object_name='Reorder levels',
+                    description=(
+                        f'Optimized reorder levels for {len(changed)} products at a '
+                        f'{service_level:.0%} service level ({raised} raised, {lowered} lowered)'
+                    ),
+                    changes={
+                        'Products updated': {'old': '—', 'new': len(changed)},
+                        'Service level': {'old': '—', 'new': f'{service_level:.0%}'},
+                        'Review period (days)': {'old': '—', 'new': options['review_days']},
+                        'Average reorder level': {
+                            'old': round(old_total / len(changed), 1),
+                            'new': round(new_total / len(changed), 1),
+                        },
+                    },
+                )
+            reproject([stock.product_id for stock in changed])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {len(changed)} of {evaluated} products in {elapsed_ms:.0f} ms '
+            f'({raised} raised, {lowered} lowered).'
+        ))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_make_supplier_fields_required'),
+        ('sales', '0011_alter_product_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockProjection',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_projection', serialize=False, to='sales.product')),
+                ('on_hand', models.PositiveIntegerField()),
+                ('projected_demand', models.PositiveIntegerField(help_text='Forecast units over the horizon')),
+                ('days_of_cover', models.FloatField(blank=True, help_text='Null when stock outlasts the horizon', null=True)),
+                ('stockout_date', models.DateField(blank=True, db_index=True, null=True)),
+                ('units_short', models.PositiveIntegerField(default=0, help_text='Forecast demand not covered by stock over the horizon')),
+                ('horizon_days', models.PositiveIntegerField()),
+                ('projected_at', models.DateTimeField()),
+            ],
+        ),
+    ]
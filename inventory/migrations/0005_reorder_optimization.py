@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_stock_projection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='order_up_to_level',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='lead_time_days',
+            field=models.PositiveIntegerField(default=7, help_text='Days from placing an order to receiving it'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_reorder_optimization'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockprojection',
+            name='expected_lost_sales',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stockprojection',
+            name='risk_window_days',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stockprojection',
+            name='simulated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stockprojection',
+            name='stockout_probability',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def opening_balances(apps, schema_editor):
+    """Start the ledger with each product's current quantity"""
+    Stock = apps.get_model('inventory', 'Stock')
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            product_id=product_id, kind='adjustment', quantity=quantity, balance_after=quantity,
+            note='Opening balance', created_at=last_updated,
+        )
+        for product_id, quantity, last_updated in
+        Stock.objects.filter(quantity__gt=0).values_list('product_id', 'quantity', 'last_updated').iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stockout_simulation'),
+        ('sales', '0011_alter_product_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('sale', 'Sale'), ('return', 'Return'), ('receipt', 'Receipt'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('quantity', models.IntegerField(help_text='Units added (positive) or removed (negative)')),
+                ('balance_after', models.PositiveIntegerField(help_text='Quantity on hand after this movement')),
+                ('reference_id', models.PositiveIntegerField(blank=True, help_text='Sale or Return id for sales and returns', null=True)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='sales.product')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['product', 'created_at'], name='inventory_s_product_5919a9_idx'), models.Index(fields=['kind', 'reference_id'], name='inventory_s_kind_add660_idx'), models.Index(fields=['created_at'], name='inventory_s_created_05ebf5_idx')],
+            },
+        ),
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
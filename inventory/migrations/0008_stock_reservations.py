@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_stock_movement_ledger'),
+        ('sales', '0011_alter_product_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cart_token', models.CharField(help_text='Identifies the terminal cart holding the units', max_length=64)),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='sales.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'expires_at'], name='inventory_s_product_258863_idx'), models.Index(fields=['expires_at'], name='inventory_s_expires_9d6a1b_idx')],
+                'constraints': [models.UniqueConstraint(fields=('cart_token', 'product'), name='unique_cart_reservation')],
+            },
+        ),
+    ]
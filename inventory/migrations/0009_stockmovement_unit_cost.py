@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovement',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Purchase cost per unit, for receipts', max_digits=10, null=True),
+        ),
+    ]
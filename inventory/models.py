@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
 class Supplier(models.Model):
     name = models.CharField(max_length=255)
@@ -8,6 +10,7 @@ class Supplier(models.Model):
     contact_email = models.EmailField()
     contact_phone = models.CharField(max_length=20)
     address = models.TextField()
+    lead_time_days = models.PositiveIntegerField(default=7, help_text='Days from placing an order to receiving it')
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -18,6 +21,7 @@ class Stock(models.Model):
     supplier = models.ForeignKey(Supplier, on_delete=models.SET_NULL, null=True, blank=True)
     quantity = models.PositiveIntegerField(default=0)
     reorder_level = models.PositiveIntegerField(default=10)
+    order_up_to_level = models.PositiveIntegerField(null=True, blank=True)
     last_updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
@@ -27,6 +31,67 @@ class Stock(models.Model):
     def is_low_stock(self):
         return self.quantity <= self.reorder_level
 
+class StockMovement(models.Model):
+    """
+    Append-only ledger of stock changes. Every change to Stock.quantity is
+    written here in the same transaction by inventory.services.StockService.
+    """
+
+    KIND_CHOICES = [
+        ('sale', 'Sale'),
+        ('return', 'Return'),
+        ('receipt', 'Receipt'),
+        ('adjustment', 'Adjustment'),
+    ]
+
+    product = models.ForeignKey('sales.Product', on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField(help_text='Units added (positive) or removed (negative)')
+    balance_after = models.PositiveIntegerField(help_text='Quantity on hand after this movement')
+    reference_id = models.PositiveIntegerField(null=True, blank=True, help_text='Sale or Return id for sales and returns')
+    note = models.CharField(max_length=255, blank=True)
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text='Purchase cost per unit, for receipts')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['product', 'created_at']),
+            models.Index(fields=['kind', 'reference_id']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity:+d} for product {self.product_id}"
+
+
+class StockReservation(models.Model):
+    """
+    Units held for a POS cart until checkout or until the lease expires
+    (see inventory.reservations). Available to sell = on hand - active
+    reservations.
+    """
+    product = models.ForeignKey('sales.Product', on_delete=models.CASCADE, related_name='reservations')
+    cart_token = models.CharField(max_length=64, help_text='Identifies the terminal cart holding the units')
+    quantity = models.PositiveIntegerField()
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart_token', 'product'], name='unique_cart_reservation'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'expires_at']),
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} of product {self.product_id} held until {self.expires_at:%H:%M:%S}"
+
+
 # Auto-create stock records for new products
 @receiver(post_save, sender='sales.Product')
 def create_stock_for_product(sender, instance, created, **kwargs):
@@ -42,3 +107,50 @@ def create_stock_for_product(sender, instance, created, **kwargs):
             logger = logging.getLogger(__name__)
             logger.warning(f"Could not auto-create stock for product {instance.id}: {str(e)}")
 
+
+
+class StockProjection(models.Model):
+    """
+    Projected stock position of a product over the forecast horizon
+    (see inventory.projection). Refreshed whenever stock or forecasts change.
+    """
+    product = models.OneToOneField('sales.Product', on_delete=models.CASCADE, primary_key=True, related_name='stock_projection')
+    on_hand = models.PositiveIntegerField()
+    projected_demand = models.PositiveIntegerField(help_text="Forecast units over the horizon")
+    days_of_cover = models.FloatField(null=True, blank=True, help_text="Null when stock outlasts the horizon")
+    stockout_date = models.DateField(null=True, blank=True, db_index=True)
+    units_short = models.PositiveIntegerField(default=0, help_text="Forecast demand not covered by stock over the horizon")
+    horizon_days = models.PositiveIntegerField()
+    projected_at = models.DateTimeField()
+    # Monte Carlo risk until the next delivery (see inventory.simulation)
+    stockout_probability = models.FloatField(null=True, blank=True)
+    expected_lost_sales = models.FloatField(null=True, blank=True)
+    risk_window_days = models.PositiveIntegerField(null=True, blank=True)
+    simulated_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Projection for {self.product_id}: stockout {self.stockout_date or 'beyond horizon'}"
+
+
+@receiver(post_save, sender=Stock)
+def reproject_stock(sender, instance, raw=False, **kwargs):
+    """Re-project a product's stock after its quantity is saved"""
+    if raw:
+        return
+    from django.db import transaction
+    from inventory.projection import reproject
+
+    def run():
+        try:
+            reproject([instance.product_id])
+        except Exception as e:
+            import logging
+            logger = logging.getLogger(__name__)
+            logger.warning(f"Could not project stock for product {instance.product_id}: {str(e)}")
+
+    transaction.on_commit(run)
+
+
+@receiver(post_delete, sender=Stock)
+def delete_stock_projection(sender, instance, **kwargs):
+    StockProjection.objects.filter(product_id=instance.product_id).delete()
@@ -0,0 +1,244 @@
+"""
+Bulk stock receiving from a delivery note.
+
+A delivery note is a CSV or JSON list of lines (SKU or product name,
+quantity, optional supplier and unit cost). ``parse_delivery`` reads it,
+``validate`` resolves every line against products and suppliers with one
+query each and reports all problems at once, and ``receive`` books the
+whole note through StockService.apply in one transaction: one locked
+read, one ``UPDATE ... CASE`` and one ledger insert per chunk of products,
+instead of a form post per SKU.
+"""
+import csv
+import io
+import json
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q
+
+from inventory.models import Stock, StockMovement, Supplier
+from inventory.services import StockService
+from sales.models import Product
+
+
+# Accepted column names (lower case, spaces as underscores) per field
+COLUMNS = {
+    'sku': ('sku', 'label', 'product', 'product_name', 'name'),
+    'quantity': ('quantity', 'qty', 'units'),
+    'supplier': ('supplier', 'supplier_name'),
+    'unit_cost': ('unit_cost', 'cost'),
+}
+
+# Products per StockService.apply call, keeping each UPDATE ... CASE well
+# under SQLite's bound-parameter limit
+CHUNK_PRODUCTS = 2000
+
+MAX_LINES = 20000
+
+
+def _field(record, field):
+    for name in COLUMNS[field]:
+        value = record.get(name)
+        if value not in (None, ''):
+            return str(value).strip()
+    return ''
+
+
+def parse_delivery(filename, content):
+    """
+    Read a delivery note (bytes) into a list of {'line', 'sku', 'quantity',
+    'supplier', 'unit_cost'} string dicts. JSON is a list of objects (or
+    an object with a "lines" list); anything else is read as CSV with a
+    header row. Raises ValueError if the file cannot be read.
+    """
+    try:
+        text = content.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = content.decode('latin-1')
+
+    if filename.lower().endswith('.json') or text.lstrip()[:1] in ('[', '{'):
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if isinstance(data, dict):
+            data = data.get('lines', data.get('items'))
+        if not isinstance(data, list) or not all(isinstance(record, dict) for record in data):
+            raise ValueError('JSON delivery notes must be a list of line objects.')
+        records = data
+        first_line = 1
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames:
+            raise ValueError('The file is empty.')
+        reader.fieldnames = [name.strip().lower().replace(' ', '_') for name in reader.fieldnames]
+        records = list(reader)
+        # Line numbers as a spreadsheet shows them, after the header row
+        first_line = 2
+
+    records = [
+        {str(key).strip().lower().replace(' ', '_'): value for key, value in record.items() if key is not None}
+        for record in records
+    ]
+    if not records:
+        raise ValueError('The delivery note has no lines.')
+    if len(records) > MAX_LINES:
+        raise ValueError(f'The delivery note has {len(records)} lines; the limit is {MAX_LINES}.')
+    if not any(_field(record, 'sku') for record in records) or not any(_field(record, 'quantity') for record in records):
+        raise ValueError('The delivery note needs an SKU (or product) column and a quantity column.')
+
+    return [
+        {
+            'line': first_line + i,
+            'sku': _field(record, 'sku'),
+            'quantity': _field(record, 'quantity'),
+            'supplier': _field(record, 'supplier'),
+            'unit_cost': _field(record, 'unit_cost'),
+        }
+        for i, record in enumerate(records)
+    ]
+
+
+def _products_by_key(keys):
+    """{key: [(id, name), ...]} for products whose label, or else name, is ``key``. One query."""
+    by_label = defaultdict(list)
+    by_name = defaultdict(list)
+    for pid, label, name in Product.objects.filter(Q(label__in=keys) | Q(name__in=keys)).values_list('id', 'label', 'name'):
+        if label in keys:
+            by_label[label].append((pid, name))
+        if name in keys:
+            by_name[name].append((pid, name))
+    return {key: by_label.get(key) or by_name.get(key, []) for key in keys}
+
+
+def validate(rows, kind='receipt'):
+    """
+    Resolve parsed rows against products and suppliers. Returns (lines,
+    errors): lines are JSON-ready dicts with product_id, supplier_id,
+    quantity (int) and unit_cost (string or None); errors are
+    {'line', 'message'} for every row that cannot be booked.
+    """
+    products = _products_by_key({row['sku'] for row in rows if row['sku']})
+    supplier_names = {row['supplier'] for row in rows if row['supplier']}
+    suppliers = defaultdict(list)
+    for sid, name in Supplier.objects.filter(name__in=supplier_names).values_list('id', 'name'):
+        suppliers[name].append(sid)
+
+    lines, errors = [], []
+    for row in rows:
+        problems = []
+        matches = products.get(row['sku'], [])
+        if not row['sku']:
+            problems.append('missing SKU')
+        elif not matches:
+            problems.append(f'unknown SKU "{row["sku"]}"')
+        elif len(matches) > 1:
+            problems.append(f'SKU "{row["sku"]}" matches {len(matches)} products')
+
+        try:
+            quantity = int(row['quantity'])
+        except ValueError:
+            quantity = None
+            problems.append(f'invalid quantity "{row["quantity"]}"')
+        else:
+            if kind == 'receipt' and quantity <= 0:
+                problems.append('received quantity must be positive')
+            elif quantity == 0:
+                problems.append('adjustment quantity cannot be 0')
+
+        unit_cost = None
+        if row['unit_cost']:
+            try:
+                unit_cost = Decimal(row['unit_cost'].replace(',', '').lstrip('₱$'))
+            except InvalidOperation:
+                problems.append(f'invalid cost "{row["unit_cost"]}"')
+            else:
+                if not unit_cost.is_finite() or not 0 <= unit_cost < 10 ** 8:
+                    problems.append(f'invalid cost "{row["unit_cost"]}"')
+
+        supplier_ids = suppliers.get(row['supplier'], [])
+        if row['supplier'] and len(supplier_ids) != 1:
+            problems.append(
+                f'unknown supplier "{row["supplier"]}"' if not supplier_ids
+                else f'supplier "{row["supplier"]}" is ambiguous'
+            )
+
+        if problems:
+            errors.append({'line': row['line'], 'message': '; '.join(problems)})
+            continue
+        product_id, product_name = matches[0]
+        lines.append({
+            'line': row['line'],
+            'sku': row['sku'],
+            'product_id': product_id,
+            'product_name': product_name,
+            'quantity': quantity,
+            'supplier_id': supplier_ids[0] if supplier_ids else None,
+            'supplier_name': row['supplier'],
+            'unit_cost': str(unit_cost.quantize(Decimal('0.01'))) if unit_cost is not None else None,
+        })
+    return lines, errors
+
+
+def summarize(lines):
+    """Totals of validated lines: line, product and unit counts and the cost of the costed lines"""
+    return {
+        'lines': len(lines),
+        'products': len({line['product_id'] for line in lines}),
+        'units': sum(line['quantity'] for line in lines),
+        'cost': sum(
+            (Decimal(line['unit_cost']) * line['quantity'] for line in lines if line['unit_cost'] is not None),
+            Decimal('0'),
+        ),
+    }
+
+
+def preview(lines, limit=200):
+    """The first ``limit`` lines with the quantity on hand before and after booking them"""
+    shown = lines[:limit]
+    on_hand = dict(
+        Stock.objects.filter(product_id__in={line['product_id'] for line in shown}).values_list('product_id', 'quantity')
+    )
+    rows = []
+    for line in shown:
+        before = on_hand.get(line['product_id'], 0)
+        on_hand[line['product_id']] = after = max(0, before + line['quantity'])
+        rows.append({**line, 'before': before, 'after': after})
+    return rows
+
+
+@transaction.atomic
+def receive(lines, kind='receipt', note='', user=None):
+    """
+    Book validated lines as ``kind`` movements and set the supplier of
+    products whose line names one, all in one transaction. Returns the
+    saved movements.
+    """
+    by_product = defaultdict(list)
+    for line in lines:
+        by_product[line['product_id']].append(StockMovement(
+            product_id=line['product_id'],
+            kind=kind,
+            quantity=line['quantity'],
+            unit_cost=Decimal(line['unit_cost']) if line['unit_cost'] is not None else None,
+            note=note,
+            created_by=user,
+        ))
+
+    product_ids = sorted(by_product)
+    saved = []
+    # Chunks in product order, so concurrent imports lock rows in the same order
+    for start in range(0, len(product_ids), CHUNK_PRODUCTS):
+        saved += StockService.apply([
+            movement for pid in product_ids[start:start + CHUNK_PRODUCTS] for movement in by_product[pid]
+        ])
+
+    supplied = defaultdict(set)
+    for line in lines:
+        if line['supplier_id']:
+            supplied[line['supplier_id']].add(line['product_id'])
+    for supplier_id, pids in supplied.items():
+        Stock.objects.filter(product_id__in=pids).update(supplier_id=supplier_id)
+    return saved
@@ -0,0 +1,143 @@
+"""
+Forecast-driven reorder points and order-up-to levels.
+
+For a periodic-review (R, S) policy with supplier lead time L, stock is
+reordered when it falls to the expected lead-time demand plus safety
+stock, and topped up to the expected demand over L + R days plus safety
+stock:
+
+    reorder point = mu(L)     + z * sigma * sqrt(L)
+    order-up-to   = mu(L + R) + z * sigma * sqrt(L + R)
+
+mu comes from each product's selected forecast path, sigma from the
+daily forecast error measured in its tournament backtest (or, without
+one, the day-to-day variation of recent sales), and z from the target
+service level. All products are computed at once on NumPy arrays.
+"""
+from datetime import timedelta
+from statistics import NormalDist
+
+import numpy as np
+from django.utils import timezone
+
+from forecasting.models import Forecast, ProductAlgorithm
+from inventory.models import Stock
+
+
+DEFAULT_SERVICE_LEVEL = 0.95
+DEFAULT_REVIEW_DAYS = 7
+DEFAULT_LEAD_TIME_DAYS = 7
+HISTORY_DAYS = 90
+# Standard deviation of normally distributed errors is about 1.25 x MAE
+MAE_TO_SIGMA = 1.25
+
+
+def reorder_targets(daily_demand, sigma, lead_days, review_days, service_level):
+    """
+    Reorder points and order-up-to levels for every product.
+
+    ``daily_demand`` is a (products, days) array of expected demand starting
+    today; it is extended with each row's mean when L + R goes past the end.
+    ``sigma`` is the daily demand standard deviation and ``lead_days`` the
+    lead time per product. Returns two integer arrays.
+    """
+    daily_demand = np.asarray(daily_demand, dtype=np.float64)
+    sigma = np.asarray(sigma, dtype=np.float64)
+    lead_days = np.asarray(lead_days, dtype=np.int64)
+    cycle_days = lead_days + review_days
+    z = NormalDist().inv_cdf(service_level)
+
+    horizon = daily_demand.shape[1]
+    needed = int(cycle_days.max()) if len(cycle_days) else 0
+    if needed > horizon:
+        mean = daily_demand.mean(axis=1, keepdims=True) if horizon else np.zeros((len(sigma), 1))
+        daily_demand = np.hstack([daily_demand, np.repeat(mean, needed - horizon, axis=1)])
+    # Leading zero column so that cumulative[:, d] is the demand over d days
+    cumulative = np.hstack([np.zeros((len(sigma), 1)), np.cumsum(daily_demand, axis=1)])
+
+    lead_demand = np.take_along_axis(cumulative, lead_days[:, None], axis=1)[:, 0]
+    cycle_demand = np.take_along_axis(cumulative, cycle_days[:, None], axis=1)[:, 0]
+    reorder_point = np.ceil(lead_demand + z * sigma * np.sqrt(lead_days))
+    order_up_to = np.ceil(cycle_demand + z * sigma * np.sqrt(cycle_days))
+    return reorder_point.astype(np.int64), np.maximum(order_up_to, reorder_point).astype(np.int64)
+
+
+def expected_demand(product_ids, days, today):
+    """
+    Expected daily demand for ``days`` days from ``today``, one row per
+    product: the selected forecast path, continued at its own mean past its
+    end, or the recent daily mean for products without a forecast. Also
+    returns which products have a forecast and their recent daily sales.
+    """
+    from forecasting.demand import build_demand_matrix
+
+    index = {pid: i for i, pid in enumerate(product_ids)}
+    daily_demand = np.zeros((len(product_ids), days))
+    has_forecast = np.zeros(len(product_ids), dtype=bool)
+    last_day = np.zeros(len(product_ids), dtype=np.int64)
+    forecasts = Forecast.objects.best().filter(
+        forecast_date__gte=today, forecast_date__lt=today + timedelta(days=days),
+    ).values_list('product_id', 'forecast_date', 'predicted_quantity')
+    for pid, day, quantity in forecasts:
+        if pid in index:
+            i, d = index[pid], (day - today).days
+            daily_demand[i, d] = quantity
+            has_forecast[i] = True
+            last_day[i] = max(last_day[i], d + 1)
+
+    history = build_demand_matrix(
+        product_ids=list(product_ids), end_date=today - timedelta(days=1), history_days=HISTORY_DAYS,
+    ).subset(product_ids).values
+
+    path_mean = np.divide(
+        daily_demand.sum(axis=1), last_day, out=np.zeros(len(product_ids)), where=last_day > 0,
+    )
+    beyond = has_forecast[:, None] & (np.arange(days)[None, :] >= last_day[:, None])
+    daily_demand = np.where(beyond, path_mean[:, None], daily_demand)
+    daily_demand[~has_forecast] = history[~has_forecast].mean(axis=1)[:, None]
+    return daily_demand, has_forecast, history
+
+
+def optimize_reorder_levels(service_level=DEFAULT_SERVICE_LEVEL, review_days=DEFAULT_REVIEW_DAYS,
+                            default_lead_time=DEFAULT_LEAD_TIME_DAYS):
+    """
+    Compute new reorder levels for the whole catalog. Products with neither
+    a forecast nor recent sales are left alone. Returns the Stock rows whose
+    levels changed (updated in memory, not saved) and the number of products
+    evaluated.
+    """
+    today = timezone.now().date()
+    stocks = list(Stock.objects.select_related('supplier').only(
+        'id', 'product_id', 'reorder_level', 'order_up_to_level', 'supplier__lead_time_days'
+    ))
+    if not stocks:
+        return [], 0
+    ids = [stock.product_id for stock in stocks]
+    index = {pid: i for i, pid in enumerate(ids)}
+    lead_days = np.array([
+        stock.supplier.lead_time_days if stock.supplier else default_lead_time
+        for stock in stocks
+    ], dtype=np.int64)
+
+    daily_demand, has_forecast, history = expected_demand(
+        ids, int(lead_days.max()) + review_days, today,
+    )
+    has_sales = history.sum(axis=1) > 0
+
+    sigma = history.std(axis=1)
+    maes = ProductAlgorithm.objects.filter(product_id__in=ids, mae__isnull=False).values_list('product_id', 'mae')
+    for pid, mae in maes:
+        sigma[index[pid]] = MAE_TO_SIGMA * mae
+
+    reorder_point, order_up_to = reorder_targets(daily_demand, sigma, lead_days, review_days, service_level)
+
+    changed = []
+    for i, stock in enumerate(stocks):
+        if not (has_forecast[i] or has_sales[i]):
+            continue
+        new_levels = (int(reorder_point[i]), int(order_up_to[i]))
+        if (stock.reorder_level, stock.order_up_to_level) != new_levels:
+            stock.previous_reorder_level = stock.reorder_level
+            stock.reorder_level, stock.order_up_to_level = new_levels
+            changed.append(stock)
+    return changed, int((has_forecast | has_sales).sum())
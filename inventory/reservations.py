@@ -0,0 +1,140 @@
+"""
+Stock reservations for POS carts.
+
+Each terminal cart has a token. Whenever its lines change the terminal
+sends the whole cart to ``reserve_cart``, which holds the units for
+STOCK_RESERVATION_TTL_SECONDS. Holding is capped at what is on hand less
+the other carts' active reservations, so two terminals can no longer both
+sell the last units. Checkout checks the sale against the same figure and
+turns the cart's reservations into the sale in one transaction.
+Abandoned reservations stop counting as soon as they expire;
+``expire_reservations`` deletes them in batches.
+
+Available to sell is on hand minus ``SUM(quantity)`` over the active
+reservations, read from the (product, expires_at) index.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from inventory.models import StockReservation
+from inventory.services import StockService
+
+
+SWEEP_CACHE_KEY = 'inventory:reservation_sweep_queued'
+SWEEP_INTERVAL_SECONDS = 15 * 60
+
+
+def ttl():
+    return timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL_SECONDS', 300))
+
+
+def active_reservations(now=None):
+    return StockReservation.objects.filter(expires_at__gt=now or timezone.now())
+
+
+def reserved_quantities(product_ids, exclude_cart=None, now=None):
+    """Units held by active reservations per product id, optionally not counting one cart"""
+    reservations = active_reservations(now).filter(product_id__in=product_ids)
+    if exclude_cart:
+        reservations = reservations.exclude(cart_token=exclude_cart)
+    return dict(
+        reservations.values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total')
+    )
+
+
+def reserved_subquery(outer_ref='pk'):
+    """Expression for the units held by active reservations of the product at ``outer_ref``"""
+    total = (
+        active_reservations().filter(product_id=OuterRef(outer_ref))
+        .values('product_id').annotate(total=Sum('quantity')).values('total')[:1]
+    )
+    return Coalesce(Subquery(total, output_field=IntegerField()), 0)
+
+
+@transaction.atomic
+def reserve_cart(cart_token, quantities, user=None):
+    """
+    Make the cart's reservations match ``quantities`` ({product_id:
+    units}) and renew their lease. Each line gets as many units as are
+    available. Returns {product_id: {'requested', 'reserved',
+    'available'}}.
+    """
+    now = timezone.now()
+    product_ids = sorted(quantities)
+    on_hand = StockService.lock(product_ids) if product_ids else {}
+    held = reserved_quantities(product_ids, exclude_cart=cart_token, now=now)
+
+    result = {}
+    rows = []
+    for pid in product_ids:
+        available = max(0, on_hand[pid] - held.get(pid, 0))
+        reserved = min(quantities[pid], available)
+        result[pid] = {'requested': quantities[pid], 'reserved': reserved, 'available': available}
+        if reserved:
+            rows.append(StockReservation(
+                product_id=pid, cart_token=cart_token, quantity=reserved, created_by=user, expires_at=now + ttl(),
+            ))
+
+    StockReservation.objects.filter(cart_token=cart_token).exclude(
+        product_id__in=[row.product_id for row in rows]
+    ).delete()
+    StockReservation.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['cart_token', 'product'],
+        update_fields=['quantity', 'expires_at'],
+    )
+    return result
+
+
+def release_cart(cart_token):
+    """Drop all of a cart's reservations. Returns the number of lines released."""
+    deleted, _ = StockReservation.objects.filter(cart_token=cart_token).delete()
+    return deleted
+
+
+def convert_for_sale(cart_token, quantities):
+    """
+    At checkout, inside the sale's transaction: check ``quantities``
+    ({product_id: units}) against stock not held by other carts, then
+    release this cart's reservations, which the sale's movements replace.
+    Returns {product_id: available} for the lines that cannot be sold;
+    nothing is released in that case.
+    """
+    product_ids = sorted(quantities)
+    on_hand = StockService.lock(product_ids)
+    held = reserved_quantities(product_ids, exclude_cart=cart_token)
+    shortages = {
+        pid: max(0, on_hand[pid] - held.get(pid, 0))
+        for pid in product_ids if quantities[pid] > on_hand[pid] - held.get(pid, 0)
+    }
+    if not shortages and cart_token:
+        release_cart(cart_token)
+    return shortages
+
+
+def expire_reservations(batch_size=1000):
+    """Delete expired reservations in batches. Returns the number deleted."""
+    expired = StockReservation.objects.filter(expires_at__lte=timezone.now())
+    total = 0
+    while True:
+        ids = list(expired.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return total
+        deleted, _ = StockReservation.objects.filter(id__in=ids).delete()
+        total += deleted
+
+
+def schedule_sweep():
+    """Queue expire_reservations for run_worker at most once per SWEEP_INTERVAL_SECONDS"""
+    from django.core.cache import cache
+    from forecasting.jobs import enqueue
+
+    # cache.add only succeeds when the key is missing, i.e. once per interval
+    if cache.add(SWEEP_CACHE_KEY, True, SWEEP_INTERVAL_SECONDS):
+        enqueue('expire_reservations')
@@ -0,0 +1,150 @@
+"""
+The one place stock quantities change.
+
+``StockService.apply`` takes a batch of unsaved StockMovement rows, locks
+the affected Stock rows (in product order, so concurrent batches cannot
+deadlock), clamps removals at the quantity on hand, applies every
+product's net change with a single ``UPDATE ... SET quantity = quantity +
+CASE ...`` and appends the movements to the ledger, all in one
+transaction. Concurrent terminals therefore add to each other's changes
+instead of overwriting them.
+
+Because the ledger is append-only, history and past quantities are
+indexed range queries over StockMovement (product, created_at).
+"""
+import logging
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from inventory.models import Stock, StockMovement
+
+logger = logging.getLogger(__name__)
+
+
+def _reproject_on_commit(product_ids):
+    """Refresh stock projections once the movements commit (F() updates skip post_save)"""
+    from inventory.projection import reproject
+
+    def run():
+        try:
+            reproject(product_ids)
+        except Exception as e:
+            logger.warning(f"Could not project stock for products {product_ids}: {str(e)}")
+
+    transaction.on_commit(run)
+
+
+class StockService:
+    """Write stock movements and apply them to Stock.quantity atomically"""
+
+    @staticmethod
+    def lock(product_ids):
+        """Lock the Stock rows of ``product_ids``, creating missing ones. Returns {product_id: quantity}."""
+        if connection.vendor == 'sqlite':
+            # No row locks on SQLite: write first so this transaction holds
+            # the write lock instead of failing to upgrade a read lock later
+            Stock.objects.filter(product_id__in=product_ids).update(last_updated=timezone.now())
+        locked = Stock.objects.select_for_update().filter(product_id__in=product_ids).order_by('product_id')
+        on_hand = dict(locked.values_list('product_id', 'quantity'))
+        missing = [pid for pid in product_ids if pid not in on_hand]
+        if missing:
+            Stock.objects.bulk_create([Stock(product_id=pid) for pid in missing], ignore_conflicts=True)
+            on_hand.update(locked.filter(product_id__in=missing).values_list('product_id', 'quantity'))
+        return on_hand
+
+    @staticmethod
+    @transaction.atomic
+    def apply(movements):
+        """
+        Apply a batch of unsaved StockMovement rows in order. Removals are
+        clamped at the quantity on hand, so a movement's ``quantity`` is
+        what was actually applied. Movements that end up with no change
+        are not stored. Returns the saved movements.
+        """
+        movements = list(movements)
+        if not movements:
+            return []
+        product_ids = sorted({movement.product_id for movement in movements})
+        on_hand = StockService.lock(product_ids)
+        before = dict(on_hand)
+
+        for movement in movements:
+            balance = on_hand[movement.product_id]
+            if movement.quantity < -balance:
+                logger.warning(
+                    f"{movement.get_kind_display()} of {-movement.quantity} units for product "
+                    f"{movement.product_id} exceeds the {balance} on hand; clamped"
+                )
+                movement.quantity = -balance
+            on_hand[movement.product_id] = movement.balance_after = balance + movement.quantity
+
+        # Products sharing a delta share a WHEN, which keeps the CASE short
+        # for big batches like a delivery of the same pack size
+        by_delta = defaultdict(list)
+        for pid in product_ids:
+            if on_hand[pid] != before[pid]:
+                by_delta[on_hand[pid] - before[pid]].append(pid)
+        if by_delta:
+            Stock.objects.filter(product_id__in=[pid for pids in by_delta.values() for pid in pids]).update(
+                quantity=F('quantity') + Case(
+                    *[When(product_id__in=pids, then=Value(delta)) for delta, pids in by_delta.items()],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                ),
+                last_updated=timezone.now(),
+            )
+        saved = StockMovement.objects.bulk_create([movement for movement in movements if movement.quantity])
+        _reproject_on_commit(product_ids)
+        return saved
+
+    @staticmethod
+    def record(product_id, kind, quantity, reference_id=None, note='', user=None):
+        """Apply a single movement. Returns the saved StockMovement, or None if nothing changed."""
+        saved = StockService.apply([StockMovement(
+            product_id=product_id, kind=kind, quantity=quantity,
+            reference_id=reference_id, note=note, created_by=user,
+        )])
+        return saved[0] if saved else None
+
+    @staticmethod
+    @transaction.atomic
+    def set_quantities(counts, kind='adjustment', note='', user=None):
+        """
+        Set on-hand quantities to counted values, e.g. after a stock take,
+        by recording the difference as movements. ``counts`` maps product
+        id to the counted quantity.
+        """
+        on_hand = StockService.lock(sorted(counts))
+        return StockService.apply([
+            StockMovement(
+                product_id=pid, kind=kind, quantity=counted - on_hand[pid], note=note, created_by=user,
+            )
+            for pid, counted in counts.items() if counted != on_hand[pid]
+        ])
+
+    @staticmethod
+    def history(product_id, start=None, end=None):
+        """Movements of a product between two datetimes, oldest first"""
+        movements = StockMovement.objects.filter(product_id=product_id)
+        if start:
+            movements = movements.filter(created_at__gte=start)
+        if end:
+            movements = movements.filter(created_at__lt=end)
+        return movements.order_by('created_at', 'id')
+
+    @staticmethod
+    def quantities_as_of(when, product_ids=None):
+        """Quantity on hand per product id at ``when``: today's quantity less the movements since"""
+        stocks = Stock.objects.all()
+        later = StockMovement.objects.filter(created_at__gt=when)
+        if product_ids is not None:
+            stocks = stocks.filter(product_id__in=product_ids)
+            later = later.filter(product_id__in=product_ids)
+        quantities = dict(stocks.values_list('product_id', 'quantity'))
+        for pid, moved in later.values('product_id').annotate(moved=Sum('quantity')).values_list('product_id', 'moved'):
+            if pid in quantities:
+                quantities[pid] -= moved
+        return quantities
@@ -1,3 +1,212 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import Sum
 from django.test import TestCase
+from django.urls import reverse
+
+from inventory import receiving
+from inventory.models import Stock, StockMovement, Supplier
+from inventory.services import StockService
+from sales.models import Product
+
+
+def make_product(name, quantity=0):
+    product = Product.objects.create(name=name, price=Decimal('10.00'))
+    Stock.objects.filter(product=product).update(quantity=quantity)
+    if quantity:
+        # Opening balance, so the ledger adds up to the stock on hand
+        StockMovement.objects.create(product=product, kind='adjustment', quantity=quantity, balance_after=quantity)
+    return product
+
+
+class StockServiceTests(TestCase):
+    def setUp(self):
+        self.rice = make_product('Rice', quantity=10)
+        self.soap = make_product('Soap', quantity=3)
+
+    def on_hand(self, product):
+        return Stock.objects.get(product=product).quantity
+
+    def assertLedgerBalanced(self, *products):
+        for product in products:
+            ledger = StockMovement.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'] or 0
+            self.assertEqual(ledger, self.on_hand(product), product.name)
+
+    def test_apply_adds_and_removes_in_order(self):
+        saved = StockService.apply([
+            StockMovement(product=self.rice, kind='receipt', quantity=5),
+            StockMovement(product=self.soap, kind='sale', quantity=-2),
+            StockMovement(product=self.rice, kind='sale', quantity=-12),
+        ])
+
+        self.assertEqual([m.balance_after for m in saved], [15, 1, 3])
+        self.assertEqual(self.on_hand(self.rice), 3)
+        self.assertEqual(self.on_hand(self.soap), 1)
+        self.assertLedgerBalanced(self.rice, self.soap)
+
+    def test_apply_clamps_removals_at_quantity_on_hand(self):
+        with self.assertLogs('inventory.services', 'WARNING'):
+            saved = StockService.apply([
+                StockMovement(product=self.soap, kind='sale', quantity=-5),
+                StockMovement(product=self.soap, kind='sale', quantity=-1),
+            ])
+
+        # The clamped sale removes what was there; the next one changes nothing and is not stored
+        self.assertEqual([(m.quantity, m.balance_after) for m in saved], [(-3, 0)])
+        self.assertEqual(self.on_hand(self.soap), 0)
+        self.assertLedgerBalanced(self.soap)
+
+    def test_apply_creates_missing_stock_row(self):
+        oil = Product.objects.create(name='Oil', price=Decimal('80.00'))
+        Stock.objects.filter(product=oil).delete()
+
+        StockService.record(oil.pk, 'receipt', 4)
+
+        self.assertEqual(self.on_hand(oil), 4)
+        self.assertLedgerBalanced(oil)
+
+    def test_apply_adds_to_quantity_changed_elsewhere(self):
+        # Another terminal sold one after this batch was built
+        movement = StockMovement(product=self.rice, kind='receipt', quantity=5)
+        StockService.record(self.rice.pk, 'sale', -1)
+
+        StockService.apply([movement])
+
+        self.assertEqual(self.on_hand(self.rice), 14)
+        self.assertEqual(movement.balance_after, 14)
+        self.assertLedgerBalanced(self.rice)
+
+    def test_set_quantities_records_the_differences(self):
+        saved = StockService.set_quantities({self.rice.pk: 7, self.soap.pk: 3}, note='Stock take')
+
+        self.assertEqual([(m.product_id, m.quantity) for m in saved], [(self.rice.pk, -3)])
+        self.assertEqual(self.on_hand(self.rice), 7)
+        self.assertEqual(self.on_hand(self.soap), 3)
+        self.assertLedgerBalanced(self.rice, self.soap)
+
+    def test_quantities_as_of_replays_the_ledger(self):
+        before = StockMovement.objects.latest('created_at').created_at
+        StockService.record(self.rice.pk, 'sale', -4)
+
+        self.assertEqual(StockService.quantities_as_of(before, [self.rice.pk]), {self.rice.pk: 10})
+
+
+class ReceivingTests(TestCase):
+    def setUp(self):
+        self.rice = Product.objects.create(name='Rice', label='RICE-5', price=Decimal('250.00'))
+        self.soap = Product.objects.create(name='Soap', label='SOAP-1', price=Decimal('40.00'))
+        self.supplier = Supplier.objects.create(name='Acme')
+
+    def on_hand(self, product):
+        return Stock.objects.get(product=product).quantity
+
+    def test_parse_csv_with_column_aliases(self):
+        rows = receiving.parse_delivery('note.csv', b'SKU,Qty,Supplier,Cost\nRICE-5,4,Acme,120.50\nSoap,2,,\n')
+
+        self.assertEqual(rows, [
+            {'line': 2, 'sku': 'RICE-5', 'quantity': '4', 'supplier': 'Acme', 'unit_cost': '120.50'},
+            {'line': 3, 'sku': 'Soap', 'quantity': '2', 'supplier': '', 'unit_cost': ''},
+        ])
+
+    def test_parse_json_lines_object(self):
+        rows = receiving.parse_delivery('note.json', b'{"lines": [{"product": "Rice", "units": 3}]}')
+
+        self.assertEqual(rows, [{'line': 1, 'sku': 'Rice', 'quantity': '3', 'supplier': '', 'unit_cost': ''}])
+
+    def test_parse_rejects_notes_without_required_columns(self):
+        with self.assertRaises(ValueError):
+            receiving.parse_delivery('note.csv', b'name,price\nRice,10\n')
+
+    def test_validate_reports_every_problem_by_line(self):
+        Product.objects.create(name='Oil', label='DUP', price=Decimal('1.00'))
+        Product.objects.create(name='Salt', label='DUP', price=Decimal('1.00'))
+        rows = receiving.parse_delivery('note.csv', (
+            b'sku,quantity,supplier,unit_cost\n'
+            b'RICE-5,4,Acme,120\n'
+            b'NOPE,1,,\n'
+            b'SOAP-1,-2,,\n'
+            b'DUP,1,,\n'
+            b'Soap,x,Nobody,abc\n'
+        ))
+
+        lines, errors = receiving.validate(rows)
+
+        self.assertEqual([(line['line'], line['product_id'], line['supplier_id']) for line in lines], [(2, self.rice.pk, self.supplier.pk)])
+        self.assertEqual([error['line'] for error in errors], [3, 4, 5, 6])
+        self.assertIn('unknown SKU', errors[0]['message'])
+        self.assertIn('must be positive', errors[1]['message'])
+        self.assertIn('matches 2 products', errors[2]['message'])
+        for problem in ('invalid quantity', 'invalid cost', 'unknown supplier'):
+            self.assertIn(problem, errors[3]['message'])
+
+    def test_validate_adjustments_allow_negative_quantities(self):
+        lines, errors = receiving.validate([{'line': 2, 'sku': 'Soap', 'quantity': '-2', 'supplier': '', 'unit_cost': ''}], 'adjustment')
+
+        self.assertEqual(errors, [])
+        self.assertEqual(lines[0]['quantity'], -2)
+
+    def test_receive_books_every_chunk_and_sets_suppliers(self):
+        lines, _ = receiving.validate([
+            {'line': 2, 'sku': 'RICE-5', 'quantity': '4', 'supplier': 'Acme', 'unit_cost': '120'},
+            {'line': 3, 'sku': 'SOAP-1', 'quantity': '2', 'supplier': '', 'unit_cost': ''},
+            {'line': 4, 'sku': 'RICE-5', 'quantity': '1', 'supplier': '', 'unit_cost': ''},
+        ])
+
+        with mock.patch.object(receiving, 'CHUNK_PRODUCTS', 1):
+            saved = receiving.receive(lines, note='Delivery 1')
+
+        self.assertEqual(len(saved), 3)
+        self.assertEqual(self.on_hand(self.rice), 5)
+        self.assertEqual(self.on_hand(self.soap), 2)
+        self.assertEqual(Stock.objects.get(product=self.rice).supplier, self.supplier)
+        self.assertEqual(StockMovement.objects.get(product=self.rice, quantity=4).unit_cost, Decimal('120.00'))
+
+    def test_receive_is_all_or_nothing(self):
+        lines, _ = receiving.validate([
+            {'line': 2, 'sku': 'RICE-5', 'quantity': '4', 'supplier': '', 'unit_cost': ''},
+            {'line': 3, 'sku': 'SOAP-1', 'quantity': '2', 'supplier': '', 'unit_cost': ''},
+        ])
+        apply = StockService.apply
+
+        def fail_second_chunk(movements):
+            if StockMovement.objects.exists():
+                raise RuntimeError('database went away')
+            return apply(movements)
+
+        with mock.patch.object(receiving, 'CHUNK_PRODUCTS', 1), \
+                mock.patch.object(StockService, 'apply', side_effect=fail_second_chunk):
+            with self.assertRaises(RuntimeError):
+                receiving.receive(lines)
+
+        self.assertEqual(self.on_hand(self.rice), 0)
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_apply_with_invalid_lines_books_nothing(self):
+        user = get_user_model().objects.create_user(username='clerk', password='secret-pass-1')
+        self.client.force_login(user)
+        upload = SimpleUploadedFile('note.csv', b'sku,quantity\nRICE-5,4\nNOPE,1\n', content_type='text/csv')
+
+        response = self.client.post(reverse('stock_receive'), {
+            'delivery_file': upload, 'kind': 'receipt', 'action': 'apply',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['error_count'], 1)
+        self.assertEqual(self.on_hand(self.rice), 0)
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_apply_valid_note_books_it(self):
+        user = get_user_model().objects.create_user(username='clerk', password='secret-pass-1')
+        self.client.force_login(user)
+        upload = SimpleUploadedFile('note.csv', b'sku,quantity\nRICE-5,4\nSOAP-1,1\n', content_type='text/csv')
+
+        response = self.client.post(reverse('stock_receive'), {
+            'delivery_file': upload, 'kind': 'receipt', 'action': 'apply',
+        })
 
-# Create your tests here.
+        self.assertRedirects(response, reverse('stock_list'), fetch_redirect_response=False)
+        self.assertEqual(self.on_hand(self.rice), 4)
+        self.assertEqual(self.on_hand(self.soap), 1)
@@ -10,6 +10,7 @@ urlpatterns = [
     path('stocks/', views.StockListView.as_view(), name='stock_list'),
     path('stocks/print-report/', views.InventoryPrintReportView.as_view(), name='inventory_print_report'),
     path('stocks/create/', views.StockCreateView.as_view(), name='stock_create'),
+    path('stocks/receive/', views.StockReceiveView.as_view(), name='stock_receive'),
     path('stocks/<int:pk>/', views.StockDetailView.as_view(), name='stock_detail'),
     path('stocks/<int:pk>/update/', views.StockUpdateView.as_view(), name='stock_update'),
     path('stocks/<int:pk>/delete/', views.StockDeleteView.as_view(), name='stock_delete'),
@@ -1,13 +1,15 @@
 from django.shortcuts import render, redirect
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView, FormView
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
 from django.db.models import Q, Sum, F, Value
 from django.db.models.functions import Coalesce
 from datetime import datetime
-from .models import Supplier, Stock
-from .forms import StockForm, SupplierForm
+from .models import Supplier, Stock, StockMovement
+from .forms import DeliveryForm, StockForm, SupplierForm
+from .services import StockService
 from .mixins import InventoryListMixin, InventoryDetailMixin, InventoryCreateMixin, InventoryUpdateMixin, InventoryDeleteMixin
 from audit.utils import log_action
 
@@ -42,10 +44,20 @@ class StockListView(LoginRequiredMixin, InventoryListMixin):
     template_name = 'inventory/stock_list.html'
     success_url = reverse_lazy('stock_list')
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('product__stock_projection', 'supplier')
+
 class StockDetailView(LoginRequiredMixin, InventoryDetailMixin):
     model = Stock
     template_name = 'inventory/stock_detail.html'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['movements'] = StockMovement.objects.filter(
+            product_id=self.object.product_id
+        ).select_related('created_by')[:10]
+        return context
+
 class StockCreateView(LoginRequiredMixin, CreateView):
     """
     Stock Create View - Add stock to products
@@ -65,15 +77,20 @@ class StockCreateView(LoginRequiredMixin, CreateView):
         
         # Check if stock already exists for this product
         try:
-            existing_stock = Stock.objects.get(product=product)
-            old_quantity = existing_stock.quantity
-            # Update existing stock - ADD the new quantity to existing
-            existing_stock.quantity += quantity
-            if supplier:
-                existing_stock.supplier = supplier
-            if reorder_level:
-                existing_stock.reorder_level = reorder_level
-            existing_stock.save()
+            with transaction.atomic():
+                existing_stock = Stock.objects.select_for_update().get(product=product)
+                old_quantity = existing_stock.quantity
+                # Update existing stock - ADD the new quantity to existing
+                StockService.record(
+                    product.id, 'receipt', quantity,
+                    note=f'Restock{f" from {supplier}" if supplier else ""}', user=self.request.user,
+                )
+                existing_stock.refresh_from_db(fields=['quantity'])
+                if supplier:
+                    existing_stock.supplier = supplier
+                if reorder_level:
+                    existing_stock.reorder_level = reorder_level
+                existing_stock.save(update_fields=['supplier', 'reorder_level', 'last_updated'])
             
             # Audit log
             log_action(
@@ -90,8 +107,12 @@ class StockCreateView(LoginRequiredMixin, CreateView):
             messages.success(self.request, f"Added {quantity} units to {product.name}. New total: {existing_stock.quantity} units.")
             return redirect(self.success_url)
         except Stock.DoesNotExist:
-            # Create new stock record
-            response = super().form_valid(form)
+            # Create new stock record; its units are booked as a receipt
+            with transaction.atomic():
+                form.instance.quantity = 0
+                response = super().form_valid(form)
+                StockService.record(product.id, 'receipt', quantity, note='Initial stock', user=self.request.user)
+                self.object.refresh_from_db(fields=['quantity'])
             
             # Audit log
             log_action(
@@ -109,12 +130,83 @@ class StockCreateView(LoginRequiredMixin, CreateView):
             messages.success(self.request, f"Stock record created for {product.name} with {quantity} units.")
             return response
 
+class StockReceiveView(LoginRequiredMixin, FormView):
+    """
+    Bulk receiving - book a whole CSV/JSON delivery note at once.
+    "Preview" validates the note and shows what it will do; "Apply"
+    books every line in one transaction, or nothing if any line is invalid.
+    """
+    template_name = 'inventory/stock_receive.html'
+    form_class = DeliveryForm
+    success_url = reverse_lazy('stock_list')
+    
+    def form_valid(self, form):
+        import json
+        from . import receiving
+        
+        rows = form.cleaned_data['rows']
+        kind = form.cleaned_data['kind']
+        filename = form.cleaned_data.get('filename') or 'delivery note'
+        lines, errors = receiving.validate(rows, kind)
+        summary = receiving.summarize(lines)
+        
+        if errors or self.request.POST.get('action') != 'apply':
+            if errors and self.request.POST.get('action') == 'apply':
+                messages.error(self.request, f"Nothing was booked: {len(errors)} line(s) need fixing first.")
+            return self.render_to_response(self.get_context_data(
+                form=DeliveryForm(initial={
+                    'kind': kind,
+                    'note': form.cleaned_data['note'],
+                    'payload': json.dumps(rows),
+                    'filename': filename,
+                }),
+                filename=filename,
+                kind_label=dict(DeliveryForm.KIND_CHOICES)[kind],
+                summary=summary,
+                errors=errors[:200],
+                error_count=len(errors),
+                preview=receiving.preview(lines),
+            ))
+        
+        note = form.cleaned_data['note'] or f'Delivery {filename}'
+        saved = receiving.receive(lines, kind, note=note[:255], user=self.request.user)
+        units = sum(movement.quantity for movement in saved)
+        
+        # One audit entry for the whole delivery
+        log_action(
+            self.request, 'UPDATE',
+            object_name=f'Stock {kind}: {filename}'[:255],
+            description=f'Booked {filename} as {kind} — {summary["lines"]} lines, {summary["products"]} products, {units:+d} units',
+            changes={
+                'Lines': {'old': '—', 'new': str(summary['lines'])},
+                'Products': {'old': '—', 'new': str(summary['products'])},
+                'Units': {'old': '—', 'new': f'{units:+d}'},
+                'Total Cost': {'old': '—', 'new': f'₱{summary["cost"]:,.2f}'},
+            }
+        )
+        
+        messages.success(
+            self.request,
+            f"Booked {summary['lines']} lines from {filename}: {units:+d} units across {summary['products']} products."
+        )
+        return redirect(self.success_url)
+
 class StockUpdateView(LoginRequiredMixin, InventoryUpdateMixin):
     model = Stock
     template_name = 'inventory/stock_form.html'
     form_class = StockForm
     success_url = reverse_lazy('stock_list')
 
+    def form_valid(self, form):
+        # An edited quantity is a stock count: book the difference as an
+        # adjustment, holding the row lock until the form is saved
+        with transaction.atomic():
+            StockService.set_quantities(
+                {self.object.product_id: form.cleaned_data['quantity']},
+                note='Stock edited', user=self.request.user,
+            )
+            return super().form_valid(form)
+
 class StockDeleteView(LoginRequiredMixin, InventoryDeleteMixin):
     model = Stock
     template_name = 'inventory/stock_confirm_delete.html'
@@ -72,7 +72,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'accounts.middleware.NoCacheMiddleware',  # Prevent caching of authenticated pages
-    'forecasting.middleware.AutoForecastMiddleware',  # Auto-generate forecasts every 30 days
+    'forecasting.middleware.AutoForecastMiddleware',  # Queue forecast generation every 30 days (run_worker executes it)
 ]
 
 ROOT_URLCONF = 'multibliz_pos.urls'
@@ -191,7 +191,9 @@ CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:3000,
 CORS_ALLOW_CREDENTIALS = True
 
 # Email settings (for password reset and notifications)
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', str(BASE_DIR / 'logs' / 'emails'))  # for the filebased backend
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', '10'))  # seconds, per SMTP connection
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True').lower() == 'true'
@@ -378,6 +380,36 @@ TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER', '+1234567890')
 # 2. Add phone numbers to verified caller IDs (for trial accounts)
 # 3. Consider upgrading to paid account for production use
 
+# ============================================
+# Notification Outbox
+# ============================================
+# OTP emails and SMS are queued in the request's transaction and delivered
+# by `python manage.py send_outbox` (see accounts/outbox.py).
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '20'))  # messages per connection
+OUTBOX_CONCURRENCY = {  # concurrent connections per channel
+    'email': int(os.getenv('OUTBOX_EMAIL_CONCURRENCY', '2')),
+    'sms': int(os.getenv('OUTBOX_SMS_CONCURRENCY', '2')),
+}
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', '7'))
+
+# ============================================
+# POS Stock Reservations
+# ============================================
+# Units in a terminal's cart are held this long after its last change or
+# renewal (see inventory/reservations.py)
+STOCK_RESERVATION_TTL_SECONDS = int(os.getenv('STOCK_RESERVATION_TTL_SECONDS', '300'))
+
+# ============================================
+# Audit Log Buffer
+# ============================================
+# Audit entries are queued after commit and written in batches by a
+# background thread (see audit/buffer.py). Disable to write them inline.
+AUDIT_BUFFER_ENABLED = os.getenv('AUDIT_BUFFER_ENABLED', 'True').lower() in ('true', '1', 'yes')
+AUDIT_BUFFER_MAX_SIZE = int(os.getenv('AUDIT_BUFFER_MAX_SIZE', '1000'))  # queued entries before writing inline
+AUDIT_BUFFER_BATCH_SIZE = int(os.getenv('AUDIT_BUFFER_BATCH_SIZE', '100'))  # flush early at this many
+AUDIT_BUFFER_FLUSH_MS = int(os.getenv('AUDIT_BUFFER_FLUSH_MS', '500'))
+
 # ============================================
 # Data Paths Configuration
 # ============================================
@@ -386,3 +418,8 @@ DATA_DIR = BASE_DIR / 'data'
 MODELS_DIR = DATA_DIR / 'models'
 DATASETS_DIR = DATA_DIR / 'datasets'
 DATABASE_BACKUP_DIR = DATA_DIR / 'database'
+
+# Audit entries older than this are moved to compressed monthly segments
+# by `python manage.py archive_audit_logs` (see audit/archive.py)
+AUDIT_ARCHIVE_DIR = os.getenv('AUDIT_ARCHIVE_DIR', str(DATA_DIR / 'audit_archive'))
+AUDIT_ARCHIVE_AFTER_DAYS = int(os.getenv('AUDIT_ARCHIVE_AFTER_DAYS', '180'))
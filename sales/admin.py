@@ -50,7 +50,9 @@ class ReturnAdmin(admin.ModelAdmin):
     list_filter = ['status', 'reason', 'return_date']
     search_fields = ['sale__id', 'sale__product__name', 'sale__customer_name', 'processed_by']
     ordering = ['-return_date']
-    readonly_fields = ['return_date']
+    # Status changes go through sales.returns so stock is restored exactly once
+    readonly_fields = ['return_date', 'status', 'processed_by', 'processed_date']
+    actions = ['approve_selected']
     
     fieldsets = (
         ('Return Information', {
@@ -63,3 +65,25 @@ class ReturnAdmin(admin.ModelAdmin):
             'fields': ('status', 'processed_by', 'processed_date', 'return_date')
         }),
     )
+    
+    def save_model(self, request, obj, form, change):
+        from .returns import recompute_sales
+        super().save_model(request, obj, form, change)
+        recompute_sales(Sale.objects.filter(pk__in=[obj.sale_id, form.initial.get('sale')]))
+    
+    def delete_model(self, request, obj):
+        from .returns import recompute_sales
+        super().delete_model(request, obj)
+        recompute_sales(Sale.objects.filter(pk=obj.sale_id))
+    
+    def delete_queryset(self, request, queryset):
+        from .returns import recompute_sales
+        sale_ids = list(queryset.values_list('sale_id', flat=True))
+        super().delete_queryset(request, queryset)
+        recompute_sales(Sale.objects.filter(pk__in=sale_ids))
+    
+    @admin.action(description='Approve selected pending returns')
+    def approve_selected(self, request, queryset):
+        from .returns import approve_returns
+        approved = approve_returns(list(queryset.values_list('id', flat=True)), request.user)
+        self.message_user(request, f"Approved {len(approved)} return(s).")
@@ -0,0 +1,47 @@
+"""
+Management command to rebuild the return columns stored on sales.
+Run: python manage.py recompute_return_totals
+
+returned_quantity, refunded_amount and return_status are kept current
+whenever a return changes state (see sales.returns). This recomputes them
+from the returns in batches of sales and corrects the ones that drifted,
+e.g. after returns were edited directly in the database.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Recompute returned quantity, refunded amount and return status of sales from their returns'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Sales checked per batch (default: 5000)',
+        )
+
+    def handle(self, *args, **options):
+        from django.db import transaction
+        from sales.models import Sale
+        from sales.returns import recompute_sales
+
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        checked = corrected = 0
+        last_id = 0
+        while True:
+            ids = list(
+                Sale.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                corrected += recompute_sales(Sale.objects.filter(pk__gte=ids[0], pk__lte=ids[-1]))
+            checked += len(ids)
+            last_id = ids[-1]
+
+        style = self.style.WARNING if corrected else self.style.SUCCESS
+        self.stdout.write(style(f'Checked {checked} sales; corrected {corrected}.'))
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:58
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Case, DecimalField, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+
+def backfill_return_totals(apps, schema_editor):
+    """Fill the new columns for sales that already have returns"""
+    Sale = apps.get_model('sales', 'Sale')
+    Return = apps.get_model('sales', 'Return')
+
+    counted = Return.objects.filter(sale_id=OuterRef('pk'), status__in=['approved', 'completed']).values('sale_id')
+    rank = Case(
+        *[When(status=status, then=Value(i)) for i, status in enumerate(['completed', 'approved', 'pending', 'rejected'])],
+        output_field=IntegerField(),
+    )
+    top = Return.objects.filter(sale_id=OuterRef('pk')).annotate(rank=rank).order_by('rank').values('status')[:1]
+    Sale.objects.filter(pk__in=Return.objects.values('sale_id')).update(
+        returned_quantity=Coalesce(Subquery(counted.annotate(total=Sum('quantity_returned')).values('total')), Value(0)),
+        refunded_amount=Coalesce(
+            Subquery(counted.annotate(total=Sum('refund_amount')).values('total')), Value(Decimal('0')),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+        return_status=Coalesce(Subquery(top), Value('none')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0011_alter_product_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='refunded_amount',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Refunds of approved/completed returns', max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='return_status',
+            field=models.CharField(choices=[('none', 'No return'), ('rejected', 'Rejected'), ('pending', 'Pending'), ('approved', 'Approved'), ('completed', 'Completed')], default='none', help_text="Status of the sale's most advanced return", max_length=20),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='returned_quantity',
+            field=models.PositiveIntegerField(default=0, help_text='Units of approved/completed returns'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['return_status', '-sale_date'], name='sales_sale_return__751211_idx'),
+        ),
+        migrations.RunPython(backfill_return_totals, migrations.RunPython.noop),
+    ]
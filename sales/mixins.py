@@ -100,7 +100,7 @@ class ProductCreateMixin(ProductMixin, CreateView):
                     try:
                         stock = Stock.objects.select_for_update().get(product=self.object)
                         stock.supplier = supplier
-                        stock.save()
+                        stock.save(update_fields=['supplier', 'last_updated'])
                     except Stock.DoesNotExist:
                         # Stock should be auto-created by signal, but just in case
                         Stock.objects.create(product=self.object, supplier=supplier)
@@ -152,7 +152,8 @@ class ProductUpdateMixin(ProductMixin, UpdateView):
         try:
             stock = Stock.objects.get(product=self.object)
             stock.supplier = supplier
-            stock.save()
+            # Only the supplier: quantity is changed by inventory.services alone
+            stock.save(update_fields=['supplier', 'last_updated'])
         except Stock.DoesNotExist:
             Stock.objects.create(product=self.object, supplier=supplier)
         
@@ -27,6 +27,14 @@ class Sale(models.Model):
         ('check', 'Check'),
     ]
     
+    RETURN_STATUS_CHOICES = [
+        ('none', 'No return'),
+        ('rejected', 'Rejected'),
+        ('pending', 'Pending'),
+        ('approved', 'Approved'),
+        ('completed', 'Completed'),
+    ]
+    
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -39,36 +47,41 @@ class Sale(models.Model):
     amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     change_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
+    # Kept up to date by sales.returns whenever a return changes state
+    returned_quantity = models.PositiveIntegerField(default=0, help_text="Units of approved/completed returns")
+    refunded_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, help_text="Refunds of approved/completed returns")
+    return_status = models.CharField(
+        max_length=20, choices=RETURN_STATUS_CHOICES, default='none',
+        help_text="Status of the sale's most advanced return",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['return_status', '-sale_date']),
+        ]
+
     def __str__(self):
         return f"Sale #{self.id} - {self.product.name} ({self.quantity} units) - ₱{self.total_price}"
     
     @property
     def has_approved_return(self):
         """Check if this sale has any approved or completed returns"""
-        return self.returns.filter(status__in=['approved', 'completed']).exists()
+        return self.return_status in ('approved', 'completed')
     
     @property
     def total_returned_quantity(self):
-        """Get total quantity returned for this sale (approved/completed only)"""
-        from django.db.models import Sum
-        result = self.returns.filter(status__in=['approved', 'completed']).aggregate(
-            total=Sum('quantity_returned')
-        )['total']
-        return result or 0
+        """Total quantity returned for this sale (approved/completed only)"""
+        return self.returned_quantity
     
     @property
     def total_refunded_amount(self):
-        """Get total refund amount for this sale (approved/completed only)"""
-        from django.db.models import Sum
-        result = self.returns.filter(status__in=['approved', 'completed']).aggregate(
-            total=Sum('refund_amount')
-        )['total']
-        return result or 0
+        """Total refund amount for this sale (approved/completed only)"""
+        return self.refunded_amount
     
     @property
     def net_total(self):
         """Get net total after returns"""
-        return self.total_price - self.total_refunded_amount
+        return self.total_price - self.refunded_amount
 
 class Return(models.Model):
     STATUS_CHOICES = [
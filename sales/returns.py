@@ -0,0 +1,186 @@
+"""
+Return processing.
+
+A return moves through explicit transitions (TRANSITIONS). Returned goods
+are back on the shelf while a return is approved or completed, so a
+transition's stock delta is ``quantity_returned`` times the change in
+that: +qty from pending to approved or completed, -qty from approved to
+rejected, nothing from approved to completed.
+
+Each transition is one conditional ``UPDATE ... WHERE status = <old>``.
+Only the rows that update get a stock movement, applied through
+StockService (one ``F()`` update for the batch) in the same transaction,
+so saving, retrying or double-submitting a return can never restock it
+twice.
+
+The same transaction keeps the sale's return columns (returned_quantity,
+refunded_amount, return_status) current, so lists and reports filter on
+them instead of aggregating returns. ``recompute_sales`` rebuilds them
+from the returns.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from inventory.models import StockMovement
+from inventory.services import StockService
+from sales.models import Return, Sale
+
+
+TRANSITIONS = {
+    'pending': ('approved', 'rejected', 'completed'),
+    'approved': ('completed', 'rejected'),
+    'rejected': (),
+    'completed': (),
+}
+
+# Statuses in which the returned units count as back in stock (and refunded)
+RESTOCKED = ('approved', 'completed')
+
+# A sale's return_status is its most advanced return's status, first here
+STATUS_PRIORITY = ('completed', 'approved', 'pending', 'rejected')
+
+
+def allowed(old_status, new_status):
+    return new_status in TRANSITIONS.get(old_status, ())
+
+
+def stock_delta(old_status, new_status, quantity):
+    return quantity * ((new_status in RESTOCKED) - (old_status in RESTOCKED))
+
+
+@transaction.atomic
+def transition_many(return_ids, old_status, new_status, user=None):
+    """
+    Move the returns in ``return_ids`` that are still ``old_status`` to
+    ``new_status`` and apply their stock deltas. Returns the ids moved;
+    returns already moved elsewhere are left alone.
+    """
+    if not allowed(old_status, new_status):
+        raise ValueError(f"A {old_status} return cannot be {new_status}")
+
+    now = timezone.now()
+    moved = Return.objects.filter(id__in=return_ids, status=old_status).update(
+        status=new_status,
+        processed_by=user.username if user else '',
+        processed_date=now,
+    )
+    if not moved:
+        return []
+
+    # The updated rows stay locked until commit, so this reads back exactly
+    # the ones this call moved
+    rows = sorted(
+        Return.objects.filter(id__in=return_ids, status=new_status, processed_date=now)
+        .values_list('id', 'sale_id', 'sale__product_id', 'quantity_returned', 'refund_amount')
+    )
+    label = dict(Return.STATUS_CHOICES)[new_status]
+    StockService.apply([
+        StockMovement(
+            product_id=product_id, kind='return', quantity=stock_delta(old_status, new_status, quantity),
+            reference_id=return_id, note=f'Return #{return_id} {label.lower()}', created_by=user,
+        )
+        for return_id, _, product_id, quantity, _ in rows
+        if stock_delta(old_status, new_status, quantity)
+    ])
+
+    sign = stock_delta(old_status, new_status, 1)
+    if sign:
+        totals = defaultdict(lambda: [0, Decimal('0')])
+        for _, sale_id, _, quantity, amount in rows:
+            totals[sale_id][0] += sign * quantity
+            totals[sale_id][1] += sign * amount
+        add_to_sale_totals(totals)
+    refresh_return_status({sale_id for _, sale_id, _, _, _ in rows})
+    return [return_id for return_id, _, _, _, _ in rows]
+
+
+def transition(ret, new_status, user=None):
+    """Move one return from its current status. Returns False if another request moved it first."""
+    old_status = ret.status
+    if not transition_many([ret.pk], old_status, new_status, user):
+        return False
+    ret.refresh_from_db(fields=['status', 'processed_by', 'processed_date'])
+    return True
+
+
+def approve_returns(return_ids, user=None):
+    """Approve the pending returns among ``return_ids`` in one batch. Returns the ids approved."""
+    return transition_many(return_ids, 'pending', 'approved', user)
+
+
+def add_to_sale_totals(totals):
+    """Add {sale_id: (units, amount)} to the sales' returned_quantity and refunded_amount in one UPDATE"""
+    if not totals:
+        return
+    Sale.objects.filter(pk__in=totals).update(
+        returned_quantity=F('returned_quantity') + Case(
+            *[When(pk=sale_id, then=Value(units)) for sale_id, (units, _) in totals.items()],
+            default=Value(0), output_field=IntegerField(),
+        ),
+        refunded_amount=F('refunded_amount') + Case(
+            *[When(pk=sale_id, then=Value(amount)) for sale_id, (_, amount) in totals.items()],
+            default=Value(Decimal('0')), output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+    )
+
+
+def _return_status():
+    """Expression for the return_status of the sale at OuterRef('pk')"""
+    rank = Case(
+        *[When(status=status, then=Value(i)) for i, status in enumerate(STATUS_PRIORITY)],
+        output_field=IntegerField(),
+    )
+    top = Return.objects.filter(sale_id=OuterRef('pk')).annotate(rank=rank).order_by('rank').values('status')[:1]
+    return Coalesce(Subquery(top), Value('none'))
+
+
+def refresh_return_status(sale_ids):
+    """Recompute return_status of ``sale_ids``, e.g. after a return is created or moved"""
+    if sale_ids:
+        Sale.objects.filter(pk__in=sale_ids).update(return_status=_return_status())
+
+
+def _expected_columns():
+    counted = Return.objects.filter(sale_id=OuterRef('pk'), status__in=RESTOCKED).values('sale_id')
+    return {
+        'expected_quantity': Coalesce(
+            Subquery(counted.annotate(total=Sum('quantity_returned')).values('total')), Value(0),
+        ),
+        'expected_amount': Coalesce(
+            Subquery(counted.annotate(total=Sum('refund_amount')).values('total')), Value(Decimal('0')),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+        'expected_status': _return_status(),
+    }
+
+
+def stale_sales(sales=None):
+    """Sales (default all) whose stored return columns disagree with their returns"""
+    sales = Sale.objects.all() if sales is None else sales
+    return sales.annotate(**_expected_columns()).exclude(
+        returned_quantity=F('expected_quantity'),
+        refunded_amount=F('expected_amount'),
+        return_status=F('expected_status'),
+    )
+
+
+def recompute_sales(sales=None):
+    """
+    Rebuild the return columns of ``sales`` (a Sale queryset, default all)
+    from their returns. Only rows that differ are written. Returns the
+    number of sales corrected.
+    """
+    stale = list(stale_sales(sales).values_list('pk', flat=True))
+    if stale:
+        expected = _expected_columns()
+        Sale.objects.filter(pk__in=stale).update(
+            returned_quantity=expected['expected_quantity'],
+            refunded_amount=expected['expected_amount'],
+            return_status=expected['expected_status'],
+        )
+    return len(stale)
@@ -1,3 +1,114 @@
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from inventory.models import Stock, StockMovement
+from inventory.services import StockService
+from sales import returns
+from sales.models import Product, Return, Sale
+
+
+class ReturnTransitionTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Rice', price=Decimal('10.00'))
+        StockService.record(self.product.pk, 'receipt', 10)
+        self.sale = Sale.objects.create(product=self.product, quantity=4, total_price=Decimal('40.00'))
+
+    def make_return(self, status='pending'):
+        ret = Return.objects.create(
+            sale=self.sale, quantity_returned=2, refund_amount=Decimal('20.00'), reason='defective',
+        )
+        returns.refresh_return_status([self.sale.pk])
+        if status != 'pending':
+            self.assertTrue(returns.transition(ret, status))
+        return ret
+
+    def on_hand(self):
+        return Stock.objects.get(product=self.product).quantity
+
+    def assertSaleTotals(self, quantity, amount, status):
+        self.sale.refresh_from_db()
+        self.assertEqual(
+            (self.sale.returned_quantity, self.sale.refunded_amount, self.sale.return_status),
+            (quantity, Decimal(amount), status),
+        )
+
+    def test_allowed_transitions(self):
+        # (from, to, units back on the shelf, refunded amount) after the transition
+        cases = [
+            ('pending', 'approved', 2, '20.00'),
+            ('pending', 'rejected', 0, '0.00'),
+            ('pending', 'completed', 2, '20.00'),
+            ('approved', 'completed', 2, '20.00'),
+            ('approved', 'rejected', 0, '0.00'),
+        ]
+        for old, new, restocked, refunded in cases:
+            with self.subTest(f'{old} -> {new}'):
+                Return.objects.all().delete()
+                returns.recompute_sales()
+                StockService.set_quantities({self.product.pk: 10})
+                ret = self.make_return(old)
+
+                self.assertTrue(returns.transition(ret, new))
+
+                self.assertEqual(ret.status, new)
+                self.assertEqual(self.on_hand(), 10 + restocked)
+                self.assertSaleTotals(restocked, refunded, new)
+                self.assertFalse(returns.stale_sales().exists())
+
+    def test_forbidden_transitions(self):
+        cases = [
+            ('pending', 'pending'),
+            ('approved', 'pending'),
+            ('approved', 'approved'),
+            ('rejected', 'pending'),
+            ('rejected', 'approved'),
+            ('rejected', 'completed'),
+            ('completed', 'pending'),
+            ('completed', 'approved'),
+            ('completed', 'rejected'),
+        ]
+        for old, new in cases:
+            with self.subTest(f'{old} -> {new}'):
+                Return.objects.all().delete()
+                returns.recompute_sales()
+                ret = self.make_return(old)
+                on_hand = self.on_hand()
+                movements = StockMovement.objects.count()
+
+                with self.assertRaises(ValueError):
+                    returns.transition(ret, new)
+
+                self.assertEqual(Return.objects.get(pk=ret.pk).status, old)
+                self.assertEqual(self.on_hand(), on_hand)
+                self.assertEqual(StockMovement.objects.count(), movements)
+
+    def test_restocks_exactly_once(self):
+        ret = self.make_return()
+        stale = Return.objects.get(pk=ret.pk)
+
+        self.assertEqual(returns.approve_returns([ret.pk]), [ret.pk])
+        # A retried or double-submitted approval finds nothing left to move
+        self.assertEqual(returns.approve_returns([ret.pk]), [])
+        self.assertFalse(returns.transition(stale, 'approved'))
+
+        self.assertEqual(self.on_hand(), 12)
+        self.assertEqual(StockMovement.objects.filter(kind='return', reference_id=ret.pk).count(), 1)
+        self.assertSaleTotals(2, '20.00', 'approved')
+
+    def test_sale_status_follows_most_advanced_return(self):
+        first = self.make_return('completed')
+        second = self.make_return()
+        self.assertSaleTotals(2, '20.00', 'completed')
+
+        returns.transition(second, 'rejected')
+        self.assertSaleTotals(2, '20.00', 'completed')
+        self.assertEqual(first.status, 'completed')
+
+    def test_recompute_sales_repairs_stale_columns(self):
+        self.make_return('approved')
+        Sale.objects.filter(pk=self.sale.pk).update(returned_quantity=0, refunded_amount=0, return_status='none')
+
+        self.assertEqual(returns.recompute_sales(), 1)
+        self.assertSaleTotals(2, '20.00', 'approved')
+        self.assertEqual(returns.recompute_sales(), 0)
@@ -7,6 +7,8 @@ urlpatterns = [
     path('pos/test/', views.POSTestView.as_view(), name='pos_test'),
     path('api/search-products/', views.search_products, name='search_products'),
     path('api/process-transaction/', views.process_transaction, name='process_transaction'),
+    path('api/reserve-stock/', views.reserve_stock, name='reserve_stock'),
+    path('api/release-stock/', views.release_stock, name='release_stock'),
     path('api/sale-details/<int:sale_id>/', views.get_sale_details, name='get_sale_details'),
     
     # Product Management
@@ -29,4 +31,5 @@ urlpatterns = [
     path('return/create/', views.ReturnCreateView.as_view(), name='return_create'),
     path('return/<int:pk>/', views.ReturnDetailView.as_view(), name='return_detail'),
     path('return/<int:pk>/update/', views.ReturnUpdateView.as_view(), name='return_update'),
+    path('return/approve/', views.approve_returns, name='return_approve'),
 ]
@@ -4,12 +4,14 @@ from django.urls import reverse_lazy
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.http import JsonResponse
+from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from accounts.permissions import AdminRequiredMixin, CanDeleteMixin
 from .models import Product, Sale, Return
 from .forms import ProductForm, SaleForm, ReturnForm
+from . import returns
 from .mixins import ProductListMixin, ProductDetailMixin, ProductCreateMixin, ProductUpdateMixin, ProductDeleteMixin
 from django.db.models import Q
 from django.utils import timezone
@@ -50,46 +52,19 @@ class SaleListView(LoginRequiredMixin, ListView):
     
     def get_queryset(self):
         from datetime import datetime, timedelta
-        queryset = super().get_queryset()
-        from django.db.models import Exists, OuterRef, Q
+        queryset = super().get_queryset().select_related('product')
+        from django.db.models import Q
         
-        # Add return status filtering
+        # Add return status filtering (Sale.return_status is kept current by sales.returns)
         return_status = self.request.GET.get('return_status', '').strip()
         if return_status == 'returned':
             # Show only sales with approved/completed returns
-            approved_returns = Return.objects.filter(
-                sale=OuterRef('pk'),
-                status__in=['approved', 'completed']
-            )
-            queryset = queryset.filter(Exists(approved_returns))
-        elif return_status == 'pending':
-            # Show only sales with pending returns
-            pending_returns = Return.objects.filter(
-                sale=OuterRef('pk'),
-                status='pending'
-            )
-            queryset = queryset.filter(Exists(pending_returns))
-        elif return_status == 'approved':
-            # Show only sales with approved returns
-            approved_returns = Return.objects.filter(
-                sale=OuterRef('pk'),
-                status='approved'
-            )
-            queryset = queryset.filter(Exists(approved_returns))
-        elif return_status == 'rejected':
-            # Show only sales with rejected returns
-            rejected_returns = Return.objects.filter(
-                sale=OuterRef('pk'),
-                status='rejected'
-            )
-            queryset = queryset.filter(Exists(rejected_returns))
+            queryset = queryset.filter(return_status__in=returns.RESTOCKED)
+        elif return_status in ('pending', 'approved', 'rejected'):
+            queryset = queryset.filter(return_status=return_status)
         else:
             # Default: exclude fully returned sales (approved/completed)
-            approved_returns = Return.objects.filter(
-                sale=OuterRef('pk'),
-                status__in=['approved', 'completed']
-            )
-            queryset = queryset.exclude(Exists(approved_returns))
+            queryset = queryset.exclude(return_status__in=returns.RESTOCKED)
         
         # Add search functionality
         search_query = self.request.GET.get('search', '').strip()
@@ -245,10 +220,14 @@ class POSView(LoginRequiredMixin, TemplateView):
         from inventory.models import Stock
         from django.db.models import OuterRef, Subquery
         
-        # Get products with stock quantity
+        from django.db.models.functions import Coalesce, Greatest
+        from inventory.reservations import reserved_subquery
+        
+        # Get products with stock available to sell (on hand less what
+        # other terminals' carts hold)
         stock_subquery = Stock.objects.filter(product=OuterRef('pk')).values('quantity')[:1]
         products = Product.objects.annotate(
-            stock_quantity=Subquery(stock_subquery)
+            stock_quantity=Greatest(Coalesce(Subquery(stock_subquery), 0) - reserved_subquery(), 0)
         ).order_by('name')
         context['products'] = products
         return context
@@ -273,11 +252,14 @@ def search_products(request):
     if len(query) < 1:
         return JsonResponse({'results': []})
     
+    from django.db.models.functions import Coalesce, Greatest
+    from inventory.reservations import reserved_subquery
+    
     stock_subquery = Stock.objects.filter(product=OuterRef('pk')).values('quantity')[:1]
     products = Product.objects.filter(
         name__icontains=query
     ).annotate(
-        stock_quantity=Subquery(stock_subquery)
+        stock_quantity=Greatest(Coalesce(Subquery(stock_subquery), 0) - reserved_subquery(), 0)
     ).values('id', 'name', 'price', 'stock_quantity').order_by('name')[:10]
     
     results = [
@@ -293,6 +275,64 @@ def search_products(request):
     return JsonResponse({'results': results})
 
 
+@login_required
+@require_http_methods(["POST"])
+def reserve_stock(request):
+    """
+    AJAX endpoint that holds stock for a POS cart
+    Receives the cart token and every cart line, reserves what is available
+    for a short lease and returns the reserved quantity of each line
+    """
+    import json
+    from django.conf import settings
+    from inventory.reservations import reserve_cart, schedule_sweep
+    
+    try:
+        data = json.loads(request.body.decode('utf-8') or '{}')
+        cart_token = str(data.get('cart_token') or '').strip()[:64]
+        quantities = {}
+        for item in data.get('items', []):
+            quantities[int(item['product_id'])] = max(0, int(item.get('quantity', 0)))
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return JsonResponse({'success': False, 'error': f'Invalid request: {str(e)}'}, status=400)
+    
+    if not cart_token:
+        return JsonResponse({'success': False, 'error': 'Missing cart token'}, status=400)
+    
+    existing = set(Product.objects.filter(id__in=quantities).values_list('id', flat=True))
+    lines = reserve_cart(
+        cart_token,
+        {pid: quantity for pid, quantity in quantities.items() if pid in existing},
+        user=request.user,
+    )
+    schedule_sweep()
+    
+    return JsonResponse({
+        'success': True,
+        'items': [{'product_id': pid, **line} for pid, line in lines.items()],
+        'ttl_seconds': settings.STOCK_RESERVATION_TTL_SECONDS,
+    })
+
+
+@login_required
+@require_http_methods(["POST"])
+def release_stock(request):
+    """AJAX endpoint that releases everything a POS cart holds (cart cleared)"""
+    import json
+    from inventory.reservations import release_cart
+    
+    try:
+        data = json.loads(request.body.decode('utf-8') or '{}')
+        cart_token = str(data.get('cart_token') or '').strip()[:64]
+    except (ValueError, AttributeError) as e:
+        return JsonResponse({'success': False, 'error': f'Invalid request: {str(e)}'}, status=400)
+    
+    if not cart_token:
+        return JsonResponse({'success': False, 'error': 'Missing cart token'}, status=400)
+    
+    return JsonResponse({'success': True, 'released': release_cart(cart_token)})
+
+
 @require_http_methods(["GET"])
 def get_sale_details(request, sale_id):
     """
@@ -354,6 +394,7 @@ def process_transaction(request):
         amount_paid = data.get('amount_paid', 0)
         change_amount = data.get('change_amount', 0)
         discount = data.get('discount', 0)
+        cart_token = str(data.get('cart_token') or '').strip()[:64]
                 # Convert to Decimal for database storage
         from decimal import Decimal
         try:
@@ -376,59 +417,82 @@ def process_transaction(request):
                 'error': 'Cart is empty'
             }, status=400)
         
+        from django.db import transaction
+        from inventory.models import StockMovement
+        from inventory.reservations import convert_for_sale
+        from inventory.services import StockService
+        
         created_sales = []
+        movements = []
         total_amount = 0
+        user = request.user if request.user.is_authenticated else None
         
-        for item in cart_items:
-            try:
-                product_id = int(item.get('product_id'))
-                quantity = int(item.get('quantity', 1))
-                unit_price = float(item.get('price', 0))
-                item_total = quantity * unit_price
-                
-                print(f"Processing item: product_id={product_id}, qty={quantity}, price={unit_price}", file=sys.stderr)
-                
-                product = Product.objects.get(id=product_id)
-                
-                sale = Sale.objects.create(
-                    product=product,
-                    quantity=quantity,
-                    total_price=item_total,
-                    customer_name=customer_name,
-                    transaction_date=transaction_date,
-                    payment_method=payment_method,
-                    amount_paid=amount_paid,
-                    change_amount=change_amount,
-                    discount=discount
-                )
-                
-                # Update stock inventory
-                from inventory.models import Stock
+        # All sales and their stock movements commit together, or not at all
+        with transaction.atomic():
+            for item in cart_items:
                 try:
-                    stock = Stock.objects.get(product=product)
-                    old_quantity = stock.quantity
-                    stock.quantity = max(0, stock.quantity - quantity)  # Don't go below 0
-                    stock.save()
-                    print(f"Stock updated for product {product_id}: {old_quantity} -> {stock.quantity}", file=sys.stderr)
-                except Stock.DoesNotExist:
-                    print(f"No stock record found for product {product_id}", file=sys.stderr)
-                
-                created_sales.append({
-                    'id': sale.id,
-                    'product': product.name,
-                    'quantity': quantity,
-                    'price': str(unit_price),
-                    'total': str(item_total)
-                })
-                
-                total_amount += item_total
-                
-            except (Product.DoesNotExist, ValueError, KeyError) as e:
-                print(f"Item processing error: {str(e)}", file=sys.stderr)
+                    product_id = int(item.get('product_id'))
+                    quantity = int(item.get('quantity', 1))
+                    unit_price = float(item.get('price', 0))
+                    item_total = quantity * unit_price
+                    
+                    print(f"Processing item: product_id={product_id}, qty={quantity}, price={unit_price}", file=sys.stderr)
+                    
+                    product = Product.objects.get(id=product_id)
+                    
+                    sale = Sale.objects.create(
+                        product=product,
+                        quantity=quantity,
+                        total_price=item_total,
+                        customer_name=customer_name,
+                        transaction_date=transaction_date,
+                        payment_method=payment_method,
+                        amount_paid=amount_paid,
+                        change_amount=change_amount,
+                        discount=discount
+                    )
+                    
+                    movements.append(StockMovement(
+                        product=product, kind='sale', quantity=-quantity, reference_id=sale.id, created_by=user,
+                    ))
+                    
+                    created_sales.append({
+                        'id': sale.id,
+                        'product': product.name,
+                        'quantity': quantity,
+                        'price': str(unit_price),
+                        'total': str(item_total)
+                    })
+                    
+                    total_amount += item_total
+                    
+                except (Product.DoesNotExist, ValueError, KeyError) as e:
+                    print(f"Item processing error: {str(e)}", file=sys.stderr)
+                    transaction.set_rollback(True)
+                    return JsonResponse({
+                        'success': False,
+                        'error': f'Invalid item: {str(e)}'
+                    }, status=400)
+            
+            # Check the cart against stock not held by other terminals and
+            # turn its reservations into the sale
+            requested = {}
+            for movement in movements:
+                requested[movement.product_id] = requested.get(movement.product_id, 0) - movement.quantity
+            shortages = convert_for_sale(cart_token, requested)
+            if shortages:
+                names = dict(Product.objects.filter(id__in=shortages).values_list('id', 'name'))
+                transaction.set_rollback(True)
                 return JsonResponse({
                     'success': False,
-                    'error': f'Invalid item: {str(e)}'
-                }, status=400)
+                    'error': 'Not enough stock: ' + ', '.join(
+                        f'{names[pid]} ({available} available)' for pid, available in shortages.items()
+                    ),
+                    'shortages': {str(pid): available for pid, available in shortages.items()},
+                }, status=409)
+            
+            # Update stock inventory: one locked batch for the whole cart
+            StockService.apply(movements)
         
         response_data = {
             'success': True,
@@ -515,12 +579,7 @@ class SalePrintReportView(LoginRequiredMixin, TemplateView):
         queryset = Sale.objects.all()
         
         # Exclude fully returned sales
-        from django.db.models import Exists, OuterRef
-        approved_returns = Return.objects.filter(
-            sale=OuterRef('pk'),
-            status__in=['approved', 'completed']
-        )
-        queryset = queryset.exclude(Exists(approved_returns))
+        queryset = queryset.exclude(return_status__in=returns.RESTOCKED)
         
         # Determine report type
         report_type = self.request.GET.get('report_type', 'month')
@@ -651,6 +710,7 @@ class ReturnCreateView(LoginRequiredMixin, CreateView):
         response = super().form_valid(form)
         
         ret = self.object
+        returns.refresh_return_status([ret.sale_id])
         log_action(
             self.request, 'CREATE', ret,
             object_name=f'Return #{ret.id} (Sale #{ret.sale.id})',
@@ -681,16 +741,44 @@ class ReturnUpdateView(LoginRequiredMixin, UpdateView):
             return redirect('return_list')
         return super().dispatch(request, *args, **kwargs)
     
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        # Offer only the transitions the return can still make
+        current = self.object.status
+        form.fields['status'].choices = [
+            (value, label) for value, label in Return.STATUS_CHOICES
+            if value == current or returns.allowed(current, value)
+        ]
+        return form
+    
     def form_valid(self, form):
-        # Update processed date when status changes
-        old_status = self.object.status
-        
-        if 'status' in form.changed_data:
-            form.instance.processed_date = timezone.now()
-            form.instance.processed_by = self.request.user.username
+        from django.db import transaction
+        
+        # The form has already copied the new status onto the instance
+        old_status = form.initial['status']
+        new_status = form.cleaned_data.get('status')
+        
+        with transaction.atomic():
+            current = Return.objects.select_for_update().get(pk=self.object.pk)
+            if current.status != old_status:
+                messages.error(
+                    self.request,
+                    f"Return #{current.id} was already changed to {current.get_status_display().upper()} by someone else."
+                )
+                return redirect(self.get_success_url())
+            
+            # Status (and the stock it restores) only changes through the return engine
+            self.object = form.save(commit=False)
+            self.object.status = old_status
+            self.object.save(update_fields=['refund_payment_method', 'reason_details', 'refund_amount'])
             
-            new_status = form.cleaned_data.get('status')
+            if old_status in returns.RESTOCKED and self.object.refund_amount != current.refund_amount:
+                returns.add_to_sale_totals({self.object.sale_id: (0, self.object.refund_amount - current.refund_amount)})
             
+            if new_status != old_status:
+                returns.transition(self.object, new_status, self.request.user)
+        
+        if new_status != old_status:
             # Audit log
             log_action(
                 self.request, 'UPDATE', self.object,
@@ -710,5 +798,32 @@ class ReturnUpdateView(LoginRequiredMixin, UpdateView):
                 messages.info(self.request, "Return updated successfully.")
         else:
             messages.success(self.request, "Return updated successfully.")
-        return super().form_valid(form)
+        return redirect(self.get_success_url())
+
+
+@login_required
+@require_http_methods(["POST"])
+def approve_returns(request):
+    """Approve the selected pending returns in one batch"""
+    if not (request.user.is_staff and request.user.is_superuser):
+        messages.error(request, "Only administrators can approve or update return status.")
+        return redirect('return_list')
+    
+    ids = [int(value) for value in request.POST.getlist('return_ids') if value.isdigit()]
+    approved = returns.approve_returns(ids, request.user) if ids else []
+    
+    if approved:
+        log_action(
+            request, 'UPDATE',
+            object_name=f'{len(approved)} return(s)',
+            description=f'Approved returns {", ".join(f"#{return_id}" for return_id in approved)}',
+            changes={'Status': {'old': 'PENDING', 'new': 'APPROVED'}},
+        )
+        messages.success(request, f"Approved {len(approved)} return(s); returned units are back in stock.")
+    skipped = len(ids) - len(approved)
+    if skipped:
+        messages.warning(request, f"{skipped} selected return(s) were no longer pending and were left unchanged.")
+    elif not ids:
+        messages.info(request, "Select the pending returns to approve.")
+    return redirect('return_list')
 
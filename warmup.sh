@@ -7,5 +7,5 @@ echo "==> Running post-deployment warmup..."
 # Wait for app to be ready
 sleep 5
 
-# Generate initial forecasts (optional, runs asynchronously on first user request)
+# Generate initial forecasts (queued on first user request, run by run_worker)
 echo "==> Setup complete. Forecasts will be generated on first dashboard access."